@@ -0,0 +1,107 @@
+# main_tg_bot/availability_engine.py
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.logging_config import setup_logger
+from main_tg_bot.booking_objects import BOOKING_SHEETS, BookingSheet, booking_repository
+
+logger = setup_logger("availability_engine")
+
+# Горизонт календаря по умолчанию (дней от сегодня)
+AVAILABILITY_HORIZON_DAYS = 365
+
+
+class AvailabilityEngine:
+    """
+    Календарь занятости всех объектов с точностью до ночи.
+
+    Занятость хранится как булева матрица (объект × ночь): ночь d занята, если
+    заезд <= d < выезд. Матрица строится за один проход по уже разобранным кадрам
+    booking_repository, а запросы по всем объектам считаются векторно.
+    """
+
+    def __init__(self, sheets: Dict[str, BookingSheet] = None, start: Optional[date] = None,
+                 days: int = AVAILABILITY_HORIZON_DAYS):
+        self.start = start or date.today()
+        self.days = days
+        self.end = self.start + timedelta(days=days)
+        sheets = BOOKING_SHEETS if sheets is None else sheets
+
+        self.objects: List[str] = []
+        self.booking_counts: Dict[str, int] = {}
+        # Разностный массив: +1 в ночь заезда, -1 в ночь выезда; накопленная сумма > 0 — занято
+        delta = np.zeros((len(sheets), days + 1), dtype=np.int32)
+        start64 = np.datetime64(self.start, 'D')
+
+        for row, (sheet_name, booking_sheet) in enumerate(sheets.items()):
+            self.objects.append(sheet_name)
+            self.booking_counts[sheet_name] = 0
+            if not booking_sheet.exists():
+                continue
+            try:
+                df = booking_repository.frame(booking_sheet.filepath)
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить брони '{sheet_name}': {e}")
+                continue
+
+            check_in = df['_check_in'].to_numpy(dtype='datetime64[D]')
+            check_out = df['_check_out'].to_numpy(dtype='datetime64[D]')
+            valid = ~np.isnat(check_in) & ~np.isnat(check_out) & (check_out > check_in)
+            self.booking_counts[sheet_name] = int(valid.sum())
+
+            first = np.clip((check_in[valid] - start64).astype(np.int64), 0, days)
+            last = np.clip((check_out[valid] - start64).astype(np.int64), 0, days)
+            visible = first < last
+            np.add.at(delta[row], first[visible], 1)
+            np.add.at(delta[row], last[visible], -1)
+
+        self.occupied = np.cumsum(delta, axis=1)[:, :days] > 0
+        self._row_by_object = {name: row for row, name in enumerate(self.objects)}
+
+    def __contains__(self, sheet_name: str) -> bool:
+        return sheet_name in self._row_by_object
+
+    def _day_range(self, check_in: date, check_out: date) -> Tuple[int, int]:
+        if check_in < self.start or check_out > self.end or check_out <= check_in:
+            raise ValueError(
+                f"Период {check_in} – {check_out} вне горизонта календаря {self.start} – {self.end}"
+            )
+        return (check_in - self.start).days, (check_out - self.start).days
+
+    def free_objects(self, check_in: date, check_out: date) -> List[str]:
+        """Объекты, свободные на все ночи [check_in, check_out)."""
+        first, last = self._day_range(check_in, check_out)
+        free = ~self.occupied[:, first:last].any(axis=1)
+        return [self.objects[row] for row in np.flatnonzero(free)]
+
+    def _free_runs(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Начала и концы (индексы ночей) непрерывных свободных отрезков объекта."""
+        free = np.concatenate(([False], ~self.occupied[row], [False]))
+        edges = np.flatnonzero(np.diff(free.astype(np.int8)))
+        return edges[0::2], edges[1::2]
+
+    def free_windows(self, sheet_name: str, min_nights: int = 1) -> List[Tuple[date, date]]:
+        """Свободные окна объекта длиной не меньше min_nights ночей."""
+        starts, ends = self._free_runs(self._row_by_object[sheet_name])
+        long_enough = (ends - starts) >= min_nights
+        return [
+            (self.start + timedelta(days=int(first)), self.start + timedelta(days=int(last)))
+            for first, last in zip(starts[long_enough], ends[long_enough])
+        ]
+
+    def free_windows_all(self, min_nights: int = 1) -> Dict[str, List[Tuple[date, date]]]:
+        """Свободные окна всех объектов за один вызов."""
+        return {sheet_name: self.free_windows(sheet_name, min_nights) for sheet_name in self.objects}
+
+    def longest_free_gap(self, sheet_name: str) -> Optional[Tuple[date, date]]:
+        """Самое длинное свободное окно объекта в пределах горизонта (None, если всё занято)."""
+        starts, ends = self._free_runs(self._row_by_object[sheet_name])
+        if len(starts) == 0:
+            return None
+        longest = int(np.argmax(ends - starts))
+        return (
+            self.start + timedelta(days=int(starts[longest])),
+            self.start + timedelta(days=int(ends[longest]))
+        )
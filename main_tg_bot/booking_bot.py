@@ -28,11 +28,13 @@ from main_tg_bot.command.commands import (
     exit_bot,
 )
 from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
+from main_tg_bot.google_sheets.sync_queue import sync_queue
 from main_tg_bot.command.new_menu import (
     calculation_command,
     close_calculation_menu_handler
 )
 from telega.telegram_client import telegram_client
+from telega.tg_notifier import close_session
 
 logger = setup_logger("booking_bot")
 
@@ -106,7 +108,13 @@ class BookingBot:
 
     def setup_handlers(self):
         """Настройка всех обработчиков с проверкой прав доступа"""
-        self.application = Application.builder().token(self.token).build()
+        self.application = (
+            Application.builder()
+            .token(self.token)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
 
         # Сохраняем URL веб-приложения в bot_data для доступа из обработчиков
         self.application.bot_data['web_app_url'] = self.remote_web_app_url
@@ -146,6 +154,15 @@ class BookingBot:
 
         logger.info("Handlers setup completed")
 
+    async def _post_init(self, application: Application):
+        """Запускает фоновую очередь синхронизации с Google Таблицей."""
+        await sync_queue.start()
+
+    async def _post_shutdown(self, application: Application):
+        """Отправляет в Google Таблицу всё, что осталось в очереди синхронизации, и закрывает HTTP-сессию Bot API."""
+        await sync_queue.stop()
+        await close_session()
+
     async def unknown_command(self, update, context):
         """Обработка неизвестных команд"""
         if not update.message:
@@ -297,7 +314,7 @@ def sync_google_sheets():
     try:
         sync_manager = GoogleSheetsCSVSync()
         logger.info("Starting full Google Sheets sync...")
-        results = sync_manager.sync_all_sheets("csv_to_google")
+        results = sync_manager.sync_all_sheets("csv_to_google", parallel=True)
         success_count = sum(results.values())
         total_count = len(results)
         logger.info(f"Sync completed: {success_count}/{total_count} sheets successful")
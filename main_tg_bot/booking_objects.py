@@ -1,10 +1,21 @@
 # main_tg_bot/booking_objects.py
+import json
+import os
+import re
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
 
 from common.config import Config
+from common.logging_config import setup_logger
+
+logger = setup_logger("booking_objects")
 
 # Корень проекта — родитель main_tg_bot/
 PROJECT_ROOT = Path(__file__).parent.parent.resolve()
@@ -13,6 +24,11 @@ PROJECT_ROOT = Path(__file__).parent.parent.resolve()
 BOOKING_DIR = PROJECT_ROOT / Config.BOOKING_DATA_DIR
 BOOKING_DIR.mkdir(exist_ok=True)
 
+# Локальное хранилище бронирований (CSV остаётся форматом обмена с Google Sheets и FTP)
+BOOKING_DB_PATH = BOOKING_DIR / ".bookings.sqlite3"
+# Сколько миллисекунд ждать, пока другой процесс освободит базу
+BOOKING_DB_BUSY_TIMEOUT_MS = 10000
+
 # Только booking-файлы
 SHEET_TO_FILENAME = {
     'HALO Title': 'halo_title.csv',
@@ -31,7 +47,11 @@ class BookingSheet:
         self.filepath = BOOKING_DIR / filename
 
     def save(self, df: pd.DataFrame):
-        df.to_csv(self.filepath, index=False, encoding='utf-8')
+        # Пишем через временный файл, чтобы читатели не увидели наполовину записанный CSV
+        tmp_path = self.filepath.with_suffix('.csv.tmp')
+        df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, self.filepath)
+        booking_repository.invalidate(self.filepath)
 
     def load(self) -> pd.DataFrame:
         if not self.filepath.exists():
@@ -54,6 +74,30 @@ def get_booking_sheet(sheet_name: str) -> Optional[BookingSheet]:
     return BOOKING_SHEETS.get(sheet_name)
 
 
+_sheet_locks: Dict[str, threading.RLock] = {}
+_sheet_locks_guard = threading.Lock()
+
+
+def sheet_lock(sheet_name: str) -> threading.RLock:
+    """
+    Блокировка «прочитать — изменить — записать» CSV листа внутри процесса.
+
+    Общая для BookingStore и GoogleSheetsCSVSync: синхронизация не может перезаписать CSV
+    устаревшим кадром, пока хранилище сохраняет бронь, и наоборот.
+    """
+    with _sheet_locks_guard:
+        if sheet_name not in _sheet_locks:
+            _sheet_locks[sheet_name] = threading.RLock()
+        return _sheet_locks[sheet_name]
+
+
+def get_booking_sheet_by_filename(filename: str) -> Optional[BookingSheet]:
+    for booking_sheet in BOOKING_SHEETS.values():
+        if booking_sheet.filename == filename:
+            return booking_sheet
+    return None
+
+
 def get_all_booking_files(filtered_by: Optional[str] = None) -> list[str]:
     """
     Возвращает список всех .csv файлов из папки booking/.
@@ -71,4 +115,624 @@ def get_all_booking_files(filtered_by: Optional[str] = None) -> list[str]:
         filtered_by = filtered_by.lower()
         filenames = [f for f in filenames if filtered_by in f.lower()]
 
-    return sorted(filenames)
\ No newline at end of file
+    return sorted(filenames)
+
+
+# --- Типизированная схема бронирования ---
+# Форматы дат: из Google Таблицы приходит dd.mm.YYYY, из веб-форм бывает YYYY-mm-dd
+BOOKING_DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d')
+# Строковая колонка CSV -> типизированная колонка datetime64 (NaT для пустых и неверных дат)
+BOOKING_DATE_COLUMNS = {'Заезд': '_check_in', 'Выезд': '_check_out'}
+# Строковая колонка CSV -> типизированная колонка float64 (NaN, если не число)
+BOOKING_AMOUNT_COLUMNS = {'СуммаБатты': '_total_sum', 'Комиссия': '_commission', 'Расходы': '_expenses'}
+TYPED_BOOKING_COLUMNS = [*BOOKING_DATE_COLUMNS.values(), *BOOKING_AMOUNT_COLUMNS.values()]
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Векторный разбор дат: каждый формат из BOOKING_DATE_FORMATS применяется ко всему столбцу сразу."""
+    values = values.astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    for fmt in BOOKING_DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors='coerce')
+    return parsed
+
+
+def parse_amounts(values: pd.Series) -> pd.Series:
+    """Суммы вида '15 000' или '15000,50' -> float; всё остальное -> NaN."""
+    cleaned = values.astype(str).str.replace(r'[\s\u00a0]', '', regex=True).str.replace(',', '.', regex=False)
+    return pd.to_numeric(cleaned, errors='coerce')
+
+
+def parse_booking_date(value) -> Optional[date]:
+    """Одиночная дата (например, из формы) по тем же форматам, что и parse_dates."""
+    value = str(value or '').strip()
+    for fmt in BOOKING_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value) -> Optional[float]:
+    """Одиночная сумма (например, из формы) по тем же правилам, что и parse_amounts."""
+    cleaned = re.sub(r'[\s\u00a0]', '', str(value or '')).replace(',', '.')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def apply_booking_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Добавляет к строковому кадру бронирований типизированные колонки TYPED_BOOKING_COLUMNS.
+
+    Исходные колонки не меняются, поэтому кадр по-прежнему можно выгрузить в CSV,
+    убрав типизированные колонки (drop_typed_columns).
+    """
+    df = df.copy()
+    for source, target in BOOKING_DATE_COLUMNS.items():
+        df[target] = (
+            parse_dates(df[source]) if source in df.columns
+            else pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        )
+    for source, target in BOOKING_AMOUNT_COLUMNS.items():
+        df[target] = parse_amounts(df[source]) if source in df.columns else float('nan')
+    return df
+
+
+def drop_typed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(columns=[column for column in TYPED_BOOKING_COLUMNS if column in df.columns])
+
+
+def _iso_date(value) -> Optional[str]:
+    parsed = parse_booking_date(value)
+    return parsed.isoformat() if parsed else None
+
+
+def _date_from_iso(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+class BookingRepository:
+    """
+    Процессный кэш разобранных CSV бронирований.
+
+    Ключ — путь к файлу, запись действительна, пока не изменились mtime и размер файла.
+    Все читатели (/view_booking, /view_available_dates, уведомления, рассылка свободных дат)
+    получают один и тот же разобранный кадр, поэтому повторные вызовы не читают диск.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # путь -> (mtime_ns, размер), кадр, строки-словари
+        self._entries: Dict[Path, Tuple[tuple, pd.DataFrame, List[dict]]] = {}
+
+    def _get(self, file_path) -> Tuple[pd.DataFrame, List[dict]]:
+        path = Path(file_path)
+        booking_sheet = get_booking_sheet_by_filename(path.name)
+        if booking_sheet is not None:
+            # Брони, сохранённые через BookingStore, попадают в CSV лениво — перед чтением
+            booking_store.export_csv(booking_sheet)
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == signature:
+                return cached[1], cached[2]
+
+        df = apply_booking_schema(pd.read_csv(path, dtype=str, encoding='utf-8').fillna(''))
+        records = drop_typed_columns(df).to_dict('records')
+        typed = {
+            column: [None if pd.isna(value) else value.date() for value in df[column]]
+            for column in BOOKING_DATE_COLUMNS.values()
+        }
+        typed.update({
+            column: [None if pd.isna(value) else float(value) for value in df[column]]
+            for column in BOOKING_AMOUNT_COLUMNS.values()
+        })
+        for position, record in enumerate(records):
+            for column, values in typed.items():
+                record[column] = values[position]
+
+        with self._lock:
+            self._entries[path] = (signature, df, records)
+        logger.debug(f"Booking repository: parsed {path.name} ({len(df)} rows)")
+        return df, records
+
+    def frame(self, file_path) -> pd.DataFrame:
+        """
+        Разобранный CSV: строковые колонки как в файле плюс TYPED_BOOKING_COLUMNS
+        (см. apply_booking_schema). Кадр общий для всех читателей — изменять только копию.
+        """
+        return self._get(file_path)[0]
+
+    def records(self, file_path) -> List[dict]:
+        """Строки CSV как словари (копии): даты _check_in/_check_out — date или None, суммы — float или None."""
+        return [dict(record) for record in self._get(file_path)[1]]
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(Path(file_path), None)
+
+
+booking_repository = BookingRepository()
+
+
+class BookingIntervalIndex:
+    """
+    Индекс интервалов проживания одного объекта.
+
+    Интервалы хранятся отсортированными по дате заезда. Кандидаты на пересечение с [start, end)
+    лежат в диапазоне заездов (start - самое длинное проживание, end), который находится
+    через bisect, поэтому запрос стоит O(log n + k) вместо разбора всех строк CSV.
+    """
+
+    def __init__(self):
+        self._starts: List[date] = []
+        # (заезд, выезд, id строки, строка) в том же порядке, что и _starts
+        self._entries: List[Tuple[date, date, int, dict]] = []
+        self._start_by_id: Dict[int, date] = {}
+        # Только растёт: после удаления оценка остаётся корректной, просто чуть шире
+        self._max_stay = timedelta(0)
+
+    def add(self, row_id: int, check_in: Optional[date], check_out: Optional[date], row: dict):
+        if check_in is None or check_out is None or check_out <= check_in:
+            return
+
+        position = bisect_right(self._starts, check_in)
+        self._starts.insert(position, check_in)
+        self._entries.insert(position, (check_in, check_out, row_id, row))
+        self._start_by_id[row_id] = check_in
+        self._max_stay = max(self._max_stay, check_out - check_in)
+
+    def remove(self, row_id: int):
+        check_in = self._start_by_id.pop(row_id, None)
+        if check_in is None:
+            return
+        position = bisect_left(self._starts, check_in)
+        while self._entries[position][2] != row_id:
+            position += 1
+        del self._starts[position]
+        del self._entries[position]
+
+    def overlaps(self, start: date, end: date, exclude_sync_id: Optional[str] = None) -> List[dict]:
+        """Строки, чьё проживание пересекается с [start, end)."""
+        low = bisect_right(self._starts, start - self._max_stay)
+        high = bisect_left(self._starts, end)
+        return [
+            row for check_in, check_out, _, row in self._entries[low:high]
+            if check_out > start and (exclude_sync_id is None or row.get('_sync_id') != exclude_sync_id)
+        ]
+
+    def periods(self) -> List[Tuple[date, date]]:
+        """Все занятые периоды, отсортированные по дате заезда."""
+        return [(check_in, check_out) for check_in, check_out, _, _ in self._entries]
+
+
+class BookingStore:
+    """
+    Транзакционное хранилище бронирований на SQLite (режим WAL).
+
+    Каждая мутация (добавление, изменение, удаление) выполняется в одной транзакции
+    BEGIN IMMEDIATE, поэтому одновременные обработчики — в том числе из разных процессов —
+    не теряют записи друг друга. Чтение идёт в обычной (отложенной) транзакции и писателей
+    не ждёт. Поиск строки идёт по индексу (object, sync_id).
+
+    CSV объекта — экспорт для Google Sheets, FTP и читателей BookingRepository. Мутация его
+    не переписывает, а только увеличивает generation объекта; export_csv перегенерирует файл
+    перед чтением, если generation ушёл вперёд exported_generation.
+
+    Если CSV изменился в обход хранилища (например, его перезаписала синхронизация
+    из Google Таблицы), объект заново импортируется из CSV при следующем обращении.
+
+    Для проверки пересечений по каждому объекту держится BookingIntervalIndex: он строится
+    один раз и обновляется на месте при мутациях через это хранилище.
+    """
+
+    def __init__(self, db_path: Path = BOOKING_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        # object -> (generation, на котором построен индекс, индекс)
+        self._indexes: Dict[str, Tuple[Optional[int], BookingIntervalIndex]] = {}
+        self._indexes_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3-соединение нельзя делить между потоками — держим по одному на поток
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BOOKING_DB_BUSY_TIMEOUT_MS / 1000,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BOOKING_DB_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._create_schema(conn)
+                self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS booking_objects (
+                object TEXT PRIMARY KEY,
+                columns TEXT NOT NULL,
+                csv_mtime_ns INTEGER,
+                csv_size INTEGER,
+                generation INTEGER NOT NULL DEFAULT 0,
+                exported_generation INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY,
+                object TEXT NOT NULL,
+                sync_id TEXT NOT NULL DEFAULT '',
+                position INTEGER NOT NULL,
+                check_in TEXT,
+                check_out TEXT,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bookings_sync_id ON bookings (object, sync_id);
+            CREATE INDEX IF NOT EXISTS idx_bookings_position ON bookings (object, position);
+            CREATE INDEX IF NOT EXISTS idx_bookings_dates ON bookings (object, check_in, check_out);
+        """)
+        # Базы, созданные до ленивого экспорта CSV
+        existing = {record['name'] for record in conn.execute("PRAGMA table_info(booking_objects)")}
+        for column in ('generation', 'exported_generation'):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE booking_objects ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _transaction(self, sheet: BookingSheet):
+        """
+        Транзакция с блокировкой на запись; перед работой подтягивает внешние изменения CSV.
+
+        Внутри процесса держит sheet_lock листа (общий с синхронизацией Google Sheets),
+        между процессами запись упорядочивает BEGIN IMMEDIATE.
+        """
+        with sheet_lock(sheet.sheet_name):
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync_from_csv(conn, sheet)
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @contextmanager
+    def _reading(self, sheet: BookingSheet):
+        """
+        Транзакция только для чтения: отложенный BEGIN не ждёт писателей и не блокирует их.
+
+        На запись (через _transaction) переходит, только если CSV нужно импортировать.
+        """
+        conn = self._connection()
+        if self._needs_import(conn, sheet):
+            with self._transaction(sheet) as conn:
+                yield conn
+            return
+
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _csv_signature(sheet: BookingSheet):
+        try:
+            stat = sheet.filepath.stat()
+        except FileNotFoundError:
+            return None, None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _object_state(conn: sqlite3.Connection, sheet: BookingSheet) -> Optional[sqlite3.Row]:
+        return conn.execute(
+            "SELECT csv_mtime_ns, csv_size, generation, exported_generation FROM booking_objects "
+            "WHERE object = ?",
+            (sheet.filename,)
+        ).fetchone()
+
+    def _needs_import(self, conn: sqlite3.Connection, sheet: BookingSheet) -> bool:
+        """CSV ещё не импортирован или изменился в обход хранилища."""
+        state = self._object_state(conn, sheet)
+        return state is None or (state['csv_mtime_ns'], state['csv_size']) != self._csv_signature(sheet)
+
+    def _sync_from_csv(self, conn: sqlite3.Connection, sheet: BookingSheet):
+        mtime_ns, size = self._csv_signature(sheet)
+        state = self._object_state(conn, sheet)
+        if state is not None and (state['csv_mtime_ns'], state['csv_size']) == (mtime_ns, size):
+            return
+
+        if state is not None and state['generation'] != state['exported_generation']:
+            # Брони из базы ещё не выгружены в CSV — импорт их бы потерял, поэтому побеждает база
+            logger.warning(f"Booking store: {sheet.filename} changed outside the store "
+                           f"while it had unexported bookings, overwriting it")
+            self._export_csv(conn, sheet)
+            return
+
+        df = sheet.load()
+        columns = df.columns.tolist()
+        typed = apply_booking_schema(df)
+        iso_dates = {
+            column: typed[column].dt.strftime('%Y-%m-%d').where(typed[column].notna(), None).tolist()
+            for column in ('_check_in', '_check_out')
+        }
+        conn.execute("DELETE FROM bookings WHERE object = ?", (sheet.filename,))
+        conn.executemany(
+            "INSERT INTO bookings (object, sync_id, position, check_in, check_out, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                self._row_params(sheet, position, row, iso_dates['_check_in'][position],
+                                 iso_dates['_check_out'][position])
+                for position, row in enumerate(df.to_dict('records'))
+            ]
+        )
+        self._save_object_state(conn, sheet, columns, mtime_ns, size)
+        logger.info(f"Booking store: imported {len(df)} rows from {sheet.filename}")
+
+    @staticmethod
+    def _row_params(sheet: BookingSheet, position: int, row: dict,
+                    check_in: Optional[str] = None, check_out: Optional[str] = None) -> tuple:
+        """Параметры INSERT; даты в ISO берутся готовыми (импорт) или разбираются из строки."""
+        return (
+            sheet.filename,
+            str(row.get('_sync_id', '') or ''),
+            position,
+            check_in or _iso_date(row.get('Заезд')),
+            check_out or _iso_date(row.get('Выезд')),
+            json.dumps(row, ensure_ascii=False),
+        )
+
+    @staticmethod
+    def _save_object_state(conn: sqlite3.Connection, sheet: BookingSheet, columns: List[str],
+                           mtime_ns, size):
+        """Состояние после импорта: новый generation, и он же уже совпадает с CSV."""
+        conn.execute(
+            "INSERT INTO booking_objects "
+            "(object, columns, csv_mtime_ns, csv_size, generation, exported_generation) "
+            "VALUES (?, ?, ?, ?, 1, 1) "
+            "ON CONFLICT(object) DO UPDATE SET columns = excluded.columns, "
+            "csv_mtime_ns = excluded.csv_mtime_ns, csv_size = excluded.csv_size, "
+            "generation = booking_objects.generation + 1, "
+            "exported_generation = booking_objects.generation + 1",
+            (sheet.filename, json.dumps(columns, ensure_ascii=False), mtime_ns, size)
+        )
+
+    @staticmethod
+    def _mark_changed(conn: sqlite3.Connection, sheet: BookingSheet, columns: List[str]):
+        """Мутация: CSV отстаёт от базы до следующего export_csv."""
+        conn.execute(
+            "UPDATE booking_objects SET columns = ?, generation = generation + 1 WHERE object = ?",
+            (json.dumps(columns, ensure_ascii=False), sheet.filename)
+        )
+
+    @staticmethod
+    def _get_columns(conn: sqlite3.Connection, sheet: BookingSheet) -> List[str]:
+        state = conn.execute(
+            "SELECT columns FROM booking_objects WHERE object = ?", (sheet.filename,)
+        ).fetchone()
+        return json.loads(state['columns']) if state is not None else []
+
+    def _export_csv(self, conn: sqlite3.Connection, sheet: BookingSheet):
+        """Перегенерирует CSV объекта из базы и запоминает его подпись."""
+        rows = [
+            json.loads(record['data']) for record in conn.execute(
+                "SELECT data FROM bookings WHERE object = ? ORDER BY position", (sheet.filename,)
+            )
+        ]
+        df = pd.DataFrame(rows, columns=self._get_columns(conn, sheet)).fillna('')
+        sheet.save(df)
+        mtime_ns, size = self._csv_signature(sheet)
+        conn.execute(
+            "UPDATE booking_objects SET csv_mtime_ns = ?, csv_size = ?, exported_generation = generation "
+            "WHERE object = ?",
+            (mtime_ns, size, sheet.filename)
+        )
+        logger.debug(f"Booking store: exported {len(df)} rows to {sheet.filename}")
+
+    def _object_generation(self, conn: sqlite3.Connection, sheet: BookingSheet) -> Optional[int]:
+        state = self._object_state(conn, sheet)
+        return state['generation'] if state is not None else None
+
+    def _get_index(self, conn: sqlite3.Connection, sheet: BookingSheet) -> BookingIntervalIndex:
+        """Индекс объекта; перестраивается, если данные менялись не через этот процесс."""
+        generation = self._object_generation(conn, sheet)
+        with self._indexes_lock:
+            cached = self._indexes.get(sheet.filename)
+            if cached is not None and cached[0] == generation:
+                return cached[1]
+
+        index = BookingIntervalIndex()
+        for record in conn.execute(
+                "SELECT id, check_in, check_out, data FROM bookings WHERE object = ?", (sheet.filename,)
+        ):
+            index.add(record['id'], _date_from_iso(record['check_in']), _date_from_iso(record['check_out']),
+                      json.loads(record['data']))
+        with self._indexes_lock:
+            self._indexes[sheet.filename] = (generation, index)
+        return index
+
+    def _update_index(self, sheet: BookingSheet, generation_before: Optional[int], generation_after: Optional[int],
+                      remove_id: Optional[int] = None, add_id: Optional[int] = None,
+                      add_params: Optional[tuple] = None, add_row: Optional[dict] = None):
+        """Применяет мутацию к индексу, если он актуален; иначе сбрасывает его."""
+        with self._indexes_lock:
+            cached = self._indexes.get(sheet.filename)
+            if cached is None or cached[0] != generation_before:
+                self._indexes.pop(sheet.filename, None)
+                return
+            index = cached[1]
+            if remove_id is not None:
+                index.remove(remove_id)
+            if add_id is not None:
+                # add_params — кортеж из _row_params: даты заезда/выезда уже в ISO
+                index.add(add_id, _date_from_iso(add_params[3]), _date_from_iso(add_params[4]), add_row)
+            self._indexes[sheet.filename] = (generation_after, index)
+
+    def has_unexported_changes(self, sheet: BookingSheet) -> bool:
+        """Есть ли в базе брони, которых ещё нет в CSV объекта."""
+        state = self._object_state(self._connection(), sheet)
+        return state is not None and state['generation'] != state['exported_generation']
+
+    def export_csv(self, sheet: BookingSheet):
+        """
+        Перегенерирует CSV объекта, если в базе есть не выгруженные в него изменения.
+
+        Вызывается перед тем, как CSV читают в обход хранилища: BookingRepository,
+        синхронизация с Google Sheets и загрузка на FTP. Без изменений — один SELECT.
+        """
+        if not self.has_unexported_changes(sheet):
+            return
+        with self._transaction(sheet) as conn:
+            # Пока ждали блокировку, CSV мог выгрузить другой поток или процесс
+            state = self._object_state(conn, sheet)
+            if state['generation'] != state['exported_generation']:
+                self._export_csv(conn, sheet)
+
+    def find_overlaps(self, sheet: BookingSheet, check_in: date, check_out: date,
+                      exclude_sync_id: Optional[str] = None) -> List[dict]:
+        """
+        Бронирования объекта, пересекающиеся с проживанием [check_in, check_out).
+
+        Args:
+            sheet: Объект бронирования
+            check_in: Дата заезда
+            check_out: Дата выезда
+            exclude_sync_id: _sync_id редактируемой брони, которую не нужно учитывать
+
+        Returns:
+            List[dict]: Пересекающиеся строки, отсортированные по дате заезда
+        """
+        with self._reading(sheet) as conn:
+            return self._get_index(conn, sheet).overlaps(check_in, check_out, exclude_sync_id)
+
+    def booked_periods(self, sheet: BookingSheet) -> List[Tuple[date, date]]:
+        """Занятые периоды объекта, отсортированные по дате заезда."""
+        with self._reading(sheet) as conn:
+            return self._get_index(conn, sheet).periods()
+
+    def get_columns(self, sheet: BookingSheet) -> List[str]:
+        with self._reading(sheet) as conn:
+            return self._get_columns(conn, sheet)
+
+    def list_bookings(self, sheet: BookingSheet) -> List[dict]:
+        """Все строки объекта в порядке CSV."""
+        with self._reading(sheet) as conn:
+            return [
+                json.loads(record['data']) for record in conn.execute(
+                    "SELECT data FROM bookings WHERE object = ? ORDER BY position", (sheet.filename,)
+                )
+            ]
+
+    def get_booking(self, sheet: BookingSheet, sync_id: str) -> Optional[dict]:
+        with self._reading(sheet) as conn:
+            record = conn.execute(
+                "SELECT data FROM bookings WHERE object = ? AND sync_id = ? ORDER BY position LIMIT 1",
+                (sheet.filename, sync_id)
+            ).fetchone()
+            return json.loads(record['data']) if record is not None else None
+
+    def insert_booking(self, sheet: BookingSheet, row: dict,
+                       default_columns: Optional[List[str]] = None) -> dict:
+        """
+        Добавляет бронирование в конец объекта.
+
+        Строка выравнивается по колонкам существующего CSV; если CSV ещё пуст,
+        колонки берутся из default_columns (или из самой строки).
+
+        Returns:
+            dict: Сохранённая строка
+        """
+        with self._transaction(sheet) as conn:
+            columns = self._get_columns(conn, sheet) or list(default_columns or row.keys())
+            stored = {column: row.get(column, '') for column in columns}
+            max_position = conn.execute(
+                "SELECT MAX(position) FROM bookings WHERE object = ?", (sheet.filename,)
+            ).fetchone()[0]
+            position = 0 if max_position is None else max_position + 1
+            generation_before = self._object_generation(conn, sheet)
+            params = self._row_params(sheet, position, stored)
+            cursor = conn.execute(
+                "INSERT INTO bookings (object, sync_id, position, check_in, check_out, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                params
+            )
+            self._mark_changed(conn, sheet, columns)
+            self._update_index(sheet, generation_before, self._object_generation(conn, sheet),
+                               add_id=cursor.lastrowid, add_params=params, add_row=stored)
+            return stored
+
+    def update_booking(self, sheet: BookingSheet, sync_id: str, fields: dict) -> Optional[dict]:
+        """
+        Обновляет поля бронирования по _sync_id. Недостающие колонки добавляются в конец.
+
+        Returns:
+            Optional[dict]: Обновлённая строка или None, если бронирование не найдено
+        """
+        with self._transaction(sheet) as conn:
+            record = conn.execute(
+                "SELECT id, position, data FROM bookings WHERE object = ? AND sync_id = ? "
+                "ORDER BY position LIMIT 1",
+                (sheet.filename, sync_id)
+            ).fetchone()
+            if record is None:
+                return None
+
+            columns = self._get_columns(conn, sheet)
+            for column_name in fields:
+                if column_name not in columns:
+                    logger.warning(f"⚠️ Колонка '{column_name}' отсутствует в CSV, добавляем её")
+                    columns.append(column_name)
+
+            row = json.loads(record['data'])
+            row.update(fields)
+            params = self._row_params(sheet, record['position'], row)
+            generation_before = self._object_generation(conn, sheet)
+            conn.execute(
+                "UPDATE bookings SET sync_id = ?, check_in = ?, check_out = ?, data = ? WHERE id = ?",
+                (params[1], params[3], params[4], params[5], record['id'])
+            )
+            self._mark_changed(conn, sheet, columns)
+            self._update_index(sheet, generation_before, self._object_generation(conn, sheet),
+                               remove_id=record['id'], add_id=record['id'], add_params=params, add_row=row)
+            return row
+
+    def delete_booking(self, sheet: BookingSheet, sync_id: str) -> Optional[dict]:
+        """
+        Удаляет бронирование по _sync_id.
+
+        Returns:
+            Optional[dict]: Удалённая строка или None, если бронирование не найдено
+        """
+        with self._transaction(sheet) as conn:
+            record = conn.execute(
+                "SELECT id, data FROM bookings WHERE object = ? AND sync_id = ? "
+                "ORDER BY position LIMIT 1",
+                (sheet.filename, sync_id)
+            ).fetchone()
+            if record is None:
+                return None
+
+            generation_before = self._object_generation(conn, sheet)
+            conn.execute("DELETE FROM bookings WHERE id = ?", (record['id'],))
+            self._mark_changed(conn, sheet, self._get_columns(conn, sheet))
+            self._update_index(sheet, generation_before, self._object_generation(conn, sheet),
+                               remove_id=record['id'])
+            return json.loads(record['data'])
+
+
+booking_store = BookingStore()
@@ -5,6 +5,7 @@ from telegram.ext import ContextTypes
 
 from common.logging_config import setup_logger
 from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
+from main_tg_bot.google_sheets.sync_queue import sync_queue
 
 logger = setup_logger("sync_command")
 
@@ -21,12 +22,15 @@ async def sync_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await update.message.reply_text("🔁 Запуск синхронизации данных...")
 
+        # Сначала отправляем в Google правки из очереди, иначе загрузка из таблицы их затрёт
+        await sync_queue.flush(only_due=False)
+
         # Создаём экземпляр синхронизатора (без data_folder!)
         sync_manager = GoogleSheetsCSVSync()
 
         # Выполняем синхронизацию
         # Используем direction='auto' — он сам решит: google_to_csv или bidirectional
-        results = sync_manager.sync_all_sheets(direction='auto')
+        results = await sync_manager.sync_all_sheets_async(direction='auto', parallel=True)
 
         # Формируем отчёт
         success_count = sum(results.values())
@@ -1,14 +1,15 @@
 # main_tg_bot/command/view_booking.py (или как у вас)
 import os
+import uuid
 from datetime import date
 from pathlib import Path
+from typing import Iterator, List, Optional
 
-import pandas as pd
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 from common.config import Config
 from common.logging_config import setup_logger
-from main_tg_bot.booking_objects import PROJECT_ROOT, get_all_booking_files
+from main_tg_bot.booking_objects import PROJECT_ROOT, booking_repository, drop_typed_columns, get_all_booking_files
 
 logger = setup_logger("view_booking")
 
@@ -18,6 +19,10 @@ BOOKING_DATA_DIR = PROJECT_ROOT / Config.BOOKING_DATA_DIR
 # Префиксы для callback
 VB_CALLBACK_PREFIX = "vb_"
 VB_SHEET_SELECT = f"{VB_CALLBACK_PREFIX}sheet"
+VB_PAGE = f"{VB_CALLBACK_PREFIX}page"
+
+# Максимальная длина текста одного сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
 
 
 
@@ -68,6 +73,11 @@ async def handle_callback(update, context):
         query = update.callback_query
         await query.answer()
 
+        # Листание страниц: редактируем то же сообщение, выбор файла не удаляем
+        if query.data.startswith(VB_PAGE):
+            await show_page(update, context, query.data)
+            return
+
         if query.data.startswith(VB_SHEET_SELECT):
             selected_file = query.data.replace(f"{VB_SHEET_SELECT}_", "")
             await show_bookings(update, context, selected_file)
@@ -118,8 +128,7 @@ def load_bookings_from_csv(file_name: str):
             logger.error(f"File not found: {file_path}")
             return None
 
-        df = pd.read_csv(file_path, encoding='utf-8')
-        df = df.fillna('')
+        df = booking_repository.frame(file_path)
 
         # Проверяем наличие обязательных колонок
         required_cols = {'Заезд', 'Выезд'}
@@ -127,9 +136,9 @@ def load_bookings_from_csv(file_name: str):
             logger.error(f"Missing required columns in {file_name}. Found: {df.columns.tolist()}")
             return None
 
-        df['Заезд'] = pd.to_datetime(df['Заезд'], format='%d.%m.%Y', errors='coerce')
-        df['Выезд'] = pd.to_datetime(df['Выезд'], format='%d.%m.%Y', errors='coerce')
-        df = df.dropna(subset=['Заезд', 'Выезд'])
+        # Кадр из кэша общий — подменяем даты в новом кадре, а не на месте
+        df = df.assign(Заезд=df['_check_in'], Выезд=df['_check_out'])
+        df = drop_typed_columns(df).dropna(subset=['Заезд', 'Выезд'])
 
         return df
     except Exception as e:
@@ -164,9 +173,11 @@ async def show_bookings(update, context, file_name: str):
                        f"📭 Нет активных бронирований в файле {format_file_name(file_name)}")
       return
 
-    messages = prepare_booking_messages(file_name, active_bookings)
-    for msg in messages:
-      await send_reply(update, msg, parse_mode='HTML')
+    # Страницы рендерятся лениво и кэшируются: «Далее» не пересчитывает весь список
+    pages = BookingPages(file_name, iter_booking_chunks(file_name, active_bookings))
+    context.user_data['vb_pages'] = pages
+    await send_reply(update, pages.get(0), reply_markup=page_keyboard(pages, 0),
+                     parse_mode='HTML')
 
     # Информация о типе файла
     if "booking_other" in file_name.lower():
@@ -184,11 +195,8 @@ def format_date(dt):
     return str(dt)
 
 
-def prepare_booking_messages(file_name: str, bookings_df):
-  messages = []
-  display_file_name = format_file_name(file_name)
-  current_message = f"<b>📅 Бронирования из файла {display_file_name}:</b>\n\n"
-
+def _booking_blocks(file_name: str, bookings_df) -> Iterator[str]:
+  """HTML-блоки по каждой брони и свободным периодам между ними"""
   # Флаг для определения, нужно ли показывать свободные периоды
   show_free_periods = "booking_other" not in file_name.lower()
 
@@ -208,33 +216,21 @@ def prepare_booking_messages(file_name: str, bookings_df):
     nights = (check_out - check_in).days if check_in and check_out else 0
 
     # Формируем основную информацию о брони
-    booking_info = (
-      f"<b>🏠 Бронь #{i + 1}</b>\n"
-    )
+    booking_info = [f"<b>🏠 Бронь #{i + 1}</b>\n"]
 
     # Добавляем дополнительные поля для booking_other
     if additional_columns:
-      extra_info = []
-      for col in additional_columns:
-        value = booking.get(col, '')
-        if value:
-          extra_info.append(str(value))
-
+      extra_info = [str(booking.get(col, '')) for col in additional_columns if booking.get(col, '')]
       if extra_info:
-        booking_info += f"<b>📍 Хозяин ({', '.join(extra_info)})</b>\n"
+        booking_info.append(f"<b>📍 Хозяин ({', '.join(extra_info)})</b>\n")
 
-    booking_info += (
+    booking_info.append(
       f"<b>{guest}</b>\n"
       f"📅 {format_date(check_in)} - {format_date(check_out)}\n"
       f"🌙 Ночей: {nights}\n"
       f"💵 Сумма: {booking.get('СуммаБатты', 'Не указана')} батт\n\n"
     )
-
-    if len(current_message + booking_info) > 4000:
-      messages.append(current_message)
-      current_message = booking_info
-    else:
-      current_message += booking_info
+    yield ''.join(booking_info)
 
     # Свободные периоды (только если нужно показывать)
     if show_free_periods and i < len(bookings) - 1:
@@ -242,19 +238,96 @@ def prepare_booking_messages(file_name: str, bookings_df):
       if check_out and next_check_in and check_out != next_check_in:
         free_nights = (next_check_in - check_out).days
         if free_nights > 0:
-          free_period = (
+          yield (
             f"🆓 Свободно:\n"
             f"📅 С {format_date(check_out)} - По {format_date(next_check_in)}\n"
             f"🌙 {free_nights} ночей\n\n"
           )
-          if len(current_message + free_period) > 4000:
-            messages.append(current_message)
-            current_message = free_period
-          else:
-            current_message += free_period
-
-  messages.append(current_message)
-  return messages
+
+
+def _telegram_length(text: str) -> int:
+  # Telegram считает длину в UTF-16: эмодзи занимают две единицы
+  return len(text.encode('utf-16-le')) // 2
+
+
+def iter_booking_chunks(file_name: str, bookings_df,
+                        limit: int = TELEGRAM_MESSAGE_LIMIT) -> Iterator[str]:
+  """
+  Генератор HTML-сообщений не длиннее limit символов.
+
+  Блоки копятся в списке с текущей длиной, поэтому текст не склеивается заново на каждой проверке.
+  """
+  header = f"<b>📅 Бронирования из файла {format_file_name(file_name)}:</b>\n\n"
+  buffer = [header]
+  length = _telegram_length(header)
+
+  for block in _booking_blocks(file_name, bookings_df):
+    block_length = _telegram_length(block)
+    if length + block_length > limit:
+      yield ''.join(buffer)
+      buffer = [block]
+      length = block_length
+    else:
+      buffer.append(block)
+      length += block_length
+
+  yield ''.join(buffer)
+
+
+def prepare_booking_messages(file_name: str, bookings_df) -> List[str]:
+  return list(iter_booking_chunks(file_name, bookings_df))
+
+
+class BookingPages:
+  """Результат /view_booking, разбитый на страницы; следующая страница рендерится по запросу"""
+
+  def __init__(self, file_name: str, chunks: Iterator[str]):
+    self.token = uuid.uuid4().hex[:8]
+    self.file_name = file_name
+    self._chunks = chunks
+    self._pages: List[str] = []
+
+  def get(self, index: int) -> Optional[str]:
+    while len(self._pages) <= index and self._chunks is not None:
+      try:
+        self._pages.append(next(self._chunks))
+      except StopIteration:
+        self._chunks = None
+    return self._pages[index] if 0 <= index < len(self._pages) else None
+
+  def has_next(self, index: int) -> bool:
+    return self.get(index + 1) is not None
+
+
+def page_keyboard(pages: BookingPages, index: int) -> Optional[InlineKeyboardMarkup]:
+  buttons = []
+  if index > 0:
+    buttons.append(InlineKeyboardButton(
+        "◀ Назад", callback_data=f"{VB_PAGE}_{pages.token}_{index - 1}"))
+  if pages.has_next(index):
+    buttons.append(InlineKeyboardButton(
+        f"Далее ▶ (стр. {index + 2})", callback_data=f"{VB_PAGE}_{pages.token}_{index + 1}"))
+  return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+async def show_page(update, context, callback_data: str):
+  """Показывает страницу из закэшированного результата, редактируя текущее сообщение"""
+  try:
+    token, index = callback_data[len(VB_PAGE) + 1:].rsplit('_', 1)
+    index = int(index)
+  except ValueError:
+    logger.warning(f"Bad page callback: {callback_data}")
+    return
+
+  pages: Optional[BookingPages] = context.user_data.get('vb_pages')
+  text = pages.get(index) if pages is not None and pages.token == token else None
+  if text is None:
+    await send_reply(update, "⌛ Список устарел, откройте /view_booking заново")
+    return
+
+  await update.callback_query.edit_message_text(
+      text, parse_mode='HTML', reply_markup=page_keyboard(pages, index))
+
 
 async def send_reply(update, text, reply_markup=None, parse_mode=None):
     try:
@@ -2,14 +2,21 @@
 
 from datetime import date, timedelta
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
-import pandas as pd
 from telegram import Update
 
 from common.config import Config
 from common.logging_config import setup_logger
-from main_tg_bot.booking_objects import PROJECT_ROOT, get_all_booking_files
+from main_tg_bot.availability_engine import AvailabilityEngine
+from main_tg_bot.booking_objects import (
+    PROJECT_ROOT,
+    booking_repository,
+    booking_store,
+    drop_typed_columns,
+    get_all_booking_files,
+    get_booking_sheet_by_filename,
+)
 
 logger = setup_logger("view_dates")
 
@@ -36,17 +43,16 @@ def load_bookings_from_csv(file_name: str):
             logger.error(f"File not found: {file_path}")
             return None
 
-        df = pd.read_csv(file_path, encoding='utf-8')
-        df = df.fillna('')
+        df = booking_repository.frame(file_path)
 
         required_cols = {'Заезд', 'Выезд'}
         if not required_cols.issubset(df.columns):
             logger.error(f"Missing required columns in {file_name}. Found: {df.columns.tolist()}")
             return None
 
-        df['Заезд'] = pd.to_datetime(df['Заезд'], format='%d.%m.%Y', errors='coerce')
-        df['Выезд'] = pd.to_datetime(df['Выезд'], format='%d.%m.%Y', errors='coerce')
-        df = df.dropna(subset=['Заезд', 'Выезд'])
+        # Кадр из кэша общий — подменяем даты в новом кадре, а не на месте
+        df = df.assign(Заезд=df['_check_in'], Выезд=df['_check_out'])
+        df = drop_typed_columns(df).dropna(subset=['Заезд', 'Выезд'])
 
         return df
     except Exception as e:
@@ -54,6 +60,40 @@ def load_bookings_from_csv(file_name: str):
         return None
 
 
+def load_booked_periods(file_name: str) -> Optional[List[Tuple[date, date]]]:
+    """Занятые периоды объекта: из индекса хранилища бронирований, для прочих файлов — из CSV"""
+    booking_sheet = get_booking_sheet_by_filename(file_name)
+    if booking_sheet is not None and booking_sheet.exists():
+        try:
+            return booking_store.booked_periods(booking_sheet)
+        except Exception as e:
+            logger.error(f"Error loading booked periods for {file_name}: {e}", exc_info=True)
+            return None
+
+    df = load_bookings_from_csv(file_name)
+    if df is None:
+        return None
+    return [(check_in.date(), check_out.date()) for check_in, check_out in zip(df['Заезд'], df['Выезд'])]
+
+
+def load_free_periods(file_name: str, engine: Optional[AvailabilityEngine]):
+    """
+    Количество броней и свободные периоды файла: для объектов из BOOKING_SHEETS — из общего
+    календаря занятости, для прочих файлов — по занятым периодам из CSV
+
+    Returns:
+        Optional[Tuple[int, List[Tuple[date, date]]]]: None, если данные не удалось загрузить
+    """
+    booking_sheet = get_booking_sheet_by_filename(file_name)
+    if engine is not None and booking_sheet is not None and booking_sheet.sheet_name in engine:
+        return engine.booking_counts[booking_sheet.sheet_name], engine.free_windows(booking_sheet.sheet_name)
+
+    booked_periods = load_booked_periods(file_name)
+    if booked_periods is None:
+        return None
+    return len(booked_periods), find_free_periods(booked_periods)
+
+
 async def view_dates_handler(update: Update, context):
     """Вывод всех свободных диапазонов дат в разрезе CSV файлов"""
     csv_files = get_all_booking_files()
@@ -62,14 +102,22 @@ async def view_dates_handler(update: Update, context):
         await update.message.reply_text("📭 Нет доступных файлов бронирований в папке `booking_files/`")
         return
 
+    # Один календарь на все объекты вместо отдельного разбора каждого файла
+    try:
+        engine = AvailabilityEngine()
+    except Exception as e:
+        logger.error(f"Error building availability calendar: {e}", exc_info=True)
+        engine = None
+
     for file_name in csv_files:
-        df = load_bookings_from_csv(file_name)
+        loaded = load_free_periods(file_name, engine)
 
-        if df is None:
+        if loaded is None:
             await update.message.reply_text(f"❌ Не удалось загрузить данные из файла {file_name}")
             continue
 
-        if df.empty:
+        booking_count, free_periods = loaded
+        if not booking_count:
             await update.message.reply_text(f"📭 Файл {file_name} не содержит данных")
             continue
 
@@ -80,16 +128,6 @@ async def view_dates_handler(update: Update, context):
         if is_booking_other:
           continue  # просто пропускаем этот файл
 
-        # Формируем список занятых периодов
-        booked_periods = []
-        for _, row in df.iterrows():
-            check_in = row['Заезд'].date()
-            check_out = row['Выезд'].date()
-            booked_periods.append((check_in, check_out))
-
-        # Находим свободные периоды
-        free_periods = find_free_periods(booked_periods)
-
         # Формируем сообщение
         display_name = format_file_name(file_name)
         message = f"📅 <b>Свободные даты для {display_name}</b>\n\n"
@@ -121,6 +159,7 @@ def find_free_periods(
     if not booked_periods:
         return [(start_date, end_date)]
 
+    # Периоды из индекса уже отсортированы, для них sorted почти ничего не стоит
     sorted_periods = sorted(booked_periods, key=lambda x: x[0])
     free_periods = []
     current = start_date
@@ -0,0 +1,122 @@
+# main_tg_bot/google_sheets/availability_snapshot.py
+import hashlib
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common.logging_config import setup_logger
+from main_tg_bot.availability_engine import AVAILABILITY_HORIZON_DAYS, AvailabilityEngine
+from main_tg_bot.booking_objects import (
+    BOOKING_SHEETS, BookingSheet, booking_repository, get_all_booking_files, get_booking_sheet_by_filename
+)
+from main_tg_bot.pricing_engine import read_price_table
+
+logger = setup_logger("availability_snapshot")
+
+AVAILABILITY_FILENAME = "availability.json"
+
+
+def _read_booked_intervals(csv_path: Path) -> List[tuple]:
+    """Отсортированные интервалы (заезд, выезд) с корректными датами."""
+    if not csv_path.exists():
+        return []
+    df = booking_repository.frame(csv_path)
+    check_in, check_out = df['_check_in'], df['_check_out']
+    valid = check_in.notna() & check_out.notna() & (check_out > check_in)
+    intervals = sorted(zip(check_in[valid].dt.date, check_out[valid].dt.date))
+    return intervals
+
+
+def _snapshot_sheets() -> Dict[str, BookingSheet]:
+    """
+    Все CSV-объекты из booking_files: листы BOOKING_SHEETS и остальные *.csv папки.
+
+    PHP без снимка читает каждый booking_files/*.csv, поэтому снимок должен покрывать их все,
+    иначе объект вне BOOKING_SHEETS пропадёт из калькулятора.
+    """
+    sheets = dict(BOOKING_SHEETS)
+    for filename in get_all_booking_files():
+        if get_booking_sheet_by_filename(filename) is None:
+            extra = BookingSheet(Path(filename).stem, filename)
+            sheets[extra.sheet_name] = extra
+    return sheets
+
+
+def _file_md5(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    return hashlib.md5(path.read_bytes()).hexdigest()
+
+
+def _format_windows(windows: List[tuple]) -> List[dict]:
+    return [
+        {"start": s.strftime('%d.%m.%Y'), "end": e.strftime('%d.%m.%Y'), "nights": (e - s).days}
+        for s, e in windows
+    ]
+
+
+def build_availability_snapshot(price_dir: Path, today: Optional[date] = None,
+                                horizon_days: int = AVAILABILITY_HORIZON_DAYS) -> dict:
+    """
+    Собирает компактный снимок занятости по всем CSV-объектам booking_files (см. _snapshot_sheets).
+
+    Для каждого объекта (ключ — имя CSV без расширения, как в PHP):
+    booked — интервалы броней, checkins/checkouts — даты заездов и выездов,
+    free_windows — свободные окна от сегодня на horizon_days вперёд,
+    prices — помесячная таблица цен из task_files/<объект>_price.csv,
+    csv_md5 — md5 CSV, по которому собран объект: PHP берёт снимок, только если md5 всех
+    CSV на сервере совпадают, и не зависит от порядка и времени загрузки файлов.
+    """
+    today = today or date.today()
+    sheets = _snapshot_sheets()
+    # Движок читает кадры через booking_repository — заодно выгружает отложенные брони в CSV
+    engine = AvailabilityEngine(sheets=sheets, start=today, days=horizon_days)
+    objects: Dict[str, dict] = {}
+
+    for sheet_name, booking_sheet in sheets.items():
+        object_key = booking_sheet.filepath.stem
+        # md5 — до чтения броней: если CSV поменяется между ними, PHP увидит несовпадение, а не старые данные
+        csv_md5 = _file_md5(booking_sheet.filepath)
+        try:
+            intervals = _read_booked_intervals(booking_sheet.filepath)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать брони '{sheet_name}': {e}")
+            intervals = []
+
+        booked = [
+            {"start": s.strftime('%d.%m.%Y'), "end": e.strftime('%d.%m.%Y')}
+            for s, e in intervals
+        ]
+        objects[object_key] = {
+            "sheet": sheet_name,
+            "booked": booked,
+            "checkins": list(dict.fromkeys(b["start"] for b in booked)),
+            "checkouts": [d.strftime('%d.%m.%Y') for d in sorted({e for _, e in intervals})],
+            "free_windows": _format_windows(engine.free_windows(sheet_name)),
+            "prices": read_price_table(price_dir / f"{object_key}_price.csv"),
+            "csv_md5": csv_md5,
+        }
+
+    return {
+        # Только дата, а не время: снимок меняется, только когда меняются данные или наступает новый день
+        "generated_for": today.strftime('%d.%m.%Y'),
+        "horizon_days": horizon_days,
+        "objects": objects,
+    }
+
+
+def write_availability_snapshot(output_path: Path, price_dir: Path) -> bool:
+    """Пересобирает снимок и атомарно записывает его в output_path."""
+    try:
+        snapshot = build_availability_snapshot(price_dir)
+        tmp_path = output_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, output_path)
+        logger.info(f"Availability snapshot written: {output_path} ({len(snapshot['objects'])} objects)")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при построении снимка занятости: {e}")
+        return False
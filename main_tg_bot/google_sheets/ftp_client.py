@@ -1,20 +1,156 @@
 # main_tg_bot/ftp_client.py
 import ftplib
+import hashlib
+import json
 import os
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Set, Tuple
 from ftplib import FTP_TLS
 
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессной блокировки манифеста нет
+    fcntl = None
+
+from common.config import Config
 from common.logging_config import setup_logger
+from main_tg_bot.booking_objects import PROJECT_ROOT
 
 logger = setup_logger("ftp_client")
 
+# Сколько секунд простаивающее соединение может лежать в пуле (серверы обычно рвут idle через 300 с)
+FTP_IDLE_TIMEOUT = 120
+# Максимум простаивающих соединений на один сервер
+FTP_MAX_IDLE_CONNECTIONS = 4
+# Количество параллельных соединений при массовой загрузке
+FTP_UPLOAD_WORKERS = 4
+# Файлы от этого размера при обрыве догружаются с места остановки (REST)
+FTP_RESUME_MIN_SIZE = 1024 * 1024
+UPLOAD_MANIFEST_FILE = PROJECT_ROOT / Config.TASK_DATA_DIR / ".ftp_upload_manifest.json"
+
+
+def _file_md5(file_path: Path) -> str:
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class UploadManifest:
+    """
+    Хэши содержимого уже загруженных файлов: "host:port:/remote/dir/file" -> md5
+
+    Манифест общий для бота и планировщика: запись идет под файловой блокировкой
+    и сливает свое изменение с актуальным содержимым файла, а чтение перечитывает
+    файл, если его изменил другой процесс.
+    """
+
+    def __init__(self, manifest_file: Path = UPLOAD_MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.lock_file = manifest_file.with_suffix('.lock')
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, str] = {}
+        self._file_signature: Optional[Tuple[int, int, int]] = None
+
+    def _load(self) -> Dict[str, str]:
+        """Перечитывает манифест, если файл изменился с прошлого чтения"""
+        try:
+            stat = self.manifest_file.stat()
+        except FileNotFoundError:
+            self._hashes, self._file_signature = {}, None
+            return self._hashes
+
+        # os.replace создает новый inode, поэтому запись другого процесса видна даже при том же mtime
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature != self._file_signature:
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    self._hashes = json.load(f)
+                self._file_signature = signature
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать манифест загрузок {self.manifest_file}: {e}")
+        return self._hashes
+
+    @contextmanager
+    def _file_lock(self):
+        """Межпроцессная блокировка манифеста на время чтения-изменения-записи"""
+        with open(self.lock_file, 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._load().get(key)
+
+    def set(self, key: str, content_hash: str):
+        with self._lock:
+            try:
+                with self._file_lock():
+                    # Сливаем с тем, что успели записать другие процессы
+                    hashes = self._load()
+                    hashes[key] = content_hash
+                    tmp_path = self.manifest_file.with_suffix(f'.{os.getpid()}.tmp')
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(hashes, f, ensure_ascii=False)
+                    os.replace(tmp_path, self.manifest_file)
+                    stat = self.manifest_file.stat()
+                    self._file_signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить манифест загрузок {self.manifest_file}: {e}")
+
+
+upload_manifest = UploadManifest()
+
+
+class ReusedSessionFTP_TLS(FTP_TLS):
+    """
+    FTP_TLS, переиспользующий TLS-сессию.
+
+    Каналы данных возобновляют сессию управляющего соединения (этого требуют многие
+    FTPS-серверы, например vsftpd с require_ssl_reuse), а новое управляющее соединение
+    может возобновить сессию, полученную ранее другим соединением к тому же серверу.
+    """
+
+    def __init__(self, *args, tls_session: Optional[ssl.SSLSession] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tls_session = tls_session
+
+    def auth(self):
+        if isinstance(self.sock, ssl.SSLSocket):
+            raise ValueError("Already using TLS")
+        resp = self.voidcmd('AUTH TLS')
+        self.sock = self.context.wrap_socket(self.sock, server_hostname=self.host, session=self.tls_session)
+        self.file = self.sock.makefile(mode='r', encoding=self.encoding)
+        return resp
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = ftplib.FTP.ntransfercmd(self, cmd, rest)
+        if self._prot_p:
+            conn = self.context.wrap_socket(conn, server_hostname=self.host, session=self.sock.session)
+        return conn, size
+
 
 class FTPClient:
-    def __init__(self):
+    def __init__(self, known_dirs: Optional[Set[str]] = None):
         self.ftp = None
+        # Директории, про которые уже известно, что они существуют (можно разделять между соединениями)
+        self.known_dirs: Set[str] = known_dirs if known_dirs is not None else set()
+        self._cwd: Optional[str] = None
+        self.host: Optional[str] = None
 
-    def connect(self, host: str, username: str, password: str, port: int = 21, use_ftps: bool = False) -> bool:
+    def connect(self, host: str, username: str, password: str, port: int = 21, use_ftps: bool = False,
+                tls_session: Optional[ssl.SSLSession] = None) -> bool:
         """
         Подключение к FTP/FTPS серверу
 
@@ -24,13 +160,15 @@ class FTPClient:
             password: Пароль
             port: Порт (по умолчанию 21)
             use_ftps: Использовать FTPS (безопасный FTP)
+            tls_session: TLS-сессия прошлого соединения к этому серверу (для быстрого рукопожатия)
 
         Returns:
             bool: True если подключение успешно
         """
+        self.host = f"{host}:{port}"
         try:
             if use_ftps:
-                self.ftp = FTP_TLS()
+                self.ftp = ReusedSessionFTP_TLS(tls_session=tls_session)
                 self.ftp.connect(host, port)
                 self.ftp.login(username, password)
                 self.ftp.prot_p()  # Включаем защищенный канал данных
@@ -57,17 +195,42 @@ class FTPClient:
                 logger.error(f"Ошибка при закрытии соединения: {e}")
             finally:
                 self.ftp = None
+                self._cwd = None
+
+    @property
+    def tls_session(self) -> Optional[ssl.SSLSession]:
+        """TLS-сессия управляющего соединения (None для обычного FTP)"""
+        sock = getattr(self.ftp, 'sock', None)
+        return sock.session if isinstance(sock, ssl.SSLSocket) else None
+
+    def is_alive(self) -> bool:
+        """Проверяет управляющее соединение командой NOOP"""
+        if not self.ftp:
+            return False
+        try:
+            self.ftp.voidcmd("NOOP")
+            return True
+        except Exception as e:
+            logger.debug(f"FTP соединение не отвечает на NOOP: {e}")
+            return False
+
+    def _change_directory(self, remote_path: str):
+        """cwd с запоминанием текущей директории, чтобы не повторять команду для каждого файла"""
+        if self._cwd != remote_path:
+            self.ftp.cwd(remote_path)
+            self._cwd = remote_path
 
     def _create_remote_directory(self, remote_path: str):
         """
         Рекурсивно создает директории на FTP сервере
         """
-        if not remote_path or remote_path == "/":
+        if not remote_path or remote_path == "/" or remote_path in self.known_dirs:
             return
 
         try:
             # Пробуем перейти в директорию
-            self.ftp.cwd(remote_path)
+            self._change_directory(remote_path)
+            self.known_dirs.add(remote_path)
             logger.debug(f"Директория уже существует: {remote_path}")
             return  # Папка существует - выходим
         except ftplib.error_perm as e:
@@ -94,22 +257,30 @@ class FTPClient:
                         logger.debug(f"Директория уже существует (проигнорировано): {remote_path}")
                     else:
                         raise
+                self.known_dirs.add(remote_path)
             else:
                 # Другая ошибка (например, 5xx - права доступа)
                 logger.warning(f"Не удалось перейти в {remote_path}: {error_msg}")
                 raise
 
-    def upload_file(self, local_file_path: Path, remote_filename: str = None, remote_path: str = "/") -> bool:
+    def upload_file(self, local_file_path: Path, remote_filename: str = None, remote_path: str = "/",
+                    skip_unchanged: bool = True) -> bool:
         """
         Загружает один файл на FTP сервер
 
+        Файл сначала загружается под временным именем и затем переименовывается (RNFR/RNTO)
+        в целевое, поэтому PHP-страницы никогда не читают недописанный CSV. Если содержимое
+        не изменилось с прошлой загрузки (по манифесту хэшей), загрузка пропускается.
+        Прерванная загрузка большого файла продолжается с места обрыва (REST).
+
         Args:
             local_file_path: Локальный путь к файлу
             remote_filename: Имя файла на сервере (если None, используется оригинальное имя)
             remote_path: Удаленная директория
+            skip_unchanged: Пропускать файл, если его содержимое уже загружено
 
         Returns:
-            bool: True если файл успешно загружен
+            bool: True если файл успешно загружен (или не требовал загрузки)
         """
         if not self.ftp:
             logger.error("FTP соединение не установлено")
@@ -119,27 +290,114 @@ class FTPClient:
             logger.error(f"Локальный файл не существует: {local_file_path}")
             return False
 
+        temp_filename = None
+        resumable = True
         try:
-            # Создаем удаленную директорию если нужно
-            if remote_path and remote_path != "/":
-                self._create_remote_directory(remote_path)
-                self.ftp.cwd(remote_path)
-
             # Определяем имя файла на сервере
             if remote_filename is None:
                 remote_filename = local_file_path.name
 
-            # Загружаем файл
-            with open(local_file_path, 'rb') as f:
-                self.ftp.storbinary(f"STOR {remote_filename}", f)
+            content_hash = _file_md5(local_file_path)
+            manifest_key = f"{self.host}:{remote_path.rstrip('/')}/{remote_filename}"
+            if skip_unchanged and upload_manifest.get(manifest_key) == content_hash:
+                logger.info(f"Файл {local_file_path.name} не изменился, загрузка пропущена")
+                return True
 
+            # Создаем удаленную директорию если нужно
+            if remote_path and remote_path != "/":
+                self._create_remote_directory(remote_path)
+                self._change_directory(remote_path)
+
+            # Временное имя содержит хэш: недокачанный кусок можно продолжить только для того же содержимого
+            resumable = local_file_path.stat().st_size >= FTP_RESUME_MIN_SIZE
+            temp_filename = f".{remote_filename}.{content_hash[:8]}.part"
+            self._store_resumable(local_file_path, temp_filename)
+            self._rename_into_place(temp_filename, remote_filename)
+            temp_filename = None
+            if resumable:
+                # Куски прерванных загрузок прежнего содержимого уже не продолжить
+                self._remove_stale_parts(remote_filename)
+
+            upload_manifest.set(manifest_key, content_hash)
             logger.info(f"Файл {local_file_path.name} успешно загружен на FTP сервер")
             return True
 
         except Exception as e:
             logger.error(f"Ошибка при загрузке файла {local_file_path} на FTP: {e}")
+            # Недокачанный маленький файл не продолжается через REST — удаляем его сразу
+            if temp_filename and not resumable:
+                self._discard_remote(temp_filename)
+            # После ошибки текущая директория на сервере неизвестна
+            self._cwd = None
             return False
 
+    def _store_resumable(self, local_file_path: Path, remote_filename: str):
+        """STOR файла; для больших файлов продолжает ранее прерванную загрузку через REST"""
+        local_size = local_file_path.stat().st_size
+        offset = 0
+        if local_size >= FTP_RESUME_MIN_SIZE:
+            try:
+                self.ftp.voidcmd("TYPE I")
+                remote_size = self.ftp.size(remote_filename) or 0
+                if 0 < remote_size < local_size:
+                    offset = remote_size
+            except ftplib.error_perm:
+                # Файла нет или сервер не поддерживает SIZE
+                offset = 0
+
+        with open(local_file_path, 'rb') as f:
+            if offset:
+                f.seek(offset)
+                try:
+                    self.ftp.storbinary(f"STOR {remote_filename}", f, rest=offset)
+                    logger.info(f"Загрузка {local_file_path.name} продолжена с {offset} байт")
+                    return
+                except ftplib.error_perm as e:
+                    # Сервер не поддерживает REST для STOR — загружаем целиком
+                    logger.debug(f"REST не поддерживается ({e}), загружаем файл целиком")
+                    f.seek(0)
+            self.ftp.storbinary(f"STOR {remote_filename}", f)
+
+    def _rename_into_place(self, temp_filename: str, remote_filename: str):
+        """Атомарно заменяет целевой файл загруженным временным (RNFR/RNTO)"""
+        try:
+            self.ftp.rename(temp_filename, remote_filename)
+        except ftplib.error_perm as e:
+            # Некоторые серверы не переименовывают поверх существующего файла.
+            # Такая замена не атомарна: между DELETE и RNTO PHP-страницы файла не найдут
+            logger.warning(f"Сервер не заменил {remote_filename} переименованием ({e}), "
+                           f"удаляем старый файл и переименовываем повторно")
+            try:
+                self.ftp.delete(remote_filename)
+            except ftplib.error_perm:
+                pass
+            self.ftp.rename(temp_filename, remote_filename)
+
+    def _discard_remote(self, remote_filename: str):
+        """Удаляет файл в текущей директории, не прерывая работу при ошибке"""
+        try:
+            self.ftp.delete(remote_filename)
+            logger.debug(f"Удален временный файл {remote_filename}")
+        except Exception as e:
+            logger.debug(f"Не удалось удалить временный файл {remote_filename}: {e}")
+
+    def _remove_stale_parts(self, remote_filename: str):
+        """Удаляет оставшиеся от прерванных загрузок временные файлы .<имя>.<хэш>.part"""
+        prefix = f".{remote_filename}."
+        try:
+            try:
+                # Многие серверы скрывают файлы с точкой из NLST без -a
+                names = self.ftp.nlst('-a')
+            except ftplib.error_perm:
+                names = self.ftp.nlst()
+        except Exception as e:
+            logger.debug(f"Не удалось получить список файлов для очистки .part: {e}")
+            return
+        for name in names:
+            name = os.path.basename(name)
+            if name.startswith(prefix) and name.endswith('.part'):
+                self._discard_remote(name)
+
     def upload_files(self, file_paths: List[Path], remote_path: str = "/") -> Dict[Path, bool]:
         """
         Загружает несколько файлов на FTP сервер
@@ -159,6 +417,23 @@ class FTPClient:
 
         return results
 
+    def upload_batch(self, uploads: List[Tuple[Path, str]]) -> Dict[Path, bool]:
+        """
+        Загружает несколько файлов в разные директории по одному управляющему соединению
+
+        Args:
+            uploads: Список пар (локальный путь, удаленная директория)
+
+        Returns:
+            Dict[Path, bool]: Словарь с результатами загрузки для каждого файла
+        """
+        # Группируем по директории, чтобы cwd выполнялся один раз на директорию
+        ordered = sorted(uploads, key=lambda item: item[1])
+        return {
+            file_path: self.upload_file(file_path, remote_path=remote_path)
+            for file_path, remote_path in ordered
+        }
+
     def list_files(self, remote_path: str = "/") -> List[str]:
         """
         Получает список файлов в удаленной директории
@@ -169,7 +444,7 @@ class FTPClient:
 
         try:
             if remote_path and remote_path != "/":
-                self.ftp.cwd(remote_path)
+                self._change_directory(remote_path)
 
             files = self.ftp.nlst()
             logger.info(f"Найдено {len(files)} файлов в директории {remote_path}")
@@ -189,7 +464,7 @@ class FTPClient:
 
         try:
             if remote_path and remote_path != "/":
-                self.ftp.cwd(remote_path)
+                self._change_directory(remote_path)
 
             self.ftp.delete(remote_filename)
             logger.info(f"Файл {remote_filename} удален с FTP сервера")
@@ -198,3 +473,144 @@ class FTPClient:
         except Exception as e:
             logger.error(f"Ошибка при удалении файла {remote_filename}: {e}")
             return False
+
+
+class FTPConnectionPool:
+    """
+    Пул постоянных FTP-соединений (общий для процесса).
+
+    Соединения переиспользуются между загрузками: перед выдачей проверяются командой NOOP,
+    простаивающие дольше idle_timeout закрываются. Известные существующие директории
+    запоминаются на уровне сервера, поэтому cwd/mkd для них не повторяются.
+    """
+
+    def __init__(self, idle_timeout: float = FTP_IDLE_TIMEOUT,
+                 max_idle: int = FTP_MAX_IDLE_CONNECTIONS):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # (host, port, user, use_ftps) -> [(время возврата в пул, FTPClient), ...]
+        self._idle: Dict[tuple, List[Tuple[float, FTPClient]]] = {}
+        self._known_dirs: Dict[tuple, Set[str]] = {}
+        # Последняя TLS-сессия к серверу: новые FTPS-соединения возобновляют её
+        self._tls_sessions: Dict[tuple, ssl.SSLSession] = {}
+
+    def _acquire(self, key: tuple, password: str) -> Optional[FTPClient]:
+        host, port, username, use_ftps = key
+        stale = []
+        client = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            now = time.monotonic()
+            while idle:
+                released_at, candidate = idle.pop()
+                if now - released_at > self.idle_timeout:
+                    stale.append(candidate)
+                    continue
+                client = candidate
+                break
+            known_dirs = self._known_dirs.setdefault(key, set())
+            tls_session = self._tls_sessions.get(key)
+
+        for old_client in stale:
+            old_client.disconnect()
+
+        if client is not None:
+            if client.is_alive():
+                return client
+            client.disconnect()
+
+        client = FTPClient(known_dirs=known_dirs)
+        if not client.connect(host, username, password, port, use_ftps, tls_session=tls_session):
+            return None
+        if client.tls_session is not None:
+            with self._lock:
+                self._tls_sessions[key] = client.tls_session
+        return client
+
+    def _release(self, key: tuple, client: FTPClient):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if client.ftp is not None and len(idle) < self.max_idle:
+                idle.append((time.monotonic(), client))
+                return
+        client.disconnect()
+
+    @contextmanager
+    def connection(self, host: str, username: str, password: str,
+                   port: int = 21, use_ftps: bool = False):
+        """
+        Выдает подключенный FTPClient (или None, если подключиться не удалось)
+
+        Пример:
+            with ftp_pool.connection(host, user, password) as ftp_client:
+                if ftp_client:
+                    ftp_client.upload_file(path, remote_path="/dir")
+        """
+        key = (host, port, username, use_ftps)
+        client = self._acquire(key, password)
+        try:
+            yield client
+        except Exception:
+            if client is not None:
+                client.disconnect()
+                client = None
+            raise
+        finally:
+            if client is not None:
+                self._release(key, client)
+
+    def upload_parallel(self, uploads: List[Tuple[Path, str]], host: str, username: str, password: str,
+                        port: int = 21, use_ftps: bool = False,
+                        workers: int = FTP_UPLOAD_WORKERS) -> Dict[Path, bool]:
+        """
+        Загружает файлы по нескольким соединениям одновременно
+
+        Args:
+            uploads: Список пар (локальный путь, удаленная директория)
+            workers: Количество параллельных соединений
+
+        Returns:
+            Dict[Path, bool]: Результат загрузки для каждого файла
+        """
+        if not uploads:
+            return {}
+
+        workers = max(1, min(workers, len(uploads)))
+
+        def upload_chunk(chunk: List[Tuple[Path, str]]) -> Dict[Path, bool]:
+            with self.connection(host, username, password, port, use_ftps) as ftp_client:
+                if ftp_client is None:
+                    return {file_path: False for file_path, _ in chunk}
+                return ftp_client.upload_batch(chunk)
+
+        # Первая порция (по одному файлу на директорию) идет по одному соединению:
+        # она создает директории и TLS-сессию, которые затем переиспользуют остальные соединения
+        first_by_dir: Dict[str, Tuple[Path, str]] = {}
+        for item in uploads:
+            first_by_dir.setdefault(item[1], item)
+        first = list(first_by_dir.values())
+        rest = [item for item in uploads if item not in first]
+        results = upload_chunk(first)
+        if not rest:
+            return results
+
+        chunks = [rest[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ftp-upload") as pool:
+            for chunk_results in pool.map(upload_chunk, [chunk for chunk in chunks if chunk]):
+                results.update(chunk_results)
+
+        uploaded = sum(results.values())
+        logger.info(f"Параллельная загрузка завершена: {uploaded}/{len(results)} файлов, соединений: {workers}")
+        return results
+
+    def close_all(self):
+        """Закрывает все простаивающие соединения"""
+        with self._lock:
+            clients = [client for idle in self._idle.values() for _, client in idle]
+            self._idle.clear()
+        for client in clients:
+            client.disconnect()
+
+
+ftp_pool = FTPConnectionPool()
@@ -0,0 +1,105 @@
+# main_tg_bot/google_sheets/sheets_client_cache.py
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import gspread
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+
+from common.config import Config
+from common.logging_config import setup_logger
+
+logger = setup_logger("sheets_client_cache")
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Через сколько секунд заново читать service account и авторизоваться
+CLIENT_TTL = 3600
+# Сколько секунд держать открытую таблицу и её листы (метаданные могут меняться)
+SPREADSHEET_TTL = 600
+
+
+class SheetsClientCache:
+    """
+    Процессный кэш авторизованного gspread-клиента, открытых таблиц и листов.
+
+    Все экземпляры GoogleSheetsCSVSync пользуются одним клиентом, поэтому service account
+    читается и авторизуется один раз, а open_by_key / worksheet не повторяются на каждую операцию.
+    """
+
+    def __init__(self, client_ttl: int = CLIENT_TTL, spreadsheet_ttl: int = SPREADSHEET_TTL):
+        self.client_ttl = client_ttl
+        self.spreadsheet_ttl = spreadsheet_ttl
+        self._lock = threading.RLock()
+        self._client: Optional[gspread.Client] = None
+        self._credentials: Optional[Credentials] = None
+        self._client_created_at = 0.0
+        # spreadsheet_id -> (время открытия, Spreadsheet, {sheet_name: Worksheet})
+        self._spreadsheets: Dict[str, Tuple[float, gspread.Spreadsheet, Dict[str, gspread.Worksheet]]] = {}
+
+    def _load_credentials(self, scopes: List[str]) -> Credentials:
+        creds_json = Config.SERVICE_ACCOUNT_FILE
+        if not creds_json:
+            raise ValueError("SERVICE_ACCOUNT_FILE not set")
+
+        if os.path.exists(creds_json):
+            with open(creds_json, 'r') as f:
+                creds_dict = json.load(f)
+        else:
+            creds_dict = json.loads(creds_json)
+
+        return Credentials.from_service_account_info(creds_dict, scopes=scopes)
+
+    def get_client(self, scopes: List[str] = None) -> gspread.Client:
+        """Возвращает общий клиент, переавторизуясь по истечении TTL и обновляя просроченный токен."""
+        with self._lock:
+            now = time.monotonic()
+            if self._client is None or now - self._client_created_at > self.client_ttl:
+                self._credentials = self._load_credentials(scopes or SCOPES)
+                self._client = gspread.authorize(self._credentials)
+                self._client_created_at = now
+                self._spreadsheets.clear()
+                logger.info("Google Sheets client authorized")
+            elif not self._credentials.valid:
+                try:
+                    self._credentials.refresh(Request())
+                    logger.debug("Google Sheets access token refreshed")
+                except Exception as e:
+                    logger.warning(f"Не удалось обновить токен Google, переавторизация: {e}")
+                    self._client = None
+                    return self.get_client(scopes)
+            return self._client
+
+    def get_spreadsheet(self, spreadsheet_id: str, fresh: bool = False) -> gspread.Spreadsheet:
+        with self._lock:
+            entry = self._spreadsheets.get(spreadsheet_id)
+            if fresh or entry is None or time.monotonic() - entry[0] > self.spreadsheet_ttl:
+                spreadsheet = self.get_client().open_by_key(spreadsheet_id)
+                entry = (time.monotonic(), spreadsheet, {})
+                self._spreadsheets[spreadsheet_id] = entry
+            return entry[1]
+
+    def get_worksheet(self, spreadsheet_id: str, sheet_name: str, fresh: bool = False) -> gspread.Worksheet:
+        with self._lock:
+            spreadsheet = self.get_spreadsheet(spreadsheet_id, fresh=fresh)
+            worksheets = self._spreadsheets[spreadsheet_id][2]
+            if sheet_name not in worksheets:
+                worksheets[sheet_name] = spreadsheet.worksheet(sheet_name)
+            return worksheets[sheet_name]
+
+    def invalidate(self, spreadsheet_id: str = None):
+        """Сбрасывает закэшированную таблицу (или все таблицы), например после ошибки API."""
+        with self._lock:
+            if spreadsheet_id is None:
+                self._spreadsheets.clear()
+            else:
+                self._spreadsheets.pop(spreadsheet_id, None)
+
+
+sheets_cache = SheetsClientCache()
@@ -1,26 +1,61 @@
 # main_tg_bot/sync_manager.py
+import asyncio
+import difflib
+import functools
 import hashlib
 import json
 import os
+import re
+import threading
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-import gspread
 import pandas as pd
-from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
 
 from common.config import Config
 from common.logging_config import setup_logger
 # Импортируем booking-объекты
-from main_tg_bot.booking_objects import BOOKING_SHEETS, PROJECT_ROOT
-from main_tg_bot.google_sheets.ftp_client import FTPClient
+from main_tg_bot.booking_objects import (
+    BOOKING_DATE_FORMATS, BOOKING_SHEETS, PROJECT_ROOT, booking_store, parse_dates, sheet_lock
+)
+from main_tg_bot.google_sheets.availability_snapshot import AVAILABILITY_FILENAME, write_availability_snapshot
+from main_tg_bot.google_sheets.ftp_client import FTP_UPLOAD_WORKERS, ftp_pool
+from main_tg_bot.google_sheets.sheets_client_cache import sheets_cache
+from main_tg_bot.google_sheets.sync_queue import sync_queue
 
 logger = setup_logger("sync_manager")
 
+# Служебные столбцы, не участвующие в хэше строки
+SERVICE_COLUMNS = {'_sync_id', '_hash', '_sheet_name', '_last_sync'}
+# Версия формата _hash. При изменении формата старые отпечатки в манифестах
+# считаются недействительными и следующий push будет полным.
+ROW_HASH_VERSION = 1
+# Размер пула потоков для параллельной синхронизации листов
+SYNC_MAX_WORKERS = 4
+# Нулевой день сериальных дат Google Таблиц
+SHEETS_EPOCH = date(1899, 12, 30)
+# Строки, которые USER_ENTERED превращает в число
+NUMBER_PATTERN = re.compile(r'-?\d+(\.\d+)?')
+
 
 class GoogleSheetsCSVSync:
+    # Манифесты последней синхронизации (общие для всех экземпляров процесса, дублируются на диск):
+    # sheet_name -> {'columns': [...], 'rows': [(_sync_id, _hash), ...], 'rows_revision': str,
+    #                'remote_revision': str, 'local_signature': str, 'synced_at': str}
+    # rows_revision — ревизия таблицы сразу после отправки rows; remote_revision — после
+    # последней синхронизации в любую сторону
+    _sync_manifests: Dict[str, dict] = {}
+
+    # Пул для sync_sheet_async и блокировки по листам (общие для процесса)
+    _async_executor: Optional[ThreadPoolExecutor] = None
+    _sheet_locks: Dict[str, threading.RLock] = {}
+    _locks_guard = threading.Lock()
+    _availability_lock = threading.Lock()
+
     def __init__(self):
         self.scope = [
             "https://www.googleapis.com/auth/spreadsheets",
@@ -45,6 +80,8 @@ class GoogleSheetsCSVSync:
             'Сумма помесячно Citygate P311': 'citygate_p311_price.csv',
             'Сумма помесячно HALO Title': 'halo_title_price.csv'
         }
+        # Листы с помесячными ценами (входят в availability.json)
+        self.price_sheets = {'Сумма помесячно Citygate P311', 'Сумма помесячно HALO Title'}
 
         # Форматирование для сохранения внешнего вида в Google Таблице
         self.column_formats = {
@@ -76,31 +113,20 @@ class GoogleSheetsCSVSync:
             self.sheet_to_spreadsheet[sheet_name] = Config.BOOKING_TASK_SPREADSHEET_ID
             self.sheet_to_filepath[sheet_name] = self.task_dir / filename
 
+        # Результаты последней массовой FTP-загрузки: sheet_name -> успех
+        self.last_upload_results: Dict[str, bool] = {}
+
         self.clients = {}
         self._initialize_clients()
 
 
     def _initialize_clients(self):
+        """Берёт общий авторизованный клиент из процессного кэша (без повторного чтения service account)."""
         try:
-            creds_json = Config.SERVICE_ACCOUNT_FILE
-            if not creds_json:
-                raise ValueError("SERVICE_ACCOUNT_FILE not set")
-
-            if os.path.exists(creds_json):
-                with open(creds_json, 'r') as f:
-                    creds_dict = json.load(f)
-            else:
-                creds_dict = json.loads(creds_json)
-
-            credentials = Credentials.from_service_account_info(
-                creds_dict, scopes=self.scope
-            )
-
+            client = sheets_cache.get_client(self.scope)
             for spreadsheet_id in {Config.BOOKING_SPREADSHEET_ID, Config.BOOKING_TASK_SPREADSHEET_ID}:
                 if spreadsheet_id:
-                    client = gspread.authorize(credentials)
                     self.clients[spreadsheet_id] = client
-                    logger.info(f"Google Sheets client initialized for spreadsheet: {spreadsheet_id}")
 
         except Exception as e:
             logger.error(f"Error initializing Google Sheets clients: {e}")
@@ -115,38 +141,69 @@ class GoogleSheetsCSVSync:
         if df.empty:
             return df
         if '_sync_id' not in df.columns:
-            df['_sync_id'] = [str(uuid.uuid4()) for _ in range(len(df))]
+            df['_sync_id'] = self._new_sync_ids(len(df))
         else:
-            def fill_empty(x):
-                if pd.isna(x) or (isinstance(x, str) and x.strip() == ''):
-                    return str(uuid.uuid4())
-                return str(x)
-            df['_sync_id'] = df['_sync_id'].apply(fill_empty)
+            sync_ids = df['_sync_id']
+            missing = sync_ids.isna() | (sync_ids.astype(str).str.strip() == '')
+            sync_ids = sync_ids.astype(str)
+            if missing.any():
+                sync_ids.loc[missing] = self._new_sync_ids(int(missing.sum()))
+            df['_sync_id'] = sync_ids
         return df
 
-    def _generate_row_hash(self, row: pd.Series) -> str:
-        exclude = {'_sync_id', '_hash', '_sheet_name', '_last_sync'}
-        cols = sorted([c for c in row.index if c not in exclude])
-        parts = []
-        for c in cols:
-            val = row[c]
-            if pd.notna(val) and str(val).strip() != '':
-                parts.append(f"{c}:{str(val).strip()}")
-        return hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
-
-    def _is_row_empty(self, row: pd.Series) -> bool:
-        """Возвращает True, если строка пустая (все значимые поля — пустые)."""
-        exclude = {'_sync_id', '_hash', '_sheet_name', '_last_sync'}
-        for col in row.index:
-            if col in exclude:
-                continue
-            val = row[col]
-            if pd.notna(val) and str(val).strip() != '':
-                return False
-        return True
+    @staticmethod
+    def _new_sync_ids(count: int) -> List[str]:
+        """Генерирует count UUID4 из одного блока случайных байт."""
+        raw = os.urandom(16 * count)
+        return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
+
+    def _normalized_cells(self, df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """Обрезанные строковые значения значимых столбцов ('' для пустых и NaN), в порядке сортировки имён."""
+        cells = {}
+        for col in sorted(c for c in df.columns if c not in SERVICE_COLUMNS):
+            values = df[col]
+            cells[col] = values.astype(str).str.strip().where(values.notna(), '')
+        return cells
+
+    def _generate_row_hashes(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Хэши строк одним проходом по столбцам.
+
+        Формат строки для хэширования совпадает с прежним построчным вариантом
+        (версия ROW_HASH_VERSION): md5 от "col:val|col:val" по непустым значимым полям
+        в порядке сортировки имён столбцов.
+        """
+        if df.empty:
+            return pd.Series([], index=df.index, dtype=str)
+
+        joined = pd.Series('', index=df.index)
+        for col, values in self._normalized_cells(df).items():
+            joined = joined + ('|' + col + ':' + values).where(values != '', '')
+        # Убираем ведущий разделитель первого непустого поля
+        joined = joined.str[1:]
+
+        return pd.Series(
+            [hashlib.md5(s.encode('utf-8')).hexdigest() for s in joined],
+            index=df.index
+        )
+
+    def _empty_row_mask(self, df: pd.DataFrame) -> pd.Series:
+        """True для пустых строк (все значимые поля — пустые)."""
+        mask = pd.Series(True, index=df.index)
+        for values in self._normalized_cells(df).values():
+            mask &= values == ''
+        return mask
+
+    @staticmethod
+    def _export_from_store(sheet_name: str):
+        """Дописывает в CSV брони, сохранённые через BookingStore, но ещё не выгруженные в файл."""
+        booking_sheet = BOOKING_SHEETS.get(sheet_name)
+        if booking_sheet is not None:
+            booking_store.export_csv(booking_sheet)
 
     def load_local_csv(self, sheet_name: str) -> pd.DataFrame:
         csv_file = self._get_csv_path(sheet_name)
+        self._export_from_store(sheet_name)
         if not csv_file.exists():
             return pd.DataFrame()
 
@@ -159,23 +216,13 @@ class GoogleSheetsCSVSync:
             for col in phone_columns:
                 if col not in df.columns:
                     continue
-
-                def remove_leading_plus(val):
-                    if pd.isna(val) or str(val).strip() == '':
-                        return ''
-                    val = str(val).strip()
-                    # Удаляем "+" в начале строки, если он есть
-                    if val.startswith('+'):
-                        val = val[1:]
-                    return val
-
-                df[col] = df[col].apply(remove_leading_plus)
+                df[col] = df[col].str.strip().str.replace(r'^\+', '', regex=True)
 
             # --- ОСТАЛЬНЫЙ КОД БЕЗ ИЗМЕНЕНИЙ ---
             df = self._ensure_sync_id(df)
             df['_sheet_name'] = sheet_name
             df['_last_sync'] = datetime.now().isoformat()
-            df['_hash'] = df.apply(self._generate_row_hash, axis=1)
+            df['_hash'] = self._generate_row_hashes(df)
             logger.info(f"Loaded {len(df)} rows from local CSV: {csv_file}")
             return df
 
@@ -187,7 +234,10 @@ class GoogleSheetsCSVSync:
         csv_file = self._get_csv_path(sheet_name)
         try:
             save_df = df.drop(columns=['_hash', '_sheet_name', '_last_sync'], errors='ignore')
-            save_df.to_csv(csv_file, index=False, encoding='utf-8')
+            # Через временный файл: BookingStore и PHP не должны увидеть наполовину записанный CSV
+            tmp_path = csv_file.with_suffix('.csv.tmp')
+            save_df.to_csv(tmp_path, index=False, encoding='utf-8')
+            os.replace(tmp_path, csv_file)
             logger.info(f"Saved {len(save_df)} rows to local CSV: {csv_file}")
         except Exception as e:
             logger.error(f"Error saving to local CSV {csv_file}: {e}")
@@ -200,75 +250,457 @@ class GoogleSheetsCSVSync:
                 logger.error(f"No client found for sheet: {sheet_name}")
                 return pd.DataFrame()
 
-            spreadsheet = client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+            worksheet = sheets_cache.get_worksheet(spreadsheet_id, sheet_name)
             values = worksheet.get_all_values()
+            return self._values_to_dataframe(sheet_name, values)
 
-            if not values:
-                return pd.DataFrame()
+        except Exception as e:
+            sheets_cache.invalidate(self.sheet_to_spreadsheet.get(sheet_name))
+            logger.error(f"Error downloading sheet {sheet_name}: {e}")
+            return pd.DataFrame()
 
-            headers = values[0]
-            data = values[1:] if len(values) > 1 else []
+    def download_sheets(self, sheet_names: List[str], force: bool = False
+                        ) -> Dict[str, Tuple[Optional[pd.DataFrame], Optional[str]]]:
+        """
+        Скачивает несколько листов одним values_batch_get на каждую таблицу.
 
-            for i, row in enumerate(data):
-                if len(row) < len(headers):
-                    data[i] = row + [''] * (len(headers) - len(row))
-                elif len(row) > len(headers):
-                    data[i] = row[:len(headers)]
+        Returns:
+            sheet_name -> (DataFrame, ревизия таблицы). DataFrame равен None, если лист
+            не менялся с прошлой синхронизации (и force=False). Листы, которые не удалось
+            скачать пакетом, в результат не попадают.
+        """
+        by_spreadsheet: Dict[str, List[str]] = {}
+        for sheet_name in sheet_names:
+            spreadsheet_id = self.sheet_to_spreadsheet.get(sheet_name)
+            if spreadsheet_id and spreadsheet_id in self.clients:
+                by_spreadsheet.setdefault(spreadsheet_id, []).append(sheet_name)
 
-            df = pd.DataFrame(data, columns=headers)
-            df = df.fillna('')
-            df = self._ensure_sync_id(df)
-            df['_sheet_name'] = sheet_name
-            df['_last_sync'] = datetime.now().isoformat()
-            df['_hash'] = df.apply(self._generate_row_hash, axis=1)
+        downloaded = {}
+        for spreadsheet_id, names in by_spreadsheet.items():
+            try:
+                spreadsheet = sheets_cache.get_spreadsheet(spreadsheet_id)
+                revision = self._spreadsheet_revision(spreadsheet)
 
-            logger.info(f"Downloaded {len(df)} rows from sheet: {sheet_name}")
-            return df
+                pending = []
+                for sheet_name in names:
+                    if not force and self._is_sheet_unchanged(sheet_name, revision):
+                        downloaded[sheet_name] = (None, revision)
+                    else:
+                        pending.append(sheet_name)
+                if not pending:
+                    continue
 
-        except Exception as e:
-            logger.error(f"Error downloading sheet {sheet_name}: {e}")
+                ranges = ["'" + name.replace("'", "''") + "'" for name in pending]
+                response = spreadsheet.values_batch_get(ranges)
+                for sheet_name, value_range in zip(pending, response.get('valueRanges', [])):
+                    df = self._values_to_dataframe(sheet_name, value_range.get('values', []))
+                    downloaded[sheet_name] = (df, revision)
+
+            except Exception as e:
+                sheets_cache.invalidate(spreadsheet_id)
+                logger.error(f"Error batch-downloading sheets {names}: {e}")
+
+        return downloaded
+
+    def _values_to_dataframe(self, sheet_name: str, values: List[list]) -> pd.DataFrame:
+        """
+        Превращает значения листа (первая строка — заголовки) в DataFrame со служебными столбцами.
+
+        Состояние листа в Google кладётся в df.attrs ('remote_columns', 'remote_rows'), но в манифест
+        попадает только в _store_downloaded_sheet — когда скачанный лист действительно сохранён.
+        """
+        if not values:
             return pd.DataFrame()
 
-    def update_google_sheet(self, sheet_name: str, df: pd.DataFrame) -> bool:
+        headers = values[0]
+        data = values[1:] if len(values) > 1 else []
+
+        for i, row in enumerate(data):
+            if len(row) < len(headers):
+                data[i] = row + [''] * (len(headers) - len(row))
+            elif len(row) > len(headers):
+                data[i] = row[:len(headers)]
+
+        df = pd.DataFrame(data, columns=headers)
+        df = df.fillna('')
+        # Запоминаем _sync_id в том виде, в каком они лежат в таблице (до генерации недостающих)
+        remote_sync_ids = df['_sync_id'].tolist() if '_sync_id' in df.columns else None
+        df = self._ensure_sync_id(df)
+        df['_sheet_name'] = sheet_name
+        df['_last_sync'] = datetime.now().isoformat()
+        df['_hash'] = self._generate_row_hashes(df)
+
+        if remote_sync_ids is not None and not df.empty:
+            df.attrs['remote_columns'] = list(headers)
+            df.attrs['remote_rows'] = list(zip(remote_sync_ids, df['_hash'].tolist()))
+
+        logger.info(f"Downloaded {len(df)} rows from sheet: {sheet_name}")
+        return df
+
+    def _row_fingerprints(self, df: pd.DataFrame) -> List[Tuple[str, str]]:
+        """Позиционные отпечатки строк: (_sync_id, _hash) в порядке строк листа."""
+        if df.empty:
+            return []
+        sync_ids = df['_sync_id'].astype(str).tolist() if '_sync_id' in df.columns else [''] * len(df)
+        if '_hash' in df.columns:
+            hashes = df['_hash'].astype(str).tolist()
+        else:
+            hashes = self._generate_row_hashes(df).tolist()
+        return list(zip(sync_ids, hashes))
+
+    def _manifest_path(self, sheet_name: str) -> Path:
+        """Манифест лежит рядом с CSV: booking_files/.halo_title.sync.json и т.п."""
+        csv_file = self._get_csv_path(sheet_name)
+        return csv_file.with_name(f".{csv_file.stem}.sync.json")
+
+    def _load_manifest(self, sheet_name: str) -> dict:
+        if sheet_name in self._sync_manifests:
+            return self._sync_manifests[sheet_name]
+
+        manifest = {}
+        manifest_path = self._manifest_path(sheet_name)
+        if manifest_path.exists():
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                manifest['rows'] = [tuple(r) for r in manifest.get('rows', [])]
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать манифест {manifest_path}: {e}")
+                manifest = {}
+
+        self._sync_manifests[sheet_name] = manifest
+        return manifest
+
+    def _update_manifest(self, sheet_name: str, **fields):
+        """Обновляет манифест листа и атомарно сохраняет его на диск."""
+        manifest = dict(self._load_manifest(sheet_name))
+        # local_signature можно передать явно — тогда записывается то состояние CSV, что было отправлено
+        manifest['local_signature'] = self._local_signature(sheet_name)
+        manifest.update(fields)
+        manifest['synced_at'] = datetime.now().isoformat()
+        self._sync_manifests[sheet_name] = manifest
+
+        manifest_path = self._manifest_path(sheet_name)
+        tmp_path = manifest_path.with_suffix('.tmp')
         try:
-            if df.empty:
-                logger.warning(f"No data to push to Google Sheet: {sheet_name}")
-                return False
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, manifest_path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить манифест {manifest_path}: {e}")
+
+    def _local_signature(self, sheet_name: str) -> Optional[str]:
+        """md5 содержимого локального CSV (None, если файла нет)."""
+        csv_file = self._get_csv_path(sheet_name)
+        if not csv_file.exists():
+            return None
+        return hashlib.md5(csv_file.read_bytes()).hexdigest()
 
+    def _get_remote_revision(self, sheet_name: str) -> Optional[str]:
+        """Время последнего изменения таблицы в Google (одна лёгкая метаданных-операция вместо скачивания)."""
+        try:
             spreadsheet_id = self.sheet_to_spreadsheet.get(sheet_name)
             client = self.clients.get(spreadsheet_id)
             if not client or not spreadsheet_id:
-                logger.error(f"No client found for sheet: {sheet_name}")
-                return False
+                return None
+            return self._spreadsheet_revision(sheets_cache.get_spreadsheet(spreadsheet_id))
+        except Exception as e:
+            logger.warning(f"Не удалось получить ревизию таблицы для '{sheet_name}': {e}")
+            return None
+
+    @staticmethod
+    def _spreadsheet_revision(spreadsheet) -> Optional[str]:
+        # gspread>=6: get_lastUpdateTime() всегда спрашивает Drive
+        getter = getattr(spreadsheet, 'get_lastUpdateTime', None)
+        if getter:
+            return getter()
+        # gspread 5.x: свойство lastUpdateTime заполняется только при открытии,
+        # а таблица закэширована — поэтому спрашиваем метаданные Drive напрямую
+        metadata_getter = getattr(spreadsheet.client, 'get_file_drive_metadata', None)
+        if metadata_getter:
+            return metadata_getter(spreadsheet.id).get('modifiedTime')
+        return getattr(spreadsheet, 'lastUpdateTime', None)
+
+    def _is_sheet_unchanged(self, sheet_name: str, remote_revision: Optional[str]) -> bool:
+        """True, если с последней синхронизации не изменились ни таблица, ни локальный CSV."""
+        if remote_revision is None:
+            return False
+        manifest = self._load_manifest(sheet_name)
+        if not manifest or manifest.get('remote_revision') != remote_revision:
+            return False
+        local_signature = self._local_signature(sheet_name)
+        return local_signature is not None and manifest.get('local_signature') == local_signature
 
-            spreadsheet = client.open_by_key(spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+    def _remember_pushed_state(self, sheet_name: str, columns: List[str],
+                               rows: List[Tuple[str, str]], remote_revision: Optional[str]):
+        self._update_manifest(sheet_name, columns=list(columns), rows=list(rows),
+                              hash_version=ROW_HASH_VERSION, rows_revision=remote_revision,
+                              remote_revision=remote_revision)
 
-            save_df = df.drop(columns=['_hash', '_sheet_name', '_last_sync'], errors='ignore')
-            values = [save_df.columns.tolist()] + save_df.values.tolist()
+    def update_google_sheet(self, sheet_name: str, df: pd.DataFrame, incremental: bool = True,
+                            remote_revision: Optional[str] = None) -> bool:
+        """
+        Отправляет данные в Google Таблицу.
 
-            num_rows = len(values)
-            num_cols = len(values[0]) if num_rows > 0 else 0
+        При incremental=True сопоставляет строки с последним отправленным снимком по _sync_id
+        и отправляет одним batch_update только изменённые, добавленные и удалённые строки.
+        Если снимка нет, изменились заголовки или лист в Google правили после нашей отправки
+        (ревизия таблицы не совпадает с rows_revision) — выполняется полная перезапись.
 
-            if num_rows == 0:
+        remote_revision — ревизия таблицы, которую вызывающий уже получил перед синхронизацией
+        (чтобы не спрашивать Drive ещё раз); None — запросить здесь.
+        """
+        try:
+            if df.empty:
+                logger.warning(f"No data to push to Google Sheet: {sheet_name}")
                 return False
 
-            # Полная перезапись данных (очищаем всё)
-            worksheet.clear()
-            worksheet.update("A1", values, value_input_option='USER_ENTERED')
+            spreadsheet_id = self.sheet_to_spreadsheet.get(sheet_name)
+            client = self.clients.get(spreadsheet_id)
+            if not client or not spreadsheet_id:
+                logger.error(f"No client found for sheet: {sheet_name}")
+                return False
 
-            # Применяем форматирование к нужным столбцам
-            self._apply_column_formats(worksheet, sheet_name, num_rows)
+            save_df = df.drop(columns=['_hash', '_sheet_name', '_last_sync'], errors='ignore')
+            columns = save_df.columns.tolist()
+            rows = save_df.values.tolist()
+            fingerprints = self._row_fingerprints(df)
+
+            snapshot = self._load_manifest(sheet_name)
+            snapshot_valid = (snapshot.get('rows') and snapshot.get('columns') == columns
+                              and snapshot.get('hash_version') == ROW_HASH_VERSION)
+            if incremental and snapshot_valid:
+                # Диф верен, только если лист всё ещё в том состоянии, в каком мы его оставили:
+                # правки в Google меняют строки, о которых снимок не знает
+                if remote_revision is None:
+                    remote_revision = self._get_remote_revision(sheet_name)
+                if remote_revision is None or remote_revision != snapshot.get('rows_revision'):
+                    logger.info(f"Google Sheet '{sheet_name}' changed since last push, doing full push")
+                    snapshot_valid = False
+
+            requests = None
+            if incremental and snapshot_valid:
+                worksheet = sheets_cache.get_worksheet(spreadsheet_id, sheet_name)
+                requests = self._row_diff_requests(worksheet.id, sheet_name, columns, rows,
+                                                   fingerprints, snapshot['rows'])
+                if requests is None:
+                    logger.info(f"Rows of '{sheet_name}' cannot be matched by _sync_id, doing full push")
+            if requests is None:
+                # Для полной перезаписи нужны актуальные размеры листа (row_count/col_count)
+                worksheet = sheets_cache.get_worksheet(spreadsheet_id, sheet_name, fresh=True)
+                self._push_full(worksheet, sheet_name, columns, rows)
+            elif not requests:
+                logger.info(f"Google Sheet '{sheet_name}' is up to date, nothing to push")
+                # Лист не трогали — ревизия та же, Drive не спрашиваем
+                self._remember_pushed_state(sheet_name, columns, fingerprints, remote_revision)
+                return True
+            else:
+                worksheet.spreadsheet.batch_update({"requests": requests})
+                logger.info(f"Pushed diff to Google Sheet '{sheet_name}': {len(requests)} requests")
 
-            logger.info(f"Updated Google Sheet '{sheet_name}' with {num_rows} rows and applied formatting")
+            self._remember_pushed_state(sheet_name, columns, fingerprints,
+                                        remote_revision=self._spreadsheet_revision(worksheet.spreadsheet))
             return True
 
         except Exception as e:
+            sheets_cache.invalidate(self.sheet_to_spreadsheet.get(sheet_name))
             logger.error(f"Error updating Google Sheet {sheet_name}: {e}")
             return False
 
-    def sync_sheet(self, sheet_name: str, direction: str = 'auto') -> bool:
+    def _push_full(self, worksheet, sheet_name: str, columns: List[str], rows: List[list]):
+        """Полная перезапись листа без предварительного clear(): сначала пишем данные, затем чистим хвост."""
+        values = [columns] + rows
+        num_rows = len(values)
+        num_cols = len(columns)
+
+        worksheet.update("A1", values, value_input_option='USER_ENTERED')
+
+        # Очищаем всё, что осталось ниже и правее новых данных
+        stale_ranges = []
+        if worksheet.row_count > num_rows:
+            stale_ranges.append(
+                f"A{num_rows + 1}:{rowcol_to_a1(worksheet.row_count, max(num_cols, worksheet.col_count))}"
+            )
+        if worksheet.col_count > num_cols:
+            stale_ranges.append(
+                f"{rowcol_to_a1(1, num_cols + 1)}:{rowcol_to_a1(num_rows, worksheet.col_count)}"
+            )
+        if stale_ranges:
+            worksheet.batch_clear(stale_ranges)
+
+        # Применяем форматирование к нужным столбцам
+        self._apply_column_formats(worksheet, sheet_name, num_rows, headers=columns)
+
+        logger.info(f"Updated Google Sheet '{sheet_name}' with {num_rows} rows and applied formatting")
+
+    def _row_diff_requests(self, sheet_id: int, sheet_name: str, columns: List[str], rows: List[list],
+                           fingerprints: List[Tuple[str, str]], pushed: List[Tuple[str, str]]
+                           ) -> Optional[List[dict]]:
+        """
+        Запросы spreadsheets.batchUpdate, превращающие отправленный снимок pushed в rows.
+
+        Строки сопоставляются по _sync_id (difflib.SequenceMatcher): новая бронь в середине листа —
+        это insertDimension и одна строка данных, удалённая — deleteDimension, а не перезапись
+        всех сдвинувшихся строк. Изменённые строки перезаписываются через updateCells.
+
+        Returns:
+            Optional[List[dict]]: Запросы (пустой список — отправлять нечего) или None,
+            если строки нельзя однозначно сопоставить (пустые или повторяющиеся _sync_id)
+        """
+        old_ids = [sync_id for sync_id, _ in pushed]
+        new_ids = [sync_id for sync_id, _ in fingerprints]
+        for ids in (old_ids, new_ids):
+            if '' in ids or len(set(ids)) != len(ids):
+                return None
+
+        # Строка листа (0-based) строки снимка i — i + 1: строка 0 — заголовок
+        requests = []
+        matcher = difflib.SequenceMatcher(None, old_ids, new_ids, autojunk=False)
+        # С конца листа к началу: вставки и удаления ниже не сдвигают ещё не обработанные строки
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == 'equal':
+                changed = [k for k in range(i2 - i1) if pushed[i1 + k][1] != fingerprints[j1 + k][1]]
+                for first, last in reversed(self._consecutive_runs(changed)):
+                    requests.append(self._update_rows_request(
+                        sheet_id, sheet_name, columns, i1 + first + 1, rows[j1 + first:j1 + last + 1]
+                    ))
+                continue
+
+            overwrite = min(i2 - i1, j2 - j1)
+            if i2 - i1 > overwrite:
+                requests.append({"deleteDimension": {"range": {
+                    "sheetId": sheet_id, "dimension": "ROWS",
+                    "startIndex": i1 + overwrite + 1, "endIndex": i2 + 1,
+                }}})
+            elif j2 - j1 > overwrite:
+                added = rows[j1 + overwrite:j2]
+                if i2 == len(old_ids):
+                    # Хвост листа: appendCells сам добавит строки в сетку, если их не хватает
+                    requests.append({"appendCells": {
+                        "sheetId": sheet_id,
+                        "rows": self._row_data(sheet_name, columns, added),
+                        "fields": "userEnteredValue",
+                    }})
+                else:
+                    requests.append({"insertDimension": {
+                        "range": {
+                            "sheetId": sheet_id, "dimension": "ROWS",
+                            "startIndex": i2 + 1, "endIndex": i2 + 1 + len(added),
+                        },
+                        # Формат берём у строки данных выше, а не у заголовка
+                        "inheritFromBefore": i2 > 0,
+                    }})
+                    requests.append(self._update_rows_request(sheet_id, sheet_name, columns, i2 + 1, added))
+            if overwrite:
+                requests.append(self._update_rows_request(
+                    sheet_id, sheet_name, columns, i1 + 1, rows[j1:j1 + overwrite]
+                ))
+
+        if requests:
+            # Числовой и датный формат столбцов — в том же batch_update
+            requests.extend(self._column_format_requests(sheet_id, sheet_name, len(rows) + 1, columns))
+        return requests
+
+    @staticmethod
+    def _consecutive_runs(indexes: List[int]) -> List[Tuple[int, int]]:
+        """[1, 2, 3, 7, 8] -> [(1, 3), (7, 8)]"""
+        runs = []
+        for index in indexes:
+            if runs and runs[-1][1] == index - 1:
+                runs[-1] = (runs[-1][0], index)
+            else:
+                runs.append((index, index))
+        return runs
+
+    def _update_rows_request(self, sheet_id: int, sheet_name: str, columns: List[str],
+                             row_index: int, rows: List[list]) -> dict:
+        return {"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": row_index, "columnIndex": 0},
+            "rows": self._row_data(sheet_name, columns, rows),
+            "fields": "userEnteredValue",
+        }}
+
+    def _row_data(self, sheet_name: str, columns: List[str], rows: List[list]) -> List[dict]:
+        formats = self.column_formats.get(sheet_name, {})
+        types = [formats.get(column, {}).get('numberFormat', {}).get('type') for column in columns]
+        return [
+            {"values": [self._cell_data(value, number_type) for value, number_type in zip(row, types)]}
+            for row in rows
+        ]
+
+    @staticmethod
+    def _cell_data(value, number_type: Optional[str] = None) -> dict:
+        """
+        Значение ячейки для updateCells так, как его разобрал бы USER_ENTERED:
+        формулы, числа и (в столбцах с форматом DATE) даты как серийные номера; столбцы TEXT — строкой.
+        """
+        text = '' if value is None else str(value)
+        if text == '':
+            return {}
+        if number_type == 'TEXT':
+            return {"userEnteredValue": {"stringValue": text}}
+        if text.startswith('='):
+            return {"userEnteredValue": {"formulaValue": text}}
+        if NUMBER_PATTERN.fullmatch(text):
+            return {"userEnteredValue": {"numberValue": float(text)}}
+        if number_type == 'DATE':
+            for date_format in BOOKING_DATE_FORMATS:
+                try:
+                    day = datetime.strptime(text, date_format).date()
+                except ValueError:
+                    continue
+                return {"userEnteredValue": {"numberValue": (day - SHEETS_EPOCH).days}}
+        return {"userEnteredValue": {"stringValue": text}}
+
+    def sync_sheet(self, sheet_name: str, direction: str = 'auto', force: bool = False) -> bool:
+        """
+        Синхронизирует лист с локальным CSV и отправляет результат на FTP.
+
+        Если по манифесту ни таблица (ревизия Google), ни локальный CSV (md5) не менялись
+        с прошлой синхронизации — скачивание, сохранение и FTP пропускаются (если не force).
+        Одновременно синхронизировать один и тот же лист может только один поток.
+        """
+        with self._sheet_lock(sheet_name):
+            return self._sync_sheet(sheet_name, direction, force)
+
+    async def sync_sheet_async(self, sheet_name: str, direction: str = 'auto', force: bool = False) -> bool:
+        """
+        Неблокирующий вариант sync_sheet для обработчиков бота.
+
+        Работа с gspread и ftplib выполняется в выделенном пуле потоков,
+        event loop python-telegram-bot при этом продолжает обслуживать других пользователей.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_async_executor(), self.sync_sheet, sheet_name, direction, force
+        )
+
+    async def sync_all_sheets_async(self, direction: str = 'auto', force: bool = False,
+                                    parallel: bool = False) -> Dict[str, bool]:
+        """Неблокирующий вариант sync_all_sheets."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_async_executor(),
+            functools.partial(self.sync_all_sheets, direction=direction, force=force, parallel=parallel)
+        )
+
+    @classmethod
+    def _get_async_executor(cls) -> ThreadPoolExecutor:
+        with cls._locks_guard:
+            if cls._async_executor is None:
+                cls._async_executor = ThreadPoolExecutor(
+                    max_workers=SYNC_MAX_WORKERS, thread_name_prefix="sheets-async"
+                )
+            return cls._async_executor
+
+    @classmethod
+    def _sheet_lock(cls, sheet_name: str) -> threading.RLock:
+        with cls._locks_guard:
+            if sheet_name not in cls._sheet_locks:
+                cls._sheet_locks[sheet_name] = threading.RLock()
+            return cls._sheet_locks[sheet_name]
+
+    def _sync_sheet(self, sheet_name: str, direction: str, force: bool) -> bool:
         try:
             csv_file = self._get_csv_path(sheet_name)
             csv_exists = csv_file.exists()
@@ -277,69 +709,70 @@ class GoogleSheetsCSVSync:
                 # Всегда по умолчанию из гугла тянет в локал
                 direction = 'google_to_csv' if not csv_exists else 'google_to_csv'
 
+            remote_revision = self._get_remote_revision(sheet_name)
+            # Иначе подпись локального CSV не увидит брони, ещё не выгруженные из хранилища
+            self._export_from_store(sheet_name)
+            if not force and self._is_sheet_unchanged(sheet_name, remote_revision):
+                logger.info(f"Sheet '{sheet_name}' unchanged since last sync, skipping")
+                return True
+
             logger.info(f"Syncing sheet '{sheet_name}' with direction: {direction}")
 
             if direction == 'google_to_csv':
                 google_data = self.download_sheet(sheet_name)
-                google_data = self._sort_dataframe_by_check_in(google_data, sheet_name)
-                self.save_local_csv(google_data, sheet_name)
-                # ➕ Добавьте FTP-загрузку здесь
-                self._upload_sheet_to_ftp(sheet_name)
-                logger.info(f"Synced Google → CSV for '{sheet_name}' and uploaded to FTP")
+                return self._store_downloaded_sheet(sheet_name, google_data, remote_revision)
 
             elif direction == 'csv_to_google':
-                local_data = self.load_local_csv(sheet_name)
+                with sheet_lock(sheet_name):
+                    local_data = self.load_local_csv(sheet_name)
+                    loaded_signature = self._local_signature(sheet_name)
                 if local_data.empty:
                     logger.warning(f"No local data to sync for '{sheet_name}'")
                     return False
                 local_data = self._sort_dataframe_by_check_in(local_data, sheet_name)
-                success = self.update_google_sheet(sheet_name, local_data)
+                # Сеть — без sheet_lock, чтобы обработчики могли сохранять брони во время push
+                success = self.update_google_sheet(sheet_name, local_data, remote_revision=remote_revision)
                 if success:
-                    local_data['_last_sync'] = datetime.now().isoformat()
-                    self.save_local_csv(local_data, sheet_name)
+                    with sheet_lock(sheet_name):
+                        # Брони, сохранённые во время push, сначала попадают в CSV и меняют его подпись
+                        self._export_from_store(sheet_name)
+                        if self._local_signature(sheet_name) == loaded_signature:
+                            local_data['_last_sync'] = datetime.now().isoformat()
+                            self.save_local_csv(local_data, sheet_name)
+                            self._update_manifest(sheet_name)
+                        else:
+                            # Бронь сохранили во время push: не затираем её устаревшим кадром.
+                            # Отправленным считаем загруженный CSV — новый уйдёт следующим push из очереди
+                            self._update_manifest(sheet_name, local_signature=loaded_signature)
+                            logger.info(f"Local CSV for '{sheet_name}' changed during push, keeping the newer file")
                     # ➕ Отправка на FTP после успешного сохранения
-                    self._upload_sheet_to_ftp(sheet_name)
+                    uploaded = self._upload_sheet_to_ftp(sheet_name)
+                    self._publish_availability_for(sheet_name, csv_uploaded=uploaded)
                 return success
             elif direction == 'bidirectional':
+                # База для поиска конфликтов — состояние на момент прошлой синхронизации
+                base_hashes = dict(self._load_manifest(sheet_name).get('rows', []))
                 google_data = self.download_sheet(sheet_name)
-                local_data = self.load_local_csv(sheet_name)
-                # Индексация
-                google_indexed = {row['_sync_id']: row for _, row in
-                                  google_data.iterrows()} if not google_data.empty else {}
-                local_indexed = {row['_sync_id']: row for _, row in
-                                 local_data.iterrows()} if not local_data.empty else {}
-                # Получаем все _sync_id в порядке: сначала из local (более свежие), потом новые из google
-                # Но лучше — собрать все и потом отсортировать ПОСЛЕ объединения
-                all_sync_ids = set(google_indexed.keys()) | set(local_indexed.keys())
-                merged_rows = []
-                for sync_id in all_sync_ids:
-                    google_row = google_indexed.get(sync_id)
-                    local_row = local_indexed.get(sync_id)
-                    if google_row is not None and local_row is not None:
-                        google_ts = pd.to_datetime(google_row['_last_sync'], errors='coerce')
-                        local_ts = pd.to_datetime(local_row['_last_sync'], errors='coerce')
-                        if pd.isna(local_ts) or (not pd.isna(google_ts) and google_ts > local_ts):
-                            chosen = google_row
-                        else:
-                            chosen = local_row
-                        merged_rows.append(chosen)
-                    elif google_row is not None:
-                        merged_rows.append(google_row)
-                    else:
-                        merged_rows.append(local_row)
-                if merged_rows:
-                    final_df = pd.DataFrame(merged_rows)
-                else:
-                    final_df = pd.DataFrame()
-                final_df = self._ensure_sync_id(final_df)
-                final_df['_sheet_name'] = sheet_name
-                final_df['_last_sync'] = datetime.now().isoformat()
-                final_df['_hash'] = final_df.apply(self._generate_row_hash, axis=1)
-                # 🔥 Главное: сортируем ПОСЛЕ объединения и ПЕРЕД сохранением
-                final_df = self._sort_dataframe_by_check_in(final_df, sheet_name)
-                self.save_local_csv(final_df, sheet_name)
-                self.update_google_sheet(sheet_name, final_df)
-                self._upload_sheet_to_ftp(sheet_name)
+                # Чтение, слияние и запись CSV — одним куском под sheet_lock
+                with sheet_lock(sheet_name):
+                    local_data = self.load_local_csv(sheet_name)
+                    final_df, conflicts = self._merge_bidirectional(google_data, local_data, base_hashes)
+                    if conflicts:
+                        logger.warning(
+                            f"Bidirectional sync '{sheet_name}': {len(conflicts)} rows changed on both sides: "
+                            + ", ".join(f"{c['_sync_id']} → {c['winner']}" for c in conflicts)
+                        )
+                    final_df = self._ensure_sync_id(final_df)
+                    final_df['_sheet_name'] = sheet_name
+                    final_df['_last_sync'] = datetime.now().isoformat()
+                    final_df['_hash'] = self._generate_row_hashes(final_df)
+                    # 🔥 Главное: сортируем ПОСЛЕ объединения и ПЕРЕД сохранением
+                    final_df = self._sort_dataframe_by_check_in(final_df, sheet_name)
+                    self.save_local_csv(final_df, sheet_name)
+                self.update_google_sheet(sheet_name, final_df, remote_revision=remote_revision)
+                self._update_manifest(sheet_name)
+                uploaded = self._upload_sheet_to_ftp(sheet_name)
+                self._publish_availability_for(sheet_name, csv_uploaded=uploaded)
                 logger.info(f"Completed bidirectional sync for '{sheet_name}': {len(final_df)} rows")
             else:
                 raise ValueError(f"Unknown direction: {direction}")
@@ -350,27 +783,131 @@ class GoogleSheetsCSVSync:
             logger.error(f"Error syncing sheet '{sheet_name}': {e}")
             return False
 
-    def _apply_column_formats(self, worksheet, sheet_name: str, num_rows: int):
+    def _store_downloaded_sheet(self, sheet_name: str, google_data: pd.DataFrame,
+                                remote_revision: Optional[str], upload: bool = True) -> bool:
+        """
+        Сохраняет скачанный из Google лист в CSV, обновляет манифест и (если upload) отправляет файл на FTP.
+
+        Returns:
+            bool: False, если загрузка отклонена из-за неотправленных локальных правок —
+            манифест при этом не меняется, чтобы следующий push их не пропустил
+        """
+        with self._sheet_lock(sheet_name), sheet_lock(sheet_name):
+            if self._has_unpushed_edits(sheet_name):
+                # Иначе данные из Google затрут локальные брони, которые ещё не ушли в таблицу
+                logger.warning(f"Sheet '{sheet_name}' has unpushed local edits, Google → CSV refused")
+                return False
+            remote_columns = google_data.attrs.get('remote_columns')
+            remote_rows = google_data.attrs.get('remote_rows')
+            google_data = self._sort_dataframe_by_check_in(google_data, sheet_name)
+            self.save_local_csv(google_data, sheet_name)
+            if remote_columns is not None:
+                # То, что сейчас в таблице, и есть последнее известное отправленное состояние
+                self._remember_pushed_state(sheet_name, remote_columns, remote_rows, remote_revision)
+            else:
+                self._update_manifest(sheet_name, remote_revision=remote_revision)
+            if upload:
+                # ➕ Добавьте FTP-загрузку здесь
+                uploaded = self._upload_sheet_to_ftp(sheet_name)
+                self._publish_availability_for(sheet_name, csv_uploaded=uploaded)
+                logger.info(f"Synced Google → CSV for '{sheet_name}' and uploaded to FTP")
+            return True
+
+    @staticmethod
+    def _has_unpushed_edits(sheet_name: str) -> bool:
+        """Есть ли неотправленные локальные изменения листа: в очереди синхронизации или не выгруженные в CSV."""
+        booking_sheet = BOOKING_SHEETS.get(sheet_name)
+        if booking_sheet is not None and booking_store.has_unexported_changes(booking_sheet):
+            return True
+        return sync_queue.pending_sheets().get(sheet_name) in ('csv_to_google', 'bidirectional')
+
+    def _merge_bidirectional(self, google_data: pd.DataFrame, local_data: pd.DataFrame,
+                             base_hashes: Dict[str, str]) -> Tuple[pd.DataFrame, List[dict]]:
+        """
+        Объединяет данные Google и локального CSV внешним соединением по _sync_id.
+
+        Для строк, присутствующих с обеих сторон, побеждает более свежий _last_sync
+        (Google — только если он строго новее или у локальной строки нет отметки).
+        Возвращает объединённый DataFrame и список конфликтов: строк, которые изменились
+        с обеих сторон относительно прошлой синхронизации (base_hashes).
+        """
+        if google_data.empty or local_data.empty:
+            merged = local_data if google_data.empty else google_data
+            return merged.copy(), []
+
+        google_data = google_data.drop_duplicates('_sync_id', keep='last')
+        local_data = local_data.drop_duplicates('_sync_id', keep='last')
+
+        keys = pd.merge(
+            google_data[['_sync_id', '_last_sync', '_hash']],
+            local_data[['_sync_id', '_last_sync', '_hash']],
+            on='_sync_id', how='outer', suffixes=('_google', '_local'), indicator=True
+        )
+
+        google_ts = pd.to_datetime(keys['_last_sync_google'], errors='coerce')
+        local_ts = pd.to_datetime(keys['_last_sync_local'], errors='coerce')
+        in_both = keys['_merge'] == 'both'
+        take_google = (keys['_merge'] == 'left_only') | (
+            in_both & (local_ts.isna() | (google_ts > local_ts))
+        )
+
+        google_ids = keys.loc[take_google, '_sync_id']
+        local_ids = keys.loc[~take_google, '_sync_id']
+        merged = pd.concat([
+            google_data[google_data['_sync_id'].isin(google_ids)],
+            local_data[local_data['_sync_id'].isin(local_ids)],
+        ], ignore_index=True).fillna('')
+
+        # Конфликт: хэши сторон различаются и ни один не совпадает с базой
+        differs = in_both & (keys['_hash_google'] != keys['_hash_local'])
+        base = keys['_sync_id'].map(base_hashes)
+        both_changed = differs & (base != keys['_hash_google']) & (base != keys['_hash_local'])
+        conflicts = [
+            {
+                '_sync_id': row['_sync_id'],
+                'google_hash': row['_hash_google'],
+                'local_hash': row['_hash_local'],
+                'winner': 'google' if chosen else 'local',
+            }
+            for row, chosen in zip(
+                keys.loc[both_changed].to_dict('records'), take_google[both_changed]
+            )
+        ]
+        return merged, conflicts
+
+    def _apply_column_formats(self, worksheet, sheet_name: str, num_rows: int,
+                              headers: Optional[List[str]] = None, start_row: int = 1):
         """Применяет числовой и датный формат к указанным столбцам после обновления данных."""
-        if sheet_name not in self.column_formats or num_rows <= 1:
+        if sheet_name not in self.column_formats or num_rows <= start_row:
             return
 
-        try:
-            headers = worksheet.row_values(1)
-        except Exception as e:
-            logger.warning(f"Не удалось прочитать заголовки листа '{sheet_name}': {e}")
-            return
+        if headers is None:
+            try:
+                headers = worksheet.row_values(1)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать заголовки листа '{sheet_name}': {e}")
+                return
 
-        requests = []
+        requests = self._column_format_requests(worksheet.id, sheet_name, num_rows, headers, start_row)
+        if requests:
+            try:
+                worksheet.spreadsheet.batch_update({"requests": requests})
+                logger.info(f"Применено форматирование к {len(requests)} столбцам в '{sheet_name}'")
+            except Exception as e:
+                logger.warning(f"Ошибка при применении форматирования к '{sheet_name}': {e}")
 
+    def _column_format_requests(self, sheet_id: int, sheet_name: str, num_rows: int,
+                                headers: List[str], start_row: int = 1) -> List[dict]:
+        """Запросы repeatCell с числовым и датным форматом столбцов из self.column_formats."""
+        requests = []
         for col_idx, header in enumerate(headers, start=1):
-            if header in self.column_formats[sheet_name]:
+            if header in self.column_formats.get(sheet_name, {}):
                 fmt = self.column_formats[sheet_name][header]
                 requests.append({
                     "repeatCell": {
                         "range": {
-                            "sheetId": worksheet.id,
-                            "startRowIndex": 1,          # пропускаем заголовок (0-based)
+                            "sheetId": sheet_id,
+                            "startRowIndex": start_row,  # пропускаем заголовок (0-based)
                             "endRowIndex": num_rows,     # до последней строки с данными
                             "startColumnIndex": col_idx - 1,
                             "endColumnIndex": col_idx,
@@ -379,13 +916,7 @@ class GoogleSheetsCSVSync:
                         "fields": "userEnteredFormat.numberFormat"
                     }
                 })
-
-        if requests:
-            try:
-                worksheet.spreadsheet.batch_update({"requests": requests})
-                logger.info(f"Применено форматирование к {len(requests)} столбцам в '{sheet_name}'")
-            except Exception as e:
-                logger.warning(f"Ошибка при применении форматирования к '{sheet_name}': {e}")
+        return requests
 
     def _sort_dataframe_by_check_in(self, df: pd.DataFrame, sheet_name: str) -> pd.DataFrame:
         if sheet_name not in BOOKING_SHEETS or df.empty:
@@ -398,18 +929,7 @@ class GoogleSheetsCSVSync:
 
         df = df.copy()
 
-        def parse_date(val):
-            if pd.isna(val) or str(val).strip() == '':
-                return pd.NaT
-            val = str(val).strip()
-            for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-                try:
-                    return pd.to_datetime(val, format=fmt)
-                except ValueError:
-                    continue
-            return pd.NaT
-
-        df['_sort_check_in'] = df[check_in_col].apply(parse_date)
+        df['_sort_check_in'] = parse_dates(df[check_in_col].fillna(''))
 
         # Сортируем сначала по дате, потом по _sync_id для стабильности
         df = df.sort_values(
@@ -420,31 +940,98 @@ class GoogleSheetsCSVSync:
         df = df.drop(columns=['_sort_check_in'])
         return df
 
-    def sync_all_sheets(self, direction: str = 'auto') -> Dict[str, bool]:
-        logger.info(f"Starting sync of all sheets (direction: {direction})")
-        results = {}
-        for sheet_name in self.sheet_to_filepath.keys():
-            results[sheet_name] = self.sync_sheet(sheet_name, direction=direction)
+    def sync_all_sheets(self, direction: str = 'auto', force: bool = False,
+                        parallel: bool = False, max_workers: int = SYNC_MAX_WORKERS) -> Dict[str, bool]:
+        logger.info(f"Starting sync of all sheets (direction: {direction}, parallel: {parallel})")
+        sheet_names = list(self.sheet_to_filepath.keys())
+        if parallel:
+            results = self._sync_sheets_parallel(sheet_names, direction, force, max_workers)
+        else:
+            results = {}
+            for sheet_name in sheet_names:
+                results[sheet_name] = self.sync_sheet(sheet_name, direction=direction, force=force)
         success_count = sum(results.values())
         logger.info(f"Sync completed: {success_count}/{len(results)} sheets successful")
         return results
 
-    def sync_selected_sheets(self, sheet_names: List[str], direction: str = 'auto') -> Dict[str, bool]:
-        logger.info(f"Syncing selected sheets {sheet_names} (direction: {direction})")
+    def sync_selected_sheets(self, sheet_names: List[str], direction: str = 'auto',
+                             force: bool = False, parallel: bool = False,
+                             max_workers: int = SYNC_MAX_WORKERS) -> Dict[str, bool]:
+        logger.info(f"Syncing selected sheets {sheet_names} (direction: {direction}, parallel: {parallel})")
         results = {}
+        known = []
         for sheet_name in sheet_names:
             if sheet_name in self.sheet_to_filepath:
-                results[sheet_name] = self.sync_sheet(sheet_name, direction=direction)
+                known.append(sheet_name)
             else:
                 logger.error(f"Unknown sheet name: {sheet_name}")
                 results[sheet_name] = False
+
+        if parallel:
+            results.update(self._sync_sheets_parallel(known, direction, force, max_workers))
+        else:
+            for sheet_name in known:
+                results[sheet_name] = self.sync_sheet(sheet_name, direction=direction, force=force)
+        return results
+
+    def _sync_sheets_parallel(self, sheet_names: List[str], direction: str, force: bool,
+                              max_workers: int) -> Dict[str, bool]:
+        """
+        Синхронизирует листы параллельно в ограниченном пуле потоков.
+
+        Для направления Google → CSV листы каждой таблицы сначала скачиваются одним
+        values_batch_get, а в пул уходят только сохранение CSV и FTP-загрузка.
+        Листы, которые не удалось скачать пакетом, синхронизируются обычным sync_sheet.
+        """
+        results: Dict[str, bool] = {}
+        downloaded = {}
+        if direction in ('auto', 'google_to_csv'):
+            downloaded = self.download_sheets(sheet_names, force=force)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheet-sync") as pool:
+            futures = {}
+            for sheet_name in sheet_names:
+                if sheet_name in downloaded:
+                    google_data, revision = downloaded[sheet_name]
+                    if google_data is None:
+                        logger.info(f"Sheet '{sheet_name}' unchanged since last sync, skipping")
+                        results[sheet_name] = True
+                        continue
+                    # FTP-загрузка скачанных листов выполняется ниже одним пакетом
+                    future = pool.submit(self._store_downloaded_sheet, sheet_name, google_data, revision, False)
+                else:
+                    future = pool.submit(self.sync_sheet, sheet_name, direction, force)
+                futures[future] = sheet_name
+
+            for future in as_completed(futures):
+                sheet_name = futures[future]
+                try:
+                    results[sheet_name] = future.result()
+                except Exception as e:
+                    logger.error(f"Error syncing sheet '{sheet_name}': {e}")
+                    results[sheet_name] = False
+
+        # Все скачанные листы отправляем на FTP по одному соединению из пула
+        stored = [
+            sheet_name for sheet_name, (google_data, _) in downloaded.items()
+            if google_data is not None and results.get(sheet_name)
+        ]
+        if stored:
+            uploaded = self._upload_sheets_to_ftp(stored)
+            logger.info(f"Synced Google → CSV for {stored} and uploaded to FTP")
+            if any(self._affects_availability(sheet_name) for sheet_name in stored):
+                self.publish_availability_snapshot(force_upload=any(
+                    uploaded.get(sheet_name) for sheet_name in stored if sheet_name in BOOKING_SHEETS
+                ))
+
         return results
 
     def get_available_sheets(self) -> List[str]:
         return list(self.sheet_to_filepath.keys())
 
     def upload_synced_files_via_ftp(self, ftp_host: str, ftp_user: str, ftp_password: str,
-                                    port: int = 21, use_ftps: bool = False) -> bool:
+                                    port: int = 21, use_ftps: bool = False,
+                                    workers: int = FTP_UPLOAD_WORKERS) -> bool:
         """
         Отправляет все синхронизированные CSV файлы на FTP сервер
         Автоматически определяет remote_path для каждого файла
@@ -455,45 +1042,20 @@ class GoogleSheetsCSVSync:
             ftp_password: FTP пароль
             port: FTP порт
             use_ftps: Использовать FTPS
+            workers: Количество параллельных FTP-соединений
 
         Returns:
             bool: True если все файлы успешно отправлены
+            (результат по каждому листу — в self.last_upload_results)
         """
-        ftp_client = FTPClient()
-
-        try:
-            # Подключаемся к FTP серверу
-            if not ftp_client.connect(ftp_host, ftp_user, ftp_password, port, use_ftps):
-                return False
-
-            all_success = True
-
-            # Отправляем каждый файл в свою директорию
-            for sheet_name, file_path in self.sheet_to_filepath.items():
-                if not file_path.exists():
-                    logger.warning(f"Файл {file_path} не существует, пропускаем")
-                    all_success = False
-                    continue
-
-                # Автоматически определяем remote_path
-                remote_path = self._get_remote_path_for_sheet(sheet_name)
-
-                # Отправляем файл
-                success = ftp_client.upload_file(file_path, remote_path=remote_path)
-                if not success:
-                    all_success = False
-
-            return all_success
-
-        except Exception as e:
-            logger.error(f"Ошибка при отправке файлов на FTP: {e}")
-            return False
-        finally:
-            ftp_client.disconnect()
+        return self._upload_sheets_parallel(
+            list(self.sheet_to_filepath.keys()), ftp_host, ftp_user, ftp_password, port, use_ftps, workers
+        )
 
     def upload_selected_sheets_via_ftp(self, sheet_names: List[str], ftp_host: str,
                                        ftp_user: str, ftp_password: str,
-                                       port: int = 21, use_ftps: bool = False) -> bool:
+                                       port: int = 21, use_ftps: bool = False,
+                                       workers: int = FTP_UPLOAD_WORKERS) -> bool:
         """
         Отправляет только выбранные CSV файлы на FTP сервер
         Автоматически определяет remote_path для каждого файла
@@ -505,51 +1067,58 @@ class GoogleSheetsCSVSync:
             ftp_password: FTP пароль
             port: FTP порт
             use_ftps: Использовать FTPS
+            workers: Количество параллельных FTP-соединений
 
         Returns:
             bool: True если все выбранные файлы успешно отправлены
+            (результат по каждому листу — в self.last_upload_results)
         """
-        ftp_client = FTPClient()
-
-        try:
-            # Подключаемся к FTP серверу
-            if not ftp_client.connect(ftp_host, ftp_user, ftp_password):
-                return False
-
-            all_success = True
-
-            # Отправляем каждый выбранный файл в свою директорию
-            for sheet_name in sheet_names:
-                if sheet_name not in self.sheet_to_filepath:
-                    logger.error(f"Неизвестное название листа: {sheet_name}")
-                    all_success = False
-                    continue
+        return self._upload_sheets_parallel(
+            sheet_names, ftp_host, ftp_user, ftp_password, port, use_ftps, workers
+        )
 
-                file_path = self.sheet_to_filepath[sheet_name]
-                if not file_path.exists():
-                    logger.warning(f"Файл {file_path} не существует, пропускаем")
-                    all_success = False
-                    continue
+    def _upload_sheets_parallel(self, sheet_names: List[str], ftp_host: str, ftp_user: str,
+                                ftp_password: str, port: int, use_ftps: bool, workers: int) -> bool:
+        """Загружает файлы листов по нескольким FTP/FTPS-соединениям и сохраняет результаты по листам"""
+        results: Dict[str, bool] = {}
+        uploads = []
+        file_to_sheet = {}
 
-                # Автоматически определяем remote_path
-                remote_path = self._get_remote_path_for_sheet(sheet_name)
+        for sheet_name in sheet_names:
+            if sheet_name not in self.sheet_to_filepath:
+                logger.error(f"Неизвестное название листа: {sheet_name}")
+                results[sheet_name] = False
+                continue
 
-                # Отправляем файл
-                success = ftp_client.upload_file(file_path, remote_path=remote_path)
-                if not success:
-                    all_success = False
+            file_path = self.sheet_to_filepath[sheet_name]
+            self._export_from_store(sheet_name)
+            if not file_path.exists():
+                logger.warning(f"Файл {file_path} не существует, пропускаем")
+                results[sheet_name] = False
+                continue
 
-            return all_success
+            # Автоматически определяем remote_path
+            uploads.append((file_path, self._get_remote_path_for_sheet(sheet_name)))
+            file_to_sheet[file_path] = sheet_name
 
+        try:
+            uploaded = ftp_pool.upload_parallel(
+                uploads, ftp_host, ftp_user, ftp_password, port=port, use_ftps=use_ftps, workers=workers
+            )
+            for file_path, success in uploaded.items():
+                results[file_to_sheet[file_path]] = success
         except Exception as e:
-            logger.error(f"Ошибка при отправке выбранных файлов на FTP: {e}")
-            return False
-        finally:
-            ftp_client.disconnect()
+            logger.error(f"Ошибка при отправке файлов на FTP: {e}")
+            for sheet_name in file_to_sheet.values():
+                results.setdefault(sheet_name, False)
+
+        self.last_upload_results = results
+        return bool(results) and all(results.values())
 
     def sync_and_upload_all(self, ftp_host: str, ftp_user: str, ftp_password: str,
                             sync_direction: str = 'auto', port: int = 21,
-                            use_ftps: bool = False) -> Dict[str, bool]:
+                            use_ftps: bool = False,
+                            workers: int = FTP_UPLOAD_WORKERS) -> Dict[str, bool]:
         """
         Выполняет синхронизацию всех листов и сразу отправляет на FTP сервер
 
@@ -560,9 +1129,10 @@ class GoogleSheetsCSVSync:
             sync_direction: Направление синхронизации
             port: FTP порт
             use_ftps: Использовать FTPS
+            workers: Количество параллельных FTP-соединений
 
         Returns:
-            Dict[str, bool]: Результаты операций
+            Dict[str, bool]: Результаты операций ('upload_files' — результат по каждому листу)
         """
         results = {}
 
@@ -576,16 +1146,19 @@ class GoogleSheetsCSVSync:
             ftp_user=ftp_user,
             ftp_password=ftp_password,
             port=port,
-            use_ftps=use_ftps
+            use_ftps=use_ftps,
+            workers=workers
         )
         results['upload'] = upload_success
+        results['upload_files'] = self.last_upload_results
 
         return results
 
     def sync_and_upload_selected(self, sheet_names: List[str], ftp_host: str,
                                  ftp_user: str, ftp_password: str,
                                  sync_direction: str = 'auto', port: int = 21,
-                                 use_ftps: bool = False) -> Dict[str, bool]:
+                                 use_ftps: bool = False,
+                            workers: int = FTP_UPLOAD_WORKERS) -> Dict[str, bool]:
         """
         Выполняет синхронизацию выбранных листов и сразу отправляет на FTP сервер
 
@@ -597,9 +1170,10 @@ class GoogleSheetsCSVSync:
             sync_direction: Направление синхронизации
             port: FTP порт
             use_ftps: Использовать FTPS
+            workers: Количество параллельных FTP-соединений
 
         Returns:
-            Dict[str, bool]: Результаты операций
+            Dict[str, bool]: Результаты операций ('upload_files' — результат по каждому листу)
         """
         results = {}
 
@@ -614,9 +1188,11 @@ class GoogleSheetsCSVSync:
             ftp_user=ftp_user,
             ftp_password=ftp_password,
             port=port,
-            use_ftps=use_ftps
+            use_ftps=use_ftps,
+            workers=workers
         )
         results['upload'] = upload_success
+        results['upload_files'] = self.last_upload_results
 
         return results
 
@@ -662,27 +1238,83 @@ class GoogleSheetsCSVSync:
             return False
 
         file_path = self.sheet_to_filepath[sheet_name]
+        self._export_from_store(sheet_name)
         if not file_path.exists():
             logger.warning(f"File {file_path} does not exist, skipping FTP upload")
             return False
 
         remote_path = self._get_remote_path_for_sheet(sheet_name)
-        ftp_client = FTPClient()
         try:
-            if not ftp_client.connect(
-                    Config.FTP_HOST,
-                    Config.FTP_USER,
-                    Config.FTP_PASSWORD
-            ):
-                return False
-            success = ftp_client.upload_file(file_path, remote_path=remote_path)
-            return success
+            # Соединение берется из пула и после загрузки возвращается в него
+            with ftp_pool.connection(Config.FTP_HOST, Config.FTP_USER, Config.FTP_PASSWORD) as ftp_client:
+                if ftp_client is None:
+                    return False
+                return ftp_client.upload_file(file_path, remote_path=remote_path)
         except Exception as e:
             logger.error(f"FTP upload failed for {sheet_name}: {e}")
             return False
-        finally:
-            ftp_client.disconnect()
 
+    def _affects_availability(self, sheet_name: str) -> bool:
+        """Брони и помесячные цены входят в снимок availability.json"""
+        return sheet_name in BOOKING_SHEETS or sheet_name in self.price_sheets
+
+    def _publish_availability_for(self, sheet_name: str, csv_uploaded: bool = False):
+        if self._affects_availability(sheet_name):
+            self.publish_availability_snapshot(force_upload=csv_uploaded and sheet_name in BOOKING_SHEETS)
+
+    def publish_availability_snapshot(self, force_upload: bool = False) -> bool:
+        """
+        Пересобирает booking_files/availability.json (занятость, окна и цены по всем объектам)
+        и отправляет его на FTP рядом с CSV, чтобы веб-формы читали один небольшой файл
+
+        booking_calculator.php берёт снимок, только если в нём есть каждый CSV booking_files
+        и csv_md5 каждого совпадает с файлом на сервере. После загрузки CSV броней снимок
+        отправляется заново даже без изменений (force_upload), чтобы на сервере не остался
+        снимок, пропущенный как неизменный при прошлой неудачной загрузке.
+        """
+        snapshot_path = self.booking_dir / AVAILABILITY_FILENAME
+        with self._availability_lock:
+            if not write_availability_snapshot(snapshot_path, self.task_dir):
+                return False
+            remote_path = self._get_remote_path_for_file(snapshot_path)
+            try:
+                with ftp_pool.connection(Config.FTP_HOST, Config.FTP_USER, Config.FTP_PASSWORD) as ftp_client:
+                    if ftp_client is None:
+                        return False
+                    return ftp_client.upload_file(snapshot_path, remote_path=remote_path,
+                                                  skip_unchanged=not force_upload)
+            except Exception as e:
+                logger.error(f"FTP upload failed for {snapshot_path.name}: {e}")
+                return False
+
+    def _upload_sheets_to_ftp(self, sheet_names: List[str]) -> Dict[str, bool]:
+        """Отправляет несколько синхронизированных файлов на FTP по одному соединению из пула"""
+        results = {}
+        uploads = []
+        for sheet_name in sheet_names:
+            file_path = self.sheet_to_filepath.get(sheet_name)
+            self._export_from_store(sheet_name)
+            if file_path is None or not file_path.exists():
+                logger.warning(f"File for sheet '{sheet_name}' does not exist, skipping FTP upload")
+                results[sheet_name] = False
+                continue
+            uploads.append((sheet_name, file_path, self._get_remote_path_for_sheet(sheet_name)))
+
+        if not uploads:
+            return results
+
+        try:
+            with ftp_pool.connection(Config.FTP_HOST, Config.FTP_USER, Config.FTP_PASSWORD) as ftp_client:
+                if ftp_client is None:
+                    results.update({sheet_name: False for sheet_name, _, _ in uploads})
+                    return results
+                uploaded = ftp_client.upload_batch([(file_path, remote) for _, file_path, remote in uploads])
+                for sheet_name, file_path, _ in uploads:
+                    results[sheet_name] = uploaded.get(file_path, False)
+        except Exception as e:
+            logger.error(f"FTP batch upload failed for {sheet_names}: {e}")
+            results.update({sheet_name: False for sheet_name, _, _ in uploads if sheet_name not in results})
+        return results
 
 if __name__ == "__main__":
     sync_manager = GoogleSheetsCSVSync()
@@ -0,0 +1,190 @@
+# main_tg_bot/google_sheets/sync_queue.py
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from common.config import Config
+from common.logging_config import setup_logger
+from main_tg_bot.booking_objects import PROJECT_ROOT
+
+logger = setup_logger("sync_queue")
+
+# Пауза перед отправкой «грязного» листа: правки за это время уходят одним push
+SYNC_DEBOUNCE_SECONDS = 10
+# Повторы при ошибке синхронизации: 5, 10, 20, ... секунд, но не больше RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 600
+
+QUEUE_STATE_FILE = PROJECT_ROOT / Config.BOOKING_DATA_DIR / ".sync_queue.json"
+
+
+class SheetSyncQueue:
+    """
+    Отложенная (write-behind) синхронизация листов с Google Таблицей.
+
+    Обработчики только помечают лист как изменённый (mark_dirty), а фоновая задача
+    отправляет каждый лист не чаще одного раза за debounce_seconds и повторяет
+    неудачные попытки с экспоненциальной задержкой. Очередь хранится на диске,
+    поэтому неотправленные изменения переживают перезапуск бота.
+    """
+
+    def __init__(self, debounce_seconds: float = SYNC_DEBOUNCE_SECONDS,
+                 state_file: Path = QUEUE_STATE_FILE):
+        self.debounce_seconds = debounce_seconds
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        # sheet_name -> {'direction': str, 'attempts': int, 'due_at': float}
+        self._pending: Dict[str, dict] = {}
+        self._sync_manager = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._load_state()
+
+    def _load_state(self):
+        if not self.state_file.exists():
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            now = time.monotonic()
+            for sheet_name, entry in saved.items():
+                # После перезапуска всё, что не успели отправить, отправляем сразу
+                self._pending[sheet_name] = {
+                    'direction': entry.get('direction', 'csv_to_google'),
+                    'attempts': entry.get('attempts', 0),
+                    'due_at': now,
+                }
+            if self._pending:
+                logger.info(f"Restored pending sheet syncs: {list(self._pending)}")
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать очередь синхронизации {self.state_file}: {e}")
+
+    def _save_state(self):
+        """Сохраняет очередь атомарно (вызывать под self._lock)."""
+        state = {
+            sheet_name: {'direction': entry['direction'], 'attempts': entry['attempts']}
+            for sheet_name, entry in self._pending.items()
+        }
+        tmp_path = self.state_file.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить очередь синхронизации {self.state_file}: {e}")
+
+    def mark_dirty(self, sheet_name: str, direction: str = 'csv_to_google'):
+        """Помечает лист как изменённый. Повторные отметки до отправки схлопываются в одну."""
+        with self._lock:
+            entry = self._pending.get(sheet_name)
+            if entry is None:
+                self._pending[sheet_name] = {
+                    'direction': direction,
+                    'attempts': 0,
+                    'due_at': time.monotonic() + self.debounce_seconds,
+                }
+            else:
+                entry['direction'] = direction
+            self._save_state()
+
+        logger.info(f"Sheet '{sheet_name}' marked dirty ({direction})")
+        self._wake()
+
+    def _wake(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending_sheets(self) -> Dict[str, str]:
+        with self._lock:
+            return {sheet_name: entry['direction'] for sheet_name, entry in self._pending.items()}
+
+    async def start(self):
+        """Запускает фоновую задачу в текущем event loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="sheet-sync-queue")
+        logger.info("Sheet sync queue started")
+
+    async def stop(self):
+        """Останавливает фоновую задачу и пытается сразу отправить всё, что осталось в очереди."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(only_due=False)
+        self._loop = None
+        self._wakeup = None
+        logger.info("Sheet sync queue stopped")
+
+    async def _run(self):
+        while True:
+            with self._lock:
+                due_times = [entry['due_at'] for entry in self._pending.values()]
+            timeout = max(0.0, min(due_times) - time.monotonic()) if due_times else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка в очереди синхронизации: {e}", exc_info=True)
+
+    async def flush(self, only_due: bool = True):
+        """Синхронизирует листы, чьё время подошло (или все, если only_due=False)."""
+        now = time.monotonic()
+        with self._lock:
+            ready = {
+                sheet_name: entry for sheet_name, entry in self._pending.items()
+                if not only_due or entry['due_at'] <= now
+            }
+            for sheet_name in ready:
+                del self._pending[sheet_name]
+
+        for sheet_name, entry in ready.items():
+            success = False
+            try:
+                success = await self._get_sync_manager().sync_sheet_async(
+                    sheet_name=sheet_name, direction=entry['direction']
+                )
+            except Exception as e:
+                logger.error(f"Ошибка синхронизации листа '{sheet_name}' из очереди: {e}")
+
+            with self._lock:
+                if success:
+                    logger.info(f"Sheet '{sheet_name}' flushed from sync queue")
+                elif sheet_name not in self._pending:
+                    # Если лист успели снова пометить — новая отметка и так будет отправлена
+                    attempts = entry['attempts'] + 1
+                    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+                    self._pending[sheet_name] = {
+                        'direction': entry['direction'],
+                        'attempts': attempts,
+                        'due_at': time.monotonic() + delay,
+                    }
+                    logger.error(
+                        f"Sync of '{sheet_name}' failed (attempt {attempts}), retry in {delay} s"
+                    )
+                self._save_state()
+
+    def _get_sync_manager(self):
+        if self._sync_manager is None:
+            # Импорт здесь, чтобы модуль очереди не тянул gspread при импорте обработчиков
+            from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
+            self._sync_manager = GoogleSheetsCSVSync()
+        return self._sync_manager
+
+
+sync_queue = SheetSyncQueue()
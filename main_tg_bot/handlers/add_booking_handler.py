@@ -1,7 +1,7 @@
 # main_tg_bot/handlers/add_booking_handler.py
 
+import asyncio
 import uuid
-import pandas as pd
 from pathlib import Path
 from typing import Any, Dict, Optional
 
@@ -10,11 +10,14 @@ from main_tg_bot.booking_objects import (
   BOOKING_DIR,
   BOOKING_SHEETS,
   SHEET_TO_FILENAME,
+  booking_store,
   get_booking_sheet,
+  parse_amount,
+  parse_booking_date,
 )
-from telega.tg_notifier import send_message
-from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
-import aiohttp
+from telega.tg_notifier import send_message, telegram_session
+from main_tg_bot.google_sheets.sync_queue import sync_queue
+from main_tg_bot.pricing_engine import matches_quote, pricing_engine
 
 logger = setup_logger("add_booking_handler")
 
@@ -32,7 +35,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
   # --- Сразу отправляем "обрабатывается" ---
   if init_chat_id:
     try:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         message = f"✅ Ваше бронирование, {guest_name}, обрабатывается..."
         await send_message(session, init_chat_id, message)
         logger.info(
@@ -50,17 +53,15 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
       error_msg = "❌ В бронировании должны быть указаны даты заезда и выезда."
       logger.error(error_msg)
       if init_chat_id:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
           await send_message(session, init_chat_id, error_msg)
       return
 
     def parse_date(date_str: str):
-      for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-        try:
-          return pd.to_datetime(date_str, format=fmt).date()
-        except ValueError:
-          continue
-      raise ValueError(f"Неверный формат даты: {date_str}")
+      parsed = parse_booking_date(date_str)
+      if parsed is None:
+        raise ValueError(f"Неверный формат даты: {date_str}")
+      return parsed
 
     try:
       check_in = parse_date(check_in_str)
@@ -69,7 +70,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
       error_msg = f"❌ Неверный формат даты: {ve}"
       logger.error(error_msg)
       if init_chat_id:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
           await send_message(session, init_chat_id, error_msg)
       return
 
@@ -77,7 +78,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
       error_msg = "❌ Дата выезда должна быть позже даты заезда."
       logger.error(error_msg)
       if init_chat_id:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
           await send_message(session, init_chat_id, error_msg)
       return
 
@@ -86,7 +87,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
     if not object_display_name:
       logger.error("❌ Не указан объект недвижимости")
       if init_chat_id:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
           await send_message(session, init_chat_id,
                              "❌ Не указан объект недвижимости.")
       return
@@ -107,7 +108,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
         error_msg = f"❌ Неизвестный объект: '{object_display_name}'. Доступные: {available}"
         logger.error(error_msg)
         if init_chat_id:
-          async with aiohttp.ClientSession() as session:
+          async with telegram_session() as session:
             await send_message(session, init_chat_id, error_msg)
         return
 
@@ -119,51 +120,35 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
     logger.info(f"📄 [handle_add_booking] Это booking_other: {is_booking_other}")
 
     # --- Проверка пересечений с существующими бронированиями (только НЕ для booking_other) ---
-    existing_df = pd.DataFrame()
-    if csv_filepath.exists():
-      existing_df = pd.read_csv(csv_filepath, dtype=str).fillna('')
-
-      # Пропускаем проверку пересечений для booking_other
-      if not is_booking_other:
-        overlaps = []
-        for _, row in existing_df.iterrows():
-          try:
-            # Пропускаем, если поля пустые
-            if not row.get('Заезд', '').strip() or not row.get('Выезд',
-                                                               '').strip():
-              continue
-
-            existing_check_in = parse_date(row['Заезд'])
-            existing_check_out = parse_date(row['Выезд'])
-
-            # Дополнительная проверка на None (если парсинг провалился)
-            if existing_check_in is None or existing_check_out is None:
-              continue
-
-            # Проверяем пересечение диапазонов дат
-            if not (
-                check_out <= existing_check_in or check_in >= existing_check_out):
-              overlaps.append(
-                  (row.get('Гость', 'N/A'), row['Заезд'], row['Выезд']))
-
-          except Exception as e:
-            logger.warning(
-              f"Пропущена строка из-за ошибки парсинга дат: {row.get('Гость', 'N/A')} | {e}")
-            continue  # Игнорируем повреждённые строки
-
-        if overlaps:
-          overlap_list = "\n".join(
-              [f" • {g} ({ci} – {co})" for g, ci, co in overlaps])
-          error_msg = (
-            "❌ Невозможно создать бронирование: обнаружены пересечения по датам:\n"
-            f"{overlap_list}\n\n"
-            "Пожалуйста, выберите другие даты."
-          )
-          logger.error("Обнаружены пересекающиеся бронирования")
-          if init_chat_id:
-            async with aiohttp.ClientSession() as session:
-              await send_message(session, init_chat_id, error_msg)
-          return
+    if not is_booking_other:
+      overlaps = [
+        (row.get('Гость', 'N/A'), row['Заезд'], row['Выезд'])
+        for row in await asyncio.to_thread(booking_store.find_overlaps, booking_sheet, check_in, check_out)
+      ]
+
+      if overlaps:
+        overlap_list = "\n".join(
+            [f" • {g} ({ci} – {co})" for g, ci, co in overlaps])
+        error_msg = (
+          "❌ Невозможно создать бронирование: обнаружены пересечения по датам:\n"
+          f"{overlap_list}\n\n"
+          "Пожалуйста, выберите другие даты."
+        )
+        logger.error("Обнаружены пересекающиеся бронирования")
+        if init_chat_id:
+          async with telegram_session() as session:
+            await send_message(session, init_chat_id, error_msg)
+        return
+
+    # --- Сверка суммы с прайсом (только предупреждение: цена могла быть согласована вручную) ---
+    if not is_booking_other:
+      quote = pricing_engine.quote(sheet_name_for_sync, check_in, check_out)
+      total_sum = parse_amount(data.get('total_sum'))
+      if quote and total_sum is not None and not matches_quote(total_sum, quote):
+        logger.warning(
+            f"⚠️ [handle_add_booking] Сумма {total_sum:g} не совпадает с прайсом: "
+            f"{quote['total']} (со скидкой {quote['total_with_discount']}) "
+            f"за {quote['nights']} ночей")
 
     # --- Подготовка данных для сохранения ---
     booking_uid = str(uuid.uuid4())
@@ -220,58 +205,24 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
       logger.info(f"    Хозяин: {owner_name}")
       logger.info(f"    Комиссия: {commission}")
 
-    # Проверяем структуру существующего CSV для правильного порядка колонок
-    if csv_filepath.exists() and not existing_df.empty:
-      # Получаем порядок колонок из существующего файла
-      existing_columns = existing_df.columns.tolist()
-      logger.info(
-        f"📄 [handle_add_booking] Существующие колонки: {existing_columns}")
-
-      # Создаем DataFrame с правильным порядком колонок
-      new_booking_df = pd.DataFrame([booking_data])
-
-      # Выравниваем колонки с существующими
-      for col in existing_columns:
-        if col not in new_booking_df.columns:
-          new_booking_df[col] = ''
-
-      # Упорядочиваем колонки
-      new_booking_df = new_booking_df[existing_columns]
-
-      # Объединяем с существующими данными
-      updated_df = pd.concat([existing_df, new_booking_df], ignore_index=True)
-    else:
-      # Создаем новый файл с правильным порядком колонок для booking_other
-      if is_booking_other:
-        # Определяем порядок колонок для booking_other
-        booking_other_columns = [
-          'Название кондо', 'Номер апарта', 'Хозяин',
-          'Гость', 'Дата бронирования', 'Заезд', 'Выезд',
-          'Количество ночей', 'СуммаБатты', 'Комиссия',
-          'Аванс Батты/Рубли', 'Доплата Батты/Рубли',
-          'Источник', 'Дополнительные доплаты', 'Расходы',
-          'Оплата', 'Комментарий', 'телефон',
-          'дополнительный телефон', 'Рейсы', '_sync_id'
-        ]
-        new_booking_df = pd.DataFrame([booking_data])
-
-        # Выравниваем колонки
-        for col in booking_other_columns:
-          if col not in new_booking_df.columns:
-            new_booking_df[col] = ''
-
-        # Упорядочиваем колонки
-        new_booking_df = new_booking_df[booking_other_columns]
-        updated_df = new_booking_df
-      else:
-        # Для других объектов используем стандартный порядок
-        new_booking_df = pd.DataFrame([booking_data])
-        updated_df = new_booking_df
+    # Порядок колонок для нового файла booking_other (для существующих файлов берётся из CSV)
+    booking_other_columns = [
+      'Название кондо', 'Номер апарта', 'Хозяин',
+      'Гость', 'Дата бронирования', 'Заезд', 'Выезд',
+      'Количество ночей', 'СуммаБатты', 'Комиссия',
+      'Аванс Батты/Рубли', 'Доплата Батты/Рубли',
+      'Источник', 'Дополнительные доплаты', 'Расходы',
+      'Оплата', 'Комментарий', 'телефон',
+      'дополнительный телефон', 'Рейсы', '_sync_id'
+    ]
 
     try:
-      updated_df.to_csv(csv_filepath, index=False, encoding='utf-8')
+      # SQLite-транзакция (BEGIN IMMEDIATE, busy_timeout) — в потоке, чтобы не стопорить event loop
+      await asyncio.to_thread(
+          booking_store.insert_booking, booking_sheet, booking_data,
+          default_columns=booking_other_columns if is_booking_other else None
+      )
       logger.info(f"✅ Бронирование сохранено с UUID: {booking_uid}")
-      logger.info(f"✅ Файл сохранен: {csv_filepath}")
 
       # Логируем добавленные данные для отладки
       logger.info(f"📄 [handle_add_booking] Добавлены данные:")
@@ -281,7 +232,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
     except Exception as save_error:
       logger.error(f"❌ Ошибка при сохранении CSV: {save_error}")
       if init_chat_id:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
           await send_message(
               session,
               init_chat_id,
@@ -289,28 +240,12 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
           )
       return
 
-    # --- Синхронизация с Google Таблицей ---
-    try:
-      sync_manager = GoogleSheetsCSVSync()
-      sync_success = sync_manager.sync_sheet(sheet_name=sheet_name_for_sync,
-                                             direction='csv_to_google')
-      if not sync_success:
-        raise RuntimeError("Синхронизация завершилась со статусом False")
-    except Exception as sync_error:
-      logger.error(
-        f"❌ Ошибка при синхронизации листа '{sheet_name_for_sync}': {sync_error}")
-      if init_chat_id:
-        async with aiohttp.ClientSession() as session:
-          await send_message(
-              session,
-              init_chat_id,
-              "⚠️ Бронирование сохранено, но возникла проблема с синхронизацией в Google Таблицу. Администратор уже уведомлён."
-          )
-      return
+    # --- Синхронизация с Google Таблицей (отложенная, через очередь) ---
+    sync_queue.mark_dirty(sheet_name_for_sync, direction='csv_to_google')
 
     # --- УСПЕХ: отправляем финальное подтверждение ---
     if init_chat_id:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         success_msg = "✅ Бронирование успешно добавлено!"
         if is_booking_other:
           success_msg = f"✅ Бронирование {guest_name} успешно добавлено в booking_other!"
@@ -324,7 +259,7 @@ async def handle_add_booking(data: Dict[str, Any], filename: str):
   except Exception as e:
     logger.error(f"❌ Неожиданная ошибка при обработке бронирования: {e}")
     if init_chat_id:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         await send_message(
             session,
             init_chat_id,
@@ -12,7 +12,9 @@ from docxtpl import DocxTemplate
 from num2words import num2words
 
 from common.logging_config import setup_logger
-from telega.tg_notifier import send_message
+from main_tg_bot.booking_objects import parse_booking_date
+from main_tg_bot.pricing_engine import pricing_engine, round_baht
+from telega.tg_notifier import send_message, telegram_session
 
 logger = setup_logger("contract_handler")
 
@@ -53,7 +55,7 @@ async def handle_contract(data: Dict[str, Any], filename: str):
     # --- Сразу отправляем "обрабатывается" ---
     if init_chat_id:
         try:
-            async with aiohttp.ClientSession() as session:
+            async with telegram_session() as session:
                 await send_message(session, init_chat_id,
                                    f"📄 формируются договор и подтверждение {guest_name}, ожидайте...")
                 logger.info(f"📢 Уведомление 'обрабатывается' отправлено в чат {init_chat_id}")
@@ -61,6 +63,18 @@ async def handle_contract(data: Dict[str, Any], filename: str):
             logger.warning(f"Не удалось отправить начальное уведомление в Telegram: {e}")
 
     try:
+        # --- Сумма по прайсу объекта, если в форме не указана ---
+        if not data.get('total_amount'):
+            check_in = parse_booking_date(data.get('check_in'))
+            check_out = parse_booking_date(data.get('check_out'))
+            quote = None
+            if check_in and check_out:
+                quote = pricing_engine.quote(data.get('contract_object', ''), check_in, check_out)
+            if quote and not quote['unpriced_nights']:
+                # Сумма со скидкой бывает дробной, а в договоре она нужна в целых батах
+                data['total_amount'] = str(round_baht(quote['total_with_discount']))
+                logger.info(f"📄 Сумма договора рассчитана по прайсу: {data['total_amount']}")
+
         # --- Валидация обязательных полей ---
         required_fields = [
             'contract_object', 'contract_type', 'fullname',
@@ -137,41 +151,25 @@ async def handle_contract(data: Dict[str, Any], filename: str):
                     try:
                         logger.info(f"🔄 Попытка отправки {attempt + 1}/{max_attempts}")
 
-                        async with aiohttp.ClientSession() as session:
+                        async with telegram_session() as session:
                             # Проверяем существование файлов перед отправкой
                             if not contract_pdf_path.exists():
                                 raise FileNotFoundError(f"Файл договора не найден: {contract_pdf_path}")
                             if not confirmation_pdf_path.exists():
                                 raise FileNotFoundError(f"Файл подтверждения не найден: {confirmation_pdf_path}")
 
-                            # Договор
-                            logger.info(f"📤 Отправка договора: {contract_pdf_path}")
-                            contract_success = await send_message(
-                                session,
-                                init_chat_id,
-                                f"📄 Договор аренды для {data['fullname']}",
-                                media_files=str(contract_pdf_path),
-                                timeout_sec=60  # Увеличиваем таймаут для файлов
-                            )
-
-                            if not contract_success:
-                                raise Exception("Не удалось отправить договор")
-
-                            # Небольшая пауза между отправками
-                            await asyncio.sleep(1)
-
-                            # Подтверждение
-                            logger.info(f"📤 Отправка подтверждения: {confirmation_pdf_path}")
-                            confirmation_success = await send_message(
+                            # Договор и подтверждение — одним sendMediaGroup
+                            logger.info(f"📤 Отправка документов: {contract_pdf_path}, {confirmation_pdf_path}")
+                            documents_success = await send_message(
                                 session,
                                 init_chat_id,
-                                f"✅ Подтверждение бронирования для {data['fullname']}",
-                                media_files=str(confirmation_pdf_path),
+                                f"📄 Договор аренды и подтверждение бронирования для {data['fullname']}",
+                                media_files=[str(contract_pdf_path), str(confirmation_pdf_path)],
                                 timeout_sec=60  # Увеличиваем таймаут для файлов
                             )
 
-                            if not confirmation_success:
-                                raise Exception("Не удалось отправить подтверждение")
+                            if not documents_success:
+                                raise Exception("Не удалось отправить договор и подтверждение")
 
                             # Успешное сообщение
                             await send_message(
@@ -196,7 +194,7 @@ async def handle_contract(data: Dict[str, Any], filename: str):
 
                             # Отправляем сообщение об ошибке
                             try:
-                                async with aiohttp.ClientSession() as error_session:
+                                async with telegram_session() as error_session:
                                     await send_message(
                                         error_session,
                                         init_chat_id,
@@ -219,7 +217,7 @@ async def handle_contract(data: Dict[str, Any], filename: str):
 
                             # Отправляем сообщение об ошибке
                             try:
-                                async with aiohttp.ClientSession() as error_session:
+                                async with telegram_session() as error_session:
                                     await send_message(
                                         error_session,
                                         init_chat_id,
@@ -251,7 +249,7 @@ async def handle_contract(data: Dict[str, Any], filename: str):
 
         if init_chat_id:
             try:
-                async with aiohttp.ClientSession() as session:
+                async with telegram_session() as session:
                     await send_message(
                         session,
                         init_chat_id,
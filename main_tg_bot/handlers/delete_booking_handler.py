@@ -1,17 +1,17 @@
 # main_tg_bot/handlers/delete_booking_handler.py
 
-import pandas as pd
+import asyncio
 from typing import Any, Dict, Optional
 
 from common.logging_config import setup_logger
 from main_tg_bot.booking_objects import (
     BOOKING_SHEETS,
     SHEET_TO_FILENAME,
+    booking_store,
     get_booking_sheet,
 )
-from telega.tg_notifier import send_message
-from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
-import aiohttp
+from telega.tg_notifier import send_message, telegram_session
+from main_tg_bot.google_sheets.sync_queue import sync_queue
 
 logger = setup_logger("delete_booking_handler")
 
@@ -31,7 +31,7 @@ async def handle_delete_booking(data: Dict[str, Any], filename: str):
     # --- Сразу отправляем "обрабатывается" ---
     if init_chat_id:
         try:
-            async with aiohttp.ClientSession() as session:
+            async with telegram_session() as session:
                 await send_message(session, init_chat_id, f"🗑️ Ваш запрос на удаление бронирования {guest_name} обрабатывается...")
                 logger.info(f"📢 Уведомление 'обрабатывается' отправлено в чат {init_chat_id}")
         except Exception as e:
@@ -66,45 +66,29 @@ async def handle_delete_booking(data: Dict[str, Any], filename: str):
         if not csv_filepath.exists():
             raise FileNotFoundError(f"❌ Файл бронирований для объекта '{object_display_name}' не найден.")
 
-        try:
-            df = pd.read_csv(csv_filepath, dtype=str).fillna('')
-        except Exception as e:
-            logger.error(f"❌ Ошибка при чтении CSV: {e}")
-            raise RuntimeError("Не удалось прочитать файл бронирований.")
-
-        if '_sync_id' not in df.columns:
+        if '_sync_id' not in await asyncio.to_thread(booking_store.get_columns, booking_sheet):
             raise ValueError("❌ В файле отсутствует колонка '_sync_id'.")
 
         # --- Поиск и удаление записи ---
-        mask = df['_sync_id'] == sync_id
-        if not mask.any():
-            raise ValueError(f"❌ Бронирование с _sync_id={sync_id} не найдено.")
-
-        deleted_row = df[mask].iloc[0]
-        guest_name = deleted_row.get('Гость', 'Гость')
-
-        df = df[~mask].reset_index(drop=True)
-
         try:
-            df.to_csv(csv_filepath, index=False, encoding='utf-8')
-            logger.info(f"✅ Бронирование с _sync_id={sync_id} удалено")
+            # SQLite-транзакция (BEGIN IMMEDIATE, busy_timeout) — в потоке, чтобы не стопорить event loop
+            deleted_row = await asyncio.to_thread(booking_store.delete_booking, booking_sheet, sync_id)
         except Exception as save_error:
             logger.error(f"❌ Ошибка при сохранении CSV после удаления: {save_error}")
             raise RuntimeError("Ошибка при сохранении изменений в файл.")
 
-        # --- Синхронизация с Google Таблицей ---
-        try:
-            sync_manager = GoogleSheetsCSVSync()
-            sync_success = sync_manager.sync_sheet(sheet_name=sheet_name_for_sync, direction='csv_to_google')
-            if not sync_success:
-                raise RuntimeError("Синхронизация завершилась со статусом False")
-        except Exception as sync_error:
-            logger.error(f"❌ Ошибка при синхронизации после удаления: {sync_error}")
-            raise RuntimeError("Проблема с синхронизацией в Google Таблицу.")
+        if deleted_row is None:
+            raise ValueError(f"❌ Бронирование с _sync_id={sync_id} не найдено.")
+
+        guest_name = deleted_row.get('Гость', 'Гость')
+        logger.info(f"✅ Бронирование с _sync_id={sync_id} удалено")
+
+        # --- Синхронизация с Google Таблицей (отложенная, через очередь) ---
+        sync_queue.mark_dirty(sheet_name_for_sync, direction='csv_to_google')
 
         # --- УСПЕХ ---
         if init_chat_id:
-            async with aiohttp.ClientSession() as session:
+            async with telegram_session() as session:
                 success_msg = f"✅ Бронирование гостя «{guest_name}» успешно удалено!"
                 await send_message(session, init_chat_id, success_msg)
                 logger.info(f"✅ Уведомление об успешном удалении отправлено в чат {init_chat_id}")
@@ -115,7 +99,7 @@ async def handle_delete_booking(data: Dict[str, Any], filename: str):
         error_msg = str(e)
         logger.error(f"❌ Ошибка при удалении бронирования: {error_msg}")
         if init_chat_id:
-            async with aiohttp.ClientSession() as session:
+            async with telegram_session() as session:
                 await send_message(
                     session,
                     init_chat_id,
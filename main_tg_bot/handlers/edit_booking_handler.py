@@ -1,37 +1,22 @@
 # main_tg_bot/handlers/edit_booking_handler.py
 
-import pandas as pd
+import asyncio
 from typing import Any, Dict, Optional
 
 from common.logging_config import setup_logger
 from main_tg_bot.booking_objects import (
   BOOKING_SHEETS,
   SHEET_TO_FILENAME,
+  booking_store,
   get_booking_sheet,
+  parse_booking_date,
 )
-from telega.tg_notifier import send_message
-from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
-import aiohttp
+from telega.tg_notifier import send_message, telegram_session
+from main_tg_bot.google_sheets.sync_queue import sync_queue
 
 logger = setup_logger("edit_booking_handler")
 
 
-def parse_date(date_str: str):
-  """Безопасный парсинг даты. Возвращает datetime.date или None."""
-  if not date_str or str(date_str).strip().lower() in ('', 'nan', 'none',
-                                                       'null'):
-    return None
-  for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-    try:
-      dt = pd.to_datetime(date_str, format=fmt, errors='coerce')
-      if pd.isna(dt):
-        continue
-      return dt.date()
-    except Exception:
-      continue
-  return None
-
-
 async def handle_edit_booking(data: Dict[str, Any], filename: str):
   logger.info("✏️ [handle_edit_booking] Начало редактирования бронирования")
   logger.info(f"✏️ [handle_edit_booking] Имя файла: {filename}")
@@ -51,7 +36,7 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
   # --- Сразу отправляем "обрабатывается" ---
   if init_chat_id:
     try:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         await send_message(session, init_chat_id,
                            f"✏️ Изменение бронирования {guest_name} обрабатывается...")
         logger.info(
@@ -96,29 +81,22 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
       raise FileNotFoundError(
           f"❌ Файл бронирований для объекта '{object_display_name}' не найден.")
 
-    try:
-      df = pd.read_csv(csv_filepath, dtype=str).fillna('')
-    except Exception as e:
-      logger.error(f"❌ Ошибка при чтении CSV: {e}")
-      raise RuntimeError("Не удалось прочитать файл бронирований.")
-
-    if '_sync_id' not in df.columns:
+    if '_sync_id' not in await asyncio.to_thread(booking_store.get_columns, booking_sheet):
       raise ValueError("❌ В файле отсутствует колонка '_sync_id'.")
 
     # --- Поиск записи ---
-    mask = df['_sync_id'] == sync_id
-    if not mask.any():
+    original_row = await asyncio.to_thread(booking_store.get_booking, booking_sheet, sync_id)
+    if original_row is None:
       raise ValueError(f"❌ Бронирование с _sync_id={sync_id} не найдено.")
 
-    original_row = df[mask].iloc[0].copy()
     guest_name = original_row.get('Гость', 'Гость')
 
     # --- Валидация дат (если обновляются) ---
     check_in_str = data.get('check_in', original_row['Заезд']).strip()
     check_out_str = data.get('check_out', original_row['Выезд']).strip()
 
-    check_in = parse_date(check_in_str)
-    check_out = parse_date(check_out_str)
+    check_in = parse_booking_date(check_in_str)
+    check_out = parse_booking_date(check_out_str)
 
     if check_in is None or check_out is None:
       raise ValueError("❌ Неверный формат даты заезда или выезда.")
@@ -133,20 +111,11 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
 
     if not is_booking_other:
       logger.info("✏️ [handle_edit_booking] Выполняем проверку пересечений дат")
-      existing_df = df[~mask].copy()
-      overlaps = []
-      for _, row in existing_df.iterrows():
-        existing_check_in = parse_date(row['Заезд'])
-        existing_check_out = parse_date(row['Выезд'])
-
-        # Пропускаем записи с некорректными или отсутствующими датами
-        if existing_check_in is None or existing_check_out is None:
-          continue
-
-        # Проверка пересечения интервалов
-        if not (
-            check_out <= existing_check_in or check_in >= existing_check_out):
-          overlaps.append((row['Гость'], row['Заезд'], row['Выезд']))
+      overlaps = [
+        (row.get('Гость', ''), row['Заезд'], row['Выезд'])
+        for row in await asyncio.to_thread(
+            booking_store.find_overlaps, booking_sheet, check_in, check_out, exclude_sync_id=sync_id)
+      ]
 
       if overlaps:
         overlap_list = "\n".join(
@@ -224,22 +193,12 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
       logger.info(f"    Хозяин: {owner_name}")
       logger.info(f"    Комиссия: {commission}")
 
-    # Проверяем, что все колонки существуют в DataFrame
-    # Если нет - добавляем их
-    for column_name in update_fields.keys():
-      if column_name not in df.columns:
-        logger.warning(
-          f"⚠️ Колонка '{column_name}' отсутствует в CSV, добавляем её")
-        df[column_name] = ''
-
-    # Обновляем данные
-    for column_name, value in update_fields.items():
-      df.loc[mask, column_name] = value
-
     try:
-      df.to_csv(csv_filepath, index=False, encoding='utf-8')
+      # SQLite-транзакция (BEGIN IMMEDIATE, busy_timeout) — в потоке, чтобы не стопорить event loop
+      updated_row = await asyncio.to_thread(booking_store.update_booking, booking_sheet, sync_id, update_fields)
+      if updated_row is None:
+        raise ValueError(f"❌ Бронирование с _sync_id={sync_id} не найдено.")
       logger.info(f"✅ Бронирование с _sync_id={sync_id} обновлено")
-      logger.info(f"✅ Файл сохранен: {csv_filepath}")
 
       # Логируем обновленные данные для отладки
       logger.info(f"✏️ [handle_edit_booking] Обновлены данные:")
@@ -250,20 +209,12 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
       logger.error(f"❌ Ошибка при сохранении CSV: {save_error}")
       raise RuntimeError("Ошибка при сохранении изменений в файл.")
 
-    # --- Синхронизация с Google Таблицей ---
-    try:
-      sync_manager = GoogleSheetsCSVSync()
-      sync_success = sync_manager.sync_sheet(sheet_name=sheet_name_for_sync,
-                                             direction='csv_to_google')
-      if not sync_success:
-        raise RuntimeError("Синхронизация завершилась со статусом False")
-    except Exception as sync_error:
-      logger.error(f"❌ Ошибка при синхронизации: {sync_error}")
-      raise RuntimeError("Проблема с синхронизацией в Google Таблицу.")
+    # --- Синхронизация с Google Таблицей (отложенная, через очередь) ---
+    sync_queue.mark_dirty(sheet_name_for_sync, direction='csv_to_google')
 
     # --- УСПЕХ ---
     if init_chat_id:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         success_msg = f"✅ Бронирование гостя «{guest_name}» успешно обновлено!"
         if is_booking_other:
           success_msg = f"✅ Бронирование {guest_name} в booking_other успешно обновлено!"
@@ -277,7 +228,7 @@ async def handle_edit_booking(data: Dict[str, Any], filename: str):
     error_msg = str(e)
     logger.error(f"❌ Ошибка при редактировании бронирования: {error_msg}")
     if init_chat_id:
-      async with aiohttp.ClientSession() as session:
+      async with telegram_session() as session:
         await send_message(
             session,
             init_chat_id,
@@ -6,13 +6,12 @@ from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import pandas as pd
-import aiohttp
 
 from common.config import Config
 from common.logging_config import setup_logger
 from main_tg_bot.booking_objects import PROJECT_ROOT
 from telega.telegram_client import telegram_client
-from telega.tg_notifier import send_message
+from telega.tg_notifier import send_message, telegram_session
 from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
 
 TASK_DATA_DIR = PROJECT_ROOT / Config.TASK_DATA_DIR
@@ -179,7 +178,7 @@ class ChannelCSVManager:
 
             # Синхронизируем с Google Sheets
             try:
-                sync_success = self.sync_manager.sync_sheet(
+                sync_success = await self.sync_manager.sync_sheet_async(
                     sheet_name="Отправка бронирований",
                     direction='csv_to_google'
                 )
@@ -495,7 +494,7 @@ async def _send_notification(chat_id: str, message: str) -> None:
         message: Текст сообщения
     """
     try:
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
             await send_message(session, chat_id, message, timeout_sec=30)
     except Exception as e:
         logger.error(f"❌ Не удалось отправить уведомление в {chat_id}: {str(e)}")
@@ -613,7 +612,7 @@ async def _send_detailed_report(chat_id: str, results: List[Dict[str, Any]],
         # Отправляем подробный отчет как отдельный пост
         detailed_report = "\n".join(detailed_report_lines)
 
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
             await send_message(session, chat_id, detailed_report)
             logger.info(f"📋 Подробный отчет о рассылке отправлен в {chat_id}")
 
@@ -649,7 +648,7 @@ async def _send_quick_summary(chat_id: str, successful: int, failed: int, skippe
 
         summary_message = "\n".join(summary_lines)
 
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
             await send_message(session, chat_id, summary_message)
 
     except Exception as e:
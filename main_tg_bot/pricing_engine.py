@@ -0,0 +1,257 @@
+# main_tg_bot/pricing_engine.py
+import threading
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from common.config import Config
+from common.logging_config import setup_logger
+from main_tg_bot.availability_engine import AvailabilityEngine
+from main_tg_bot.booking_objects import BOOKING_SHEETS, PROJECT_ROOT, BookingSheet
+
+logger = setup_logger("pricing_engine")
+
+# Помесячные прайсы объектов: task_files/<файл объекта>_price.csv
+PRICE_DIR = PROJECT_ROOT / Config.TASK_DATA_DIR
+
+MONTHS = {
+    "январь": 1, "февраль": 2, "март": 3, "апрель": 4,
+    "май": 5, "июнь": 6, "июль": 7, "август": 8,
+    "сентябрь": 9, "октябрь": 10, "ноябрь": 11, "декабрь": 12
+}
+
+# Автоматическая скидка калькулятора (booking_calculator.php, applyAutoDiscount)
+AUTO_DISCOUNT_MIN_NIGHTS = 27
+AUTO_DISCOUNT_PERCENT = 10
+# Допустимое расхождение суммы из формы с расчётом (баты): сумму часто округляют вручную
+PRICE_MATCH_TOLERANCE = 1
+
+
+def read_price_table(price_path: Path) -> List[dict]:
+    """Помесячная таблица цен в том же виде, что и readPriceData() в booking_calculator.php."""
+    if not price_path.exists():
+        return []
+    df = pd.read_csv(price_path, dtype=str, header=0).fillna('')
+    if df.shape[1] < 4:
+        return []
+
+    month = df.iloc[:, 0].str.strip().str.lower().map(MONTHS)
+    start_day = pd.to_numeric(df.iloc[:, 1].str.strip(), errors='coerce')
+    end_day = pd.to_numeric(df.iloc[:, 2].str.strip(), errors='coerce')
+    price = pd.to_numeric(df.iloc[:, 3].str.strip(), errors='coerce')
+    valid = month.notna() & (start_day > 0) & (end_day >= start_day) & (price > 0)
+
+    return [
+        {"startMonth": int(m), "endMonth": int(m), "startDay": int(s), "endDay": int(e), "price": int(p)}
+        for m, s, e, p in zip(month[valid], start_day[valid], end_day[valid], price[valid])
+    ]
+
+
+class PriceCalendar:
+    """
+    Цена каждой ночи объекта за несколько календарных лет и префиксные суммы по ним.
+
+    Ночь получает цену первого подходящего периода прайса (как getPriceForDate в PHP),
+    поэтому сумма за любой интервал [check_in, check_out) — это разность двух префиксов, O(1).
+    """
+
+    def __init__(self, periods: List[dict], first_year: int, last_year: int):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.start = date(first_year, 1, 1)
+        nights = pd.date_range(self.start, date(last_year + 1, 1, 1), freq='D', inclusive='left')
+        months = nights.month.to_numpy()
+        days = nights.day.to_numpy()
+
+        prices = np.zeros(len(nights), dtype=np.int64)
+        priced = np.zeros(len(nights), dtype=bool)
+        for period in periods:
+            match = (~priced & (months == period['startMonth'])
+                     & (days >= period['startDay']) & (days <= period['endDay']))
+            prices[match] = period['price']
+            priced |= match
+
+        self.prices = prices
+        self._price_prefix = np.concatenate(([0], np.cumsum(prices)))
+        self._unpriced_prefix = np.concatenate(([0], np.cumsum(~priced)))
+
+    def _index(self, day: date) -> int:
+        return (day - self.start).days
+
+    def total(self, check_in: date, check_out: date) -> Tuple[int, int]:
+        """Сумма за ночи [check_in, check_out) и число ночей без цены в прайсе."""
+        first, last = self._index(check_in), self._index(check_out)
+        return (
+            int(self._price_prefix[last] - self._price_prefix[first]),
+            int(self._unpriced_prefix[last] - self._unpriced_prefix[first])
+        )
+
+    def totals(self, windows: List[Tuple[date, date]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Суммы и ночи без цены сразу для многих интервалов (векторно)."""
+        first = np.array([self._index(check_in) for check_in, _ in windows], dtype=np.int64)
+        last = np.array([self._index(check_out) for _, check_out in windows], dtype=np.int64)
+        return (
+            self._price_prefix[last] - self._price_prefix[first],
+            self._unpriced_prefix[last] - self._unpriced_prefix[first]
+        )
+
+
+def _discounted(total: int, discount: int) -> Union[int, float]:
+    """
+    Сумма со скидкой так же, как в updateDiscount() калькулятора:
+    originalTotalCost - originalTotalCost * discount / 100 без округления до целого
+    (страница показывает дробную часть, например 12 345,5).
+    """
+    amount = round(total - total * discount / 100, 2)
+    return int(amount) if amount.is_integer() else amount
+
+
+def round_baht(amount: Union[int, float]) -> int:
+    """Сумма в целых батах (половина — вверх) для договора: суммы прописью и остаток считаются в целых."""
+    return int(Decimal(str(amount)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def matches_quote(amount: float, quote: dict) -> bool:
+    """Совпадает ли сумма с расчётом без скидки или со скидкой (с точностью PRICE_MATCH_TOLERANCE)."""
+    return any(
+        abs(amount - expected) <= PRICE_MATCH_TOLERANCE
+        for expected in (quote['total'], quote['total_with_discount'])
+    )
+
+
+def _make_quote(check_in: date, check_out: date, total: int, unpriced_nights: int) -> dict:
+    nights = (check_out - check_in).days
+    discount = AUTO_DISCOUNT_PERCENT if nights >= AUTO_DISCOUNT_MIN_NIGHTS else 0
+    return {
+        'check_in': check_in,
+        'check_out': check_out,
+        'nights': nights,
+        'total': total,
+        'discount_percent': discount,
+        'total_with_discount': _discounted(total, discount),
+        # Ночи, для которых в прайсе нет цены (в калькуляторе они стоят 0)
+        'unpriced_nights': unpriced_nights,
+    }
+
+
+class PricingEngine:
+    """
+    Расчёт стоимости проживания по помесячным прайсам объектов на стороне бота.
+
+    Прайс каждого объекта разворачивается в PriceCalendar один раз и перечитывается,
+    только когда меняется файл прайса (mtime/размер) или запрос выходит за покрытые годы.
+    """
+
+    def __init__(self, price_dir: Path = PRICE_DIR):
+        self.price_dir = price_dir
+        self._lock = threading.Lock()
+        # sheet_name -> ((mtime_ns, размер), PriceCalendar)
+        self._calendars: Dict[str, Tuple[tuple, PriceCalendar]] = {}
+
+    @staticmethod
+    def resolve_sheet(object_name: str) -> Optional[BookingSheet]:
+        """Объект по имени листа ('HALO Title') или имени файла ('Halo_Title', 'halo_title')."""
+        booking_sheet = BOOKING_SHEETS.get(object_name)
+        if booking_sheet is not None:
+            return booking_sheet
+        stem = object_name.strip().lower().replace(' ', '_')
+        for booking_sheet in BOOKING_SHEETS.values():
+            if booking_sheet.filepath.stem == stem:
+                return booking_sheet
+        return None
+
+    def price_path(self, booking_sheet: BookingSheet) -> Path:
+        return self.price_dir / f"{booking_sheet.filepath.stem}_price.csv"
+
+    def _calendar(self, booking_sheet: BookingSheet, first_year: int, last_year: int) -> Optional[PriceCalendar]:
+        price_path = self.price_path(booking_sheet)
+        try:
+            stat = price_path.stat()
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._calendars.get(booking_sheet.sheet_name)
+        if cached is not None and cached[0] == signature:
+            calendar = cached[1]
+            if calendar.first_year <= first_year and calendar.last_year >= last_year:
+                return calendar
+            first_year = min(first_year, calendar.first_year)
+            last_year = max(last_year, calendar.last_year)
+
+        periods = read_price_table(price_path)
+        if not periods:
+            return None
+        # Запас на год вперёд, чтобы соседние запросы не перестраивали календарь
+        calendar = PriceCalendar(periods, first_year, last_year + 1)
+        with self._lock:
+            self._calendars[booking_sheet.sheet_name] = (signature, calendar)
+        logger.debug(f"Price calendar for '{booking_sheet.sheet_name}': {first_year}–{last_year + 1}")
+        return calendar
+
+    def quote(self, object_name: str, check_in: date, check_out: date) -> Optional[dict]:
+        """
+        Стоимость проживания [check_in, check_out) по прайсу объекта
+
+        Args:
+            object_name: Имя листа или файла объекта
+            check_in: Дата заезда
+            check_out: Дата выезда
+
+        Returns:
+            Optional[dict]: nights, total, discount_percent, total_with_discount, unpriced_nights;
+                            None, если объекта или прайса нет
+        """
+        booking_sheet = self.resolve_sheet(object_name)
+        if booking_sheet is None or check_out <= check_in:
+            return None
+        calendar = self._calendar(booking_sheet, check_in.year, check_out.year)
+        if calendar is None:
+            return None
+        total, unpriced = calendar.total(check_in, check_out)
+        return _make_quote(check_in, check_out, total, unpriced)
+
+    def quote_windows(self, object_name: str, windows: List[Tuple[date, date]]) -> List[dict]:
+        """Стоимость сразу для многих интервалов одного объекта (например, всех свободных окон)."""
+        booking_sheet = self.resolve_sheet(object_name)
+        windows = [(check_in, check_out) for check_in, check_out in windows if check_out > check_in]
+        if booking_sheet is None or not windows:
+            return []
+        calendar = self._calendar(
+            booking_sheet,
+            min(check_in.year for check_in, _ in windows),
+            max(check_out.year for _, check_out in windows)
+        )
+        if calendar is None:
+            return []
+        totals, unpriced = calendar.totals(windows)
+        return [
+            _make_quote(check_in, check_out, int(total), int(missing))
+            for (check_in, check_out), total, missing in zip(windows, totals, unpriced)
+        ]
+
+    def quote_free_windows(self, min_nights: int = 1,
+                           engine: Optional[AvailabilityEngine] = None) -> Dict[str, List[dict]]:
+        """
+        Цены всех свободных окон всех объектов с прайсом — без обращения к PHP-калькулятору
+
+        Args:
+            min_nights: Минимальная длина окна в ночах
+            engine: Готовый AvailabilityEngine (если не передан, строится новый)
+
+        Returns:
+            Dict[str, List[dict]]: sheet_name -> расчёты по окнам
+        """
+        engine = engine or AvailabilityEngine()
+        return {
+            sheet_name: self.quote_windows(sheet_name, windows)
+            for sheet_name, windows in engine.free_windows_all(min_nights).items()
+        }
+
+
+pricing_engine = PricingEngine()
@@ -1,5 +1,4 @@
 import asyncio
-import csv
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Optional, Tuple
@@ -7,7 +6,7 @@ from typing import List, Optional, Tuple
 from telega.send_tg_reklama import TelegramSender  # Импортируем класс для отправки
 from common.config import Config
 from common.logging_config import setup_logger
-from main_tg_bot.booking_objects import PROJECT_ROOT
+from main_tg_bot.booking_objects import PROJECT_ROOT, booking_repository, parse_booking_date
 
 logger = setup_logger("halo_send_to_telegram_chats_bookings")
 
@@ -22,17 +21,17 @@ class CSVBooking:
 
     def __init__(self, row):
         self.sheet_name = "Halo"  # Название объекта по умолчанию
-        self.check_in = self._parse_date(row.get('Заезд', '').strip())
-        self.check_out = self._parse_date(row.get('Выезд', '').strip())
+        # Строки из booking_repository уже содержат разобранные даты
+        if '_check_in' in row:
+            self.check_in = row['_check_in']
+            self.check_out = row['_check_out']
+        else:
+            self.check_in = self._parse_date(row.get('Заезд', '').strip())
+            self.check_out = self._parse_date(row.get('Выезд', '').strip())
 
     def _parse_date(self, date_str):
-        """Парсит дату из строки формата DD.MM.YYYY"""
-        if not date_str:
-            return None
-        try:
-            return datetime.strptime(date_str, '%d.%m.%Y').date()
-        except ValueError:
-            return None
+        """Парсит дату по общим форматам бронирований"""
+        return parse_booking_date(date_str)
 
 
 def read_bookings_from_csv(csv_file_path: str, title: str) -> List[CSVBooking]:
@@ -40,16 +39,13 @@ def read_bookings_from_csv(csv_file_path: str, title: str) -> List[CSVBooking]:
     bookings = []
 
     try:
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter=',')
-
-            for row in reader:
-                # Пропускаем пустые строки
-                if not any(row.values()):
-                    continue
+        for row in booking_repository.records(csv_file_path):
+            # Пропускаем пустые строки
+            if not any(value for key, value in row.items() if not key.startswith('_check')):
+                continue
 
-                booking = CSVBooking(row)
-                bookings.append(booking)
+            booking = CSVBooking(row)
+            bookings.append(booking)
 
         logger.info(f"Прочитано {len(bookings)} бронирований из CSV файла")
         return bookings
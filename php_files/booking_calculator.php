@@ -59,14 +59,52 @@ function readPriceData($filePath) {
 }
 
 $bookingFilesPath = __DIR__ . '/booking_files/*.csv';
-$files = glob($bookingFilesPath);
+$files = glob($bookingFilesPath) ?: [];
 
 $bookedData = [];
 $checkoutDates = [];
 $checkinDates = [];
 $priceData = [];
 
-if (!empty($files)) {
+// Быстрый путь: готовый снимок availability.json, который бот публикует вместе с CSV.
+// Берём его, только если в нём есть каждый CSV папки и md5 каждого совпадает с файлом
+// на сервере (снимок собран ровно по этим файлам), иначе читаем CSV как раньше.
+$snapshotFile = __DIR__ . '/booking_files/availability.json';
+$snapshot = null;
+if (file_exists($snapshotFile)) {
+    $candidate = json_decode(file_get_contents($snapshotFile), true);
+    if (is_array($candidate) && isset($candidate['objects'])) {
+        $isFresh = true;
+        foreach ($files as $file) {
+            $filename = pathinfo($file, PATHINFO_FILENAME);
+            if ($filename === $EXCLUDED_FILE) {
+                continue;
+            }
+            $object = $candidate['objects'][$filename] ?? null;
+            if (!is_array($object) || ($object['csv_md5'] ?? null) !== md5_file($file)) {
+                $isFresh = false;
+                break;
+            }
+        }
+        if ($isFresh) {
+            $snapshot = $candidate;
+        }
+    }
+}
+
+if ($snapshot !== null) {
+    foreach ($files as $file) {
+        $filename = pathinfo($file, PATHINFO_FILENAME);
+        if ($filename === $EXCLUDED_FILE) {
+            continue;
+        }
+        $object = $snapshot['objects'][$filename];
+        $bookedData[$filename] = $object['booked'];
+        $checkoutDates[$filename] = $object['checkouts'];
+        $checkinDates[$filename] = $object['checkins'];
+        $priceData[$filename] = $object['prices'];
+    }
+} elseif (!empty($files)) {
     foreach ($files as $file) {
         $filename = pathinfo($file, PATHINFO_FILENAME);
         // Исключаем указанный файл
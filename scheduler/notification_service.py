@@ -1,17 +1,17 @@
 # main_tg_bot/notification_service.py
 
+import asyncio
 import csv
 from datetime import datetime, date, timedelta
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
-import aiohttp
-
 from common.config import Config
 from common.logging_config import setup_logger
 # Используем booking_objects для точного соответствия объект ↔ файл
-from main_tg_bot.booking_objects import BOOKING_SHEETS, get_booking_sheet, PROJECT_ROOT
-from telega.tg_notifier import send_message
+from main_tg_bot.booking_objects import BOOKING_SHEETS, booking_repository, get_booking_sheet, parse_booking_date, PROJECT_ROOT
+from telega.outbound_dispatcher import PRIORITY_SCHEDULED
+from telega.tg_notifier import close_session, send_message, telegram_session
 
 logger = setup_logger("notification_service")
 TELEGRAM_CHAT_IDS = Config.TELEGRAM_CHAT_NOTIFICATION_ID
@@ -51,9 +51,8 @@ def load_object_data_from_csv(object_name: str) -> List[Dict[str, Any]]:
         return []
 
     try:
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            data = list(reader)
+        # Строки уже с разобранными датами _check_in/_check_out
+        data = booking_repository.records(csv_path)
         logger.info(f"✅ Загружено {len(data)} записей для объекта '{object_name}' из {csv_path}")
         return data
     except Exception as e:
@@ -65,18 +64,19 @@ def load_object_data_from_csv(object_name: str) -> List[Dict[str, Any]]:
 def parse_date(date_str: str) -> Optional[date]:
     if not date_str or date_str.strip() == '':
         return None
-    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
-        try:
-            return datetime.strptime(date_str.strip(), fmt).date()
-        except ValueError:
-            continue
+    parsed = parse_booking_date(date_str)
+    if parsed is not None:
+        return parsed
     logger.warning(f"⚠️ Не удалось распарсить дату: '{date_str}'")
     return None
 
 
 def enrich_booking_with_dates(booking: Dict[str, Any]) -> Dict[str, Any]:
-    booking['_check_in'] = parse_date(booking.get('Заезд', ''))
-    booking['_check_out'] = parse_date(booking.get('Выезд', ''))
+    # Строки из booking_repository приходят с уже разобранными датами
+    if '_check_in' not in booking:
+        booking['_check_in'] = parse_date(booking.get('Заезд', ''))
+    if '_check_out' not in booking:
+        booking['_check_out'] = parse_date(booking.get('Выезд', ''))
     return booking
 
 
@@ -203,13 +203,16 @@ async def send_notification(http_session, booking: Dict[str, Any], notification:
 
     logger.debug(f"📝 Текст сообщения:\n{formatted_message}")
 
-    for chat_id in TELEGRAM_CHAT_IDS:
+    async def send_to_chat(chat_id):
         try:
-            await send_message(http_session, chat_id, trigger_info)
-            await send_message(http_session, chat_id, formatted_message)
+            await send_message(http_session, chat_id, trigger_info, priority=PRIORITY_SCHEDULED)
+            await send_message(http_session, chat_id, formatted_message, priority=PRIORITY_SCHEDULED)
         except Exception as e:
             logger.error(f"❌ Ошибка отправки в чат {chat_id}: {e}")
 
+    # Чаты обслуживаются параллельно, темп задают лимиты outbound_dispatcher
+    await asyncio.gather(*(send_to_chat(chat_id) for chat_id in TELEGRAM_CHAT_IDS))
+
     logger.info(f"✅ Уведомление успешно отправлено для гостя: {booking.get('Гость', 'N/A')}")
 
 
@@ -248,7 +251,7 @@ async def check_notification_triggers():
 
     logger.info(f"🔍 Начинаю проверку {len(all_bookings)} бронирований на {len(notifications)} триггеров")
 
-    async with aiohttp.ClientSession() as session:
+    async with telegram_session() as session:
         for booking in all_bookings:
             for notification in notifications:
                 if should_trigger_notification(notification, booking, today):
@@ -257,11 +260,18 @@ async def check_notification_triggers():
     logger.info("🏁 Проверка триггеров завершена")
 
 
+async def run_once():
+    """Одна проверка триггеров в отдельном процессе (запуск из планировщика как скрипта)."""
+    try:
+        await check_notification_triggers()
+    finally:
+        await close_session()
+
+
 if __name__ == "__main__":
     try:
-        import asyncio
         logger.info("🔧 Ручной запуск проверки триггеров")
-        asyncio.run(check_notification_triggers())
+        asyncio.run(run_once())
         logger.info("✅ Ручной запуск завершён успешно")
     except Exception as e:
         logger.error(f"💥 Критическая ошибка при ручном запуске: {e}", exc_info=True)
\ No newline at end of file
@@ -5,6 +5,7 @@ from datetime import datetime, time, timedelta
 from pathlib import Path
 from telega.telegram_client import \
   telegram_client  # Используем существующий клиент
+from telega.tg_notifier import close_session
 
 from common.logging_config import setup_logger
 from main_tg_bot.booking_objects import PROJECT_ROOT
@@ -125,7 +126,10 @@ class AsyncScheduler:
     """Запускает все задачи параллельно"""
     logger.info("🚀 Async scheduler started in main process")
     tasks = [self.run_daily_job(job) for job in self.jobs]
-    await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+      await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+      await close_session()
 
   def stop(self):
     """Останавливает планировщик"""
@@ -3,14 +3,14 @@ from datetime import datetime
 import csv
 import os
 import asyncio
-import aiohttp
 from common.config import Config
 from common.logging_config import setup_logger
 from main_tg_bot.booking_objects import PROJECT_ROOT
 from telega.telegram_client import telegram_client
 from telega.telegram_utils import TelegramUtils
 from main_tg_bot.google_sheets.sync_manager import GoogleSheetsCSVSync
-from telega.tg_notifier import send_message
+from telega.outbound_dispatcher import PRIORITY_SCHEDULED
+from telega.tg_notifier import close_session, send_message, telegram_session
 
 logger = setup_logger("update_last_message_tg_info")
 
@@ -244,14 +244,16 @@ async def send_telegram_notification(http_session, chat_data: dict, message_coun
         )
 
         # Отправляем уведомления во все настроенные чаты
-        for chat_id in TELEGRAM_CHAT_IDS:
+        async def send_to_chat(chat_id):
             try:
-                await send_message(http_session, chat_id, notification_title)
-                await send_message(http_session, chat_id, detailed_info)
+                await send_message(http_session, chat_id, notification_title, priority=PRIORITY_SCHEDULED)
+                await send_message(http_session, chat_id, detailed_info, priority=PRIORITY_SCHEDULED)
                 logger.info(f"✅ Уведомление отправлено в чат {chat_id} для канала {chat_data['chat_name']}")
             except Exception as e:
                 logger.error(f"❌ Ошибка отправки в чат {chat_id}: {e}")
 
+        await asyncio.gather(*(send_to_chat(chat_id) for chat_id in TELEGRAM_CHAT_IDS))
+
         return True
 
     except Exception as e:
@@ -306,7 +308,7 @@ async def check_and_send_notification(chat_data: dict, old_message_count, new_me
             f"новых сообщений={new_count}, старое значение={old_message_count}"
         )
 
-        async with aiohttp.ClientSession() as session:
+        async with telegram_session() as session:
             await send_telegram_notification(session, chat_data, new_count)
 
         return True
@@ -484,4 +486,10 @@ async def main():
 
 if __name__ == "__main__":
     # Запуск напрямую (для тестирования)
-    asyncio.run(main())
\ No newline at end of file
+    async def run_once():
+        try:
+            await main()
+        finally:
+            await close_session()
+
+    asyncio.run(run_once())
\ No newline at end of file
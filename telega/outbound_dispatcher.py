@@ -0,0 +1,180 @@
+# telega/outbound_dispatcher.py
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Dict, List, Optional, Union
+
+from common.logging_config import setup_logger
+
+logger = setup_logger("outbound_dispatcher")
+
+# Лимиты Bot API: ~30 сообщений/с на бота, ~1 сообщение/с в чат, 20 сообщений/мин в группу
+TELEGRAM_GLOBAL_RATE = 30.0         # токенов в секунду на бота
+TELEGRAM_GLOBAL_BURST = 30
+TELEGRAM_CHAT_RATE = 1.0            # токенов в секунду на личный чат
+TELEGRAM_CHAT_BURST = 3
+TELEGRAM_GROUP_RATE = 20 / 60       # токенов в секунду на группу/канал
+TELEGRAM_GROUP_BURST = 3
+# Сколько корзин чатов держать, прежде чем выбрасывать простаивающие
+TELEGRAM_MAX_TRACKED_CHATS = 1000
+
+# Приоритеты отправки: меньше — раньше
+PRIORITY_INTERACTIVE = 0            # ответы пользователям бота
+PRIORITY_SCHEDULED = 10             # уведомления планировщика
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity, плюс пауза по retry_after."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд можно взять токен (0 — сейчас)."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds: float, now: float):
+        """Telegram ответил 429: не выдавать токены seconds секунд и начать копить их заново."""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def is_idle(self, now: float) -> bool:
+        return self.wait_time(now) == 0 and self.tokens >= self.capacity
+
+
+class OutboundDispatcher:
+    """
+    Очередь исходящих запросов к Bot API с корзиной токенов на каждый чат и общей на бота.
+
+    send_message ждёт acquire() перед каждым запросом. Разрешения выдаёт фоновый воркер
+    в порядке (приоритет, время постановки): интерактивные ответы обгоняют уведомления
+    планировщика, а чат, упёршийся в свой лимит, не задерживает остальные чаты.
+    Воркер запускается при первой заявке и завершается, когда очередь пуста.
+    """
+
+    def __init__(self):
+        self._global = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_BURST)
+        self._chats: Dict[str, TokenBucket] = {}
+        # (priority, seq, chat_key, future), отсортировано по (priority, seq)
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Заявки из прежнего event loop уже никто не ждёт
+            self._waiters = []
+            self._wakeup = asyncio.Event()
+            self._worker = None
+            self._loop = loop
+        return loop
+
+    def _chat_bucket(self, chat_key: str, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_key)
+        if bucket is None:
+            if len(self._chats) >= TELEGRAM_MAX_TRACKED_CHATS:
+                self._prune(now)
+            # Отрицательные id и @username — группы и каналы
+            if chat_key.startswith(('-', '@')):
+                bucket = TokenBucket(TELEGRAM_GROUP_RATE, TELEGRAM_GROUP_BURST)
+            else:
+                bucket = TokenBucket(TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST)
+            self._chats[chat_key] = bucket
+        return bucket
+
+    def _prune(self, now: float):
+        waiting = {waiter[2] for waiter in self._waiters}
+        for chat_key in [key for key, bucket in self._chats.items()
+                         if key not in waiting and bucket.is_idle(now)]:
+            del self._chats[chat_key]
+
+    async def acquire(self, chat_id: Union[str, int], priority: int = PRIORITY_INTERACTIVE):
+        """
+        Ждёт, пока можно отправить один запрос в чат chat_id
+
+        Args:
+            chat_id: Чат получателя
+            priority: PRIORITY_INTERACTIVE или PRIORITY_SCHEDULED
+        """
+        loop = self._bind_loop()
+        future = loop.create_future()
+        bisect.insort(self._waiters, (priority, next(self._seq), str(chat_id), future))
+        self._wakeup.set()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        await future
+
+    def penalize(self, chat_id: Union[str, int], retry_after: float):
+        """Учитывает retry_after из ответа 429: чат получит следующий токен не раньше, чем через retry_after."""
+        now = time.monotonic()
+        self._chat_bucket(str(chat_id), now).block(retry_after, now)
+        logger.warning(f"⏳ Лимит Telegram для чата {chat_id}: пауза {retry_after} сек.")
+
+    def _grant_next(self, now: float) -> Optional[float]:
+        """
+        Выдаёт разрешение первой заявке, чей чат готов
+
+        Returns:
+            Optional[float]: None, если разрешение выдано; иначе — сколько ждать до следующей попытки
+        """
+        delay = self._global.wait_time(now)
+        if delay > 0:
+            return delay
+
+        delay = None
+        seen_chats = set()
+        for index, (_, _, chat_key, future) in enumerate(self._waiters):
+            # Внутри одного чата соблюдаем порядок очереди
+            if chat_key in seen_chats:
+                continue
+            seen_chats.add(chat_key)
+
+            bucket = self._chat_bucket(chat_key, now)
+            wait = bucket.wait_time(now)
+            if wait == 0:
+                bucket.consume(now)
+                self._global.consume(now)
+                del self._waiters[index]
+                future.set_result(None)
+                return None
+            delay = wait if delay is None else min(delay, wait)
+        return delay
+
+    async def _run(self):
+        while True:
+            # Отменённые заявки (например, прерванный обработчик) просто выбрасываем
+            self._waiters = [waiter for waiter in self._waiters if not waiter[3].done()]
+            if not self._waiters:
+                return
+
+            self._wakeup.clear()
+            delay = self._grant_next(time.monotonic())
+            if delay is None:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbound_dispatcher = OutboundDispatcher()
@@ -1,10 +1,11 @@
 # telegram_client.py
 from pathlib import Path
-from typing import Optional, Union, List, Tuple, Dict
+from typing import Iterable, Optional, Union, List, Tuple, Dict
 import asyncio
 import json
-import time
 import sqlite3
+import threading
+import time
 
 from telethon import TelegramClient, utils
 from telethon.tl.types import InputMediaUploadedPhoto, \
@@ -19,88 +20,238 @@ from telega.telegram_utils import TelegramUtils
 logger = setup_logger("telegram_client")
 
 
-class EntityFileManager:
-  """Менеджер для хранения entity в файле"""
-
-  def __init__(self, cache_file: Path):
-    self.cache_file = cache_file
-    self._cache_loaded = False
-    self._cache_loading = False
-
-  def load_entities(self) -> Dict[str, Dict]:
-    """Загрузка entity из файла"""
+# Сколько миллисекунд ждать, пока другой процесс освободит базу entity
+ENTITY_DB_BUSY_TIMEOUT_MS = 10000
+
+
+def entity_to_cache_data(entity, full_id=None) -> Dict:
+  """Упрощенное представление entity для хранения в кэше"""
+  return {
+    'id': entity.id,
+    'title': getattr(entity, 'title', ''),
+    'username': getattr(entity, 'username', ''),
+    'type': type(entity).__name__,
+    'access_hash': getattr(entity, 'access_hash', ''),
+    'full_id': full_id if full_id is not None else utils.get_peer_id(entity)
+  }
+
+
+class EntityCache:
+  """
+  Общий для всех процессов кэш entity (BookingBot, Scheduler, ChannelMonitor).
+
+  Хранилище — SQLite в режиме WAL: каждая entity хранится один раз (по полному ID),
+  а идентификаторы — id, -100id, @username, название и любые ключи, по которым её
+  искали, — ссылаются на неё. Запись — upsert отдельных строк, поэтому процессы
+  не перезаписывают друг другу файл и сразу видят найденные другими entity.
+  В памяти держится индекс прочитанного; промах идёт в базу.
+  """
+
+  def __init__(self, db_path: Path, legacy_file: Optional[Path] = None):
+    self.db_path = db_path
+    # Прежний JSON-файл entity: импортируется один раз, если база пуста
+    self.legacy_file = legacy_file
+    self._local = threading.local()
+    self._schema_ready = False
+    self._schema_lock = threading.Lock()
+    # полный ID -> данные entity
+    self._records: Dict[str, Dict] = {}
+    # идентификатор -> полный ID
+    self._aliases: Dict[str, str] = {}
+    self.loaded = False
+    self.loading = False
+
+  def _connection(self) -> sqlite3.Connection:
+    # sqlite3-соединение нельзя делить между потоками — держим по одному на поток
+    conn = getattr(self._local, 'conn', None)
+    if conn is None:
+      self.db_path.parent.mkdir(parents=True, exist_ok=True)
+      conn = sqlite3.connect(self.db_path, timeout=ENTITY_DB_BUSY_TIMEOUT_MS / 1000,
+                             isolation_level=None)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      conn.execute(f"PRAGMA busy_timeout={ENTITY_DB_BUSY_TIMEOUT_MS}")
+      self._local.conn = conn
+    with self._schema_lock:
+      if not self._schema_ready:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entities (
+                record_key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entity_aliases (
+                identifier TEXT PRIMARY KEY,
+                record_key TEXT NOT NULL
+            );
+        """)
+        self._schema_ready = True
+    return conn
+
+  @staticmethod
+  def _record_key(entity_data: Dict) -> str:
+    return str(entity_data.get('full_id') or entity_data.get('id'))
+
+  @staticmethod
+  def _derived_identifiers(entity_data: Dict) -> List[str]:
+    """Идентификаторы, по которым entity находится всегда: id, -100id, @username, название"""
+    entity_id = str(entity_data.get('id') or '')
+    identifiers = [entity_id, str(entity_data.get('full_id') or '')]
+    if entity_data.get('type') == 'Channel' and entity_id.isdigit():
+      identifiers.append(f"-100{entity_id}")
+    if entity_data.get('username'):
+      identifiers.append(f"@{entity_data['username']}")
+    identifiers.append(entity_data.get('title') or '')
+    return [identifier for identifier in identifiers if identifier]
+
+  def _put_many(self, entries: Iterable[Tuple[Dict, Iterable]]) -> int:
+    """Upsert entity и их идентификаторов одной транзакцией; возвращает число новых идентификаторов"""
+    now = time.time()
+    records, aliases = {}, {}
+    for entity_data, identifiers in entries:
+      record_key = self._record_key(entity_data)
+      records[record_key] = entity_data
+      for identifier in [*self._derived_identifiers(entity_data), *identifiers]:
+        if identifier:
+          aliases[str(identifier)] = record_key
+    if not records:
+      return 0
+
+    conn = self._connection()
+    conn.execute("BEGIN IMMEDIATE")
     try:
-      if not self.cache_file.exists():
-        logger.debug("Файл entity не существует, создаем новый")
-        return {}
-
-      with open(self.cache_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-      # Преобразуем обратно в нормальный формат
-      entities = {}
-      for identifier, entity_data in data.items():
-        entities[identifier] = entity_data
-
-      self._cache_loaded = True
-      logger.info(f"✅ Entity загружены из файла: {len(entities)} записей")
-      return entities
+      conn.executemany(
+          "INSERT INTO entities (record_key, data, updated_at) VALUES (?, ?, ?) "
+          "ON CONFLICT(record_key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+          [(key, json.dumps(data, ensure_ascii=False), now) for key, data in records.items()]
+      )
+      before = conn.total_changes
+      conn.executemany(
+          "INSERT OR IGNORE INTO entity_aliases (identifier, record_key) VALUES (?, ?)",
+          aliases.items()
+      )
+      added = conn.total_changes - before
+      conn.executemany(
+          "UPDATE entity_aliases SET record_key = ? WHERE identifier = ? AND record_key != ?",
+          [(key, identifier, key) for identifier, key in aliases.items()]
+      )
+      conn.execute("COMMIT")
+    except BaseException:
+      conn.execute("ROLLBACK")
+      raise
+
+    self._records.update(records)
+    self._aliases.update(aliases)
+    return added
+
+  def _import_legacy_file(self):
+    """Переносит entity из прежнего JSON-файла (оба формата) в пустую базу"""
+    if not self.legacy_file or not self.legacy_file.exists():
+      return
+    with open(self.legacy_file, 'r', encoding='utf-8') as f:
+      data = json.load(f)
+    if 'records' in data and 'aliases' in data:
+      by_record = {}
+      for identifier, record_key in data['aliases'].items():
+        by_record.setdefault(record_key, []).append(identifier)
+      entries = [(entity_data, by_record.get(key, [])) for key, entity_data in data['records'].items()]
+    else:
+      entries = [(entity_data, [identifier]) for identifier, entity_data in data.items()]
+    imported = self._put_many(entries)
+    # Переименовываем, чтобы после clear() старые данные не вернулись повторным импортом
+    self.legacy_file.replace(self.legacy_file.with_suffix('.json.imported'))
+    logger.info(f"📥 Entity перенесены из {self.legacy_file.name} в общую базу: {imported} идентификаторов")
+
+  def load(self) -> int:
+    """Загрузка всех entity из базы в память"""
+    try:
+      conn = self._connection()
+      if not conn.execute("SELECT 1 FROM entities LIMIT 1").fetchone():
+        self._import_legacy_file()
+
+      self._records = {
+        key: json.loads(data)
+        for key, data in conn.execute("SELECT record_key, data FROM entities")
+      }
+      self._aliases = dict(conn.execute("SELECT identifier, record_key FROM entity_aliases"))
+      self.loaded = bool(self._records)
+      logger.info(
+          f"✅ Entity загружены из базы: {len(self._records)} entity, {len(self._aliases)} идентификаторов")
+      return len(self._records)
 
     except Exception as e:
-      logger.warning(f"⚠️ Не удалось загрузить entity из файла: {e}")
-      return {}
+      logger.warning(f"⚠️ Не удалось загрузить entity из базы: {e}")
+      return 0
 
-  def save_entities(self, entities: Dict[str, Dict]):
-    """Сохранение entity в файл"""
-    try:
-      # Создаем директорию если нужно
-      self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+  def get(self, identifier: Union[str, int]) -> Optional[Dict]:
+    """Получение entity по любому из идентификаторов (промах в памяти — запрос к базе)"""
+    identifier = str(identifier)
+    record_key = self._aliases.get(identifier)
+    if record_key is not None and record_key in self._records:
+      return self._records[record_key]
 
-      with open(self.cache_file, 'w', encoding='utf-8') as f:
-        json.dump(entities, f, indent=2, ensure_ascii=False)
+    try:
+      row = self._connection().execute(
+          "SELECT e.record_key, e.data FROM entity_aliases a "
+          "JOIN entities e ON e.record_key = a.record_key WHERE a.identifier = ?",
+          (identifier,)
+      ).fetchone()
+    except sqlite3.Error as e:
+      logger.warning(f"⚠️ Ошибка чтения entity из базы: {e}")
+      return None
+    if row is None:
+      return None
+    self._aliases[identifier] = row[0]
+    self._records[row[0]] = json.loads(row[1])
+    return self._records[row[0]]
 
-      logger.debug(f"💾 Entity сохранены в файл: {len(entities)} записей")
+  def add(self, identifier: Union[str, int], entity_data: Dict) -> int:
+    """Добавление entity с дополнительным идентификатором"""
+    try:
+      added = self._put_many([(entity_data, [identifier])])
+    except sqlite3.Error as e:
+      logger.error(f"❌ Ошибка сохранения entity в базу: {e}")
+      return 0
+    logger.debug(f"✅ Entity для {identifier} добавлено в кэш")
+    return added
+
+  def add_many(self, entries: Iterable[Tuple[Dict, Iterable]]) -> int:
+    """Пакетное добавление (entity_data, идентификаторы) одной транзакцией"""
+    try:
+      return self._put_many(entries)
+    except sqlite3.Error as e:
+      logger.error(f"❌ Ошибка сохранения entity в базу: {e}")
+      return 0
+
+  def items(self):
+    """Пары (идентификатор, entity) из базы — для поиска по частичному совпадению"""
+    self.load()
+    for identifier, record_key in self._aliases.items():
+      entity_data = self._records.get(record_key)
+      if entity_data is not None:
+        yield identifier, entity_data
+
+  def __len__(self) -> int:
+    return len(self._records)
 
-    except Exception as e:
-      logger.error(f"❌ Ошибка сохранения entity в файл: {e}")
-
-  def get_entity(self, identifier: str, entities: Dict[str, Dict]) -> Optional[Dict]:
-    """Получение entity по идентификатору"""
-    return entities.get(str(identifier))
-
-  def add_entity(self, identifier: str, entity_data: Dict, entities: Dict[str, Dict]):
-    """Добавление entity в файл с сохранением обоих вариантов ID"""
-    entities[str(identifier)] = entity_data
-
-    # Если это канал с префиксом -100, сохраняем также без префикса
-    if str(identifier).startswith('-100') and str(identifier)[4:].isdigit():
-        base_id = str(identifier)[4:]
-        if base_id not in entities:
-            entities[base_id] = entity_data
-            logger.debug(f"➕ Добавлен базовый ID {base_id} для канала {identifier}")
-
-    # Если это ID без префикса, проверяем нужно ли сохранить с префиксом
-    elif str(identifier).isdigit() and entity_data.get('type') == 'Channel':
-        full_id = f"-100{identifier}"
-        if full_id not in entities:
-            entities[full_id] = entity_data
-            logger.debug(f"➕ Добавлен полный ID {full_id} для канала {identifier}")
-
-    self.save_entities(entities)
-    logger.debug(f"✅ Entity для {identifier} добавлено в файл")
-
-  def clear_entities(self):
-    """Очистка файла entity"""
+  @property
+  def identifiers(self) -> List[str]:
+    return list(self._aliases)
+
+  def clear(self):
+    """Очистка кэша entity (для всех процессов)"""
+    cache_size = len(self._records)
+    self._records, self._aliases = {}, {}
+    self.loaded = False
     try:
-      if self.cache_file.exists():
-        cache_size = len(self.load_entities())
-        self.cache_file.unlink()
-        self._cache_loaded = False
-        logger.info(f"🧹 Файл entity очищен (было {cache_size} записей)")
-      else:
-        logger.info("Файл entity не существует, нечего очищать")
-    except Exception as e:
-      logger.error(f"❌ Ошибка очистки файла entity: {e}")
+      conn = self._connection()
+      conn.execute("BEGIN IMMEDIATE")
+      conn.execute("DELETE FROM entity_aliases")
+      conn.execute("DELETE FROM entities")
+      conn.execute("COMMIT")
+      logger.info(f"🧹 Кэш entity очищен (было {cache_size} записей)")
+    except sqlite3.Error as e:
+      logger.error(f"❌ Ошибка очистки кэша entity: {e}")
 
 
 class TelegramClientManager:
@@ -129,12 +280,11 @@ class TelegramClientManager:
     session_filename = f"{self.api_id}_{Config.TELEGRAM_SESSION_NAME}"
     self.session_file_path = sessions_dir / f"{session_filename}.session"
     self.entity_file_path = sessions_dir / f"{session_filename}_entities.json"
+    self.entity_db_path = sessions_dir / f"{session_filename}_entities.sqlite3"
 
-    # Создаем менеджер файлов entity
-    self.entity_manager = EntityFileManager(self.entity_file_path)
-
-    # Загружаем entity при инициализации
-    self.entities = self.entity_manager.load_entities()
+    # Кэш entity общий для всех процессов (SQLite WAL); прежний JSON импортируется один раз
+    self.entity_cache = EntityCache(self.entity_db_path, legacy_file=self.entity_file_path)
+    self.entity_cache.load()
 
     # Создаем клиент
     self._client = TelegramClient(
@@ -149,6 +299,8 @@ class TelegramClientManager:
 
     self._connection_open = False
     self._sqlite_configured = False
+    # Результат get_me на время подключения
+    self._me = None
     self._db_lock = asyncio.Lock()  # Блокировка для операций с БД
 
   @property
@@ -215,17 +367,17 @@ class TelegramClientManager:
     return input("Enter SMS/Telegram verification code: ")
 
   async def preload_entity_cache(self) -> bool:
-    """Предварительная загрузка entity из всех доступных каналов в файл"""
+    """Предварительная загрузка entity из всех доступных каналов в кэш"""
     try:
-      if self.entity_manager._cache_loaded:
+      if self.entity_cache.loaded:
         logger.debug("✅ Entity уже загружены")
         return True
 
-      if self.entity_manager._cache_loading:
+      if self.entity_cache.loading:
         logger.debug("⏳ Entity уже загружаются...")
         return False
 
-      self.entity_manager._cache_loading = True
+      self.entity_cache.loading = True
 
       if not await self.ensure_connection():
         return False
@@ -237,37 +389,16 @@ class TelegramClientManager:
         logger.warning("❌ Не найдено каналов для загрузки")
         return False
 
-      # Загружаем все entity в файл
-      loaded_count = 0
-      for channel in channels:
-        entity = channel['entity']
-        # Создаем упрощенное представление entity для хранения
-        entity_data = {
-          'id': entity.id,
-          'title': getattr(entity, 'title', ''),
-          'username': getattr(entity, 'username', ''),
-          'type': type(entity).__name__,
-          'access_hash': getattr(entity, 'access_hash', ''),
-          'full_id': channel.get('full_id', '')
-        }
+      # Все каналы индексируются в памяти и сохраняются одной записью
+      loaded_count = self.entity_cache.add_many(
+          (entity_to_cache_data(channel['entity'], channel.get('full_id', '')),
+           [str(channel['id']), channel['full_id'],
+            f"@{channel['username']}" if channel.get('username') else None,
+            channel['title']])
+          for channel in channels
+      )
 
-        # Добавляем по разным идентификаторам
-        identifiers = [
-          str(channel['id']),
-          channel['full_id'],
-          f"@{channel['username']}" if channel.get('username') else None,
-          channel['title']
-        ]
-
-        for identifier in identifiers:
-          if identifier and identifier not in self.entities:
-            self.entity_manager.add_entity(identifier, entity_data, self.entities)
-            loaded_count += 1
-          elif identifier and identifier in self.entities:
-            # Обновляем существующую запись
-            self.entity_manager.add_entity(identifier, entity_data, self.entities)
-
-      self.entity_manager._cache_loaded = True
+      self.entity_cache.loaded = True
       logger.info(
           f"✅ Entity загружены: {loaded_count} записей, {len(channels)} каналов")
       return True
@@ -276,22 +407,17 @@ class TelegramClientManager:
       logger.error(f"❌ Ошибка загрузки entity: {str(e)}")
       return False
     finally:
-      self.entity_manager._cache_loading = False
+      self.entity_cache.loading = False
 
   async def get_entity_cached(self, channel_identifier: Union[str, int]):
     """Получение entity с использованием файлового хранилища и блокировкой"""
     async def _get():
       cache_key = str(channel_identifier)
 
-      # Шаг 0: Загружаем entity из файла если еще не загружены
-      if not self.entity_manager._cache_loaded:
-        self.entities = self.entity_manager.load_entities()
-        self.entity_manager._cache_loaded = True
-
-      # Шаг 1: Прямой поиск по ключу
-      entity_data = self.entity_manager.get_entity(cache_key, self.entities)
+      # Шаг 1: Поиск в кэше — индекс покрывает id, -100id, @username и название
+      entity_data = self.entity_cache.get(cache_key)
       if entity_data:
-        logger.debug(f"📦 Найдено entity в файле для {channel_identifier}")
+        logger.debug(f"📦 Найдено entity в кэше для {channel_identifier}")
         entity = await self._create_entity_from_cache(entity_data)
         if entity:
           logger.debug(f"✅ Entity создано из кэша для {channel_identifier}")
@@ -299,32 +425,6 @@ class TelegramClientManager:
         else:
           logger.debug(f"⚠️ Не удалось создать entity из кэша для {channel_identifier}")
 
-      # Шаг 1.1: Если это ID с префиксом -100, пробуем найти без префикса
-      if str(channel_identifier).startswith('-100'):
-        base_id = str(channel_identifier)[4:]  # Убираем префикс -100
-        entity_data = self.entity_manager.get_entity(base_id, self.entities)
-        if entity_data:
-          logger.debug(f"📦 Найдено entity по базовому ID {base_id} для {channel_identifier}")
-          entity = await self._create_entity_from_cache(entity_data)
-          if entity:
-            logger.debug(f"✅ Entity создано из кэша по базовому ID для {channel_identifier}")
-            # Сохраняем также и для полного ID на будущее
-            self.entity_manager.add_entity(cache_key, entity_data, self.entities)
-            return entity
-
-      # Шаг 1.2: Если это ID без префикса, пробуем найти с префиксом -100
-      elif str(channel_identifier).isdigit():
-        full_id = f"-100{channel_identifier}"
-        entity_data = self.entity_manager.get_entity(full_id, self.entities)
-        if entity_data:
-          logger.debug(f"📦 Найдено entity по полному ID {full_id} для {channel_identifier}")
-          entity = await self._create_entity_from_cache(entity_data)
-          if entity:
-            logger.debug(f"✅ Entity создано из кэша по полному ID для {channel_identifier}")
-            # Сохраняем также и для базового ID на будущее
-            self.entity_manager.add_entity(cache_key, entity_data, self.entities)
-            return entity
-
       # Шаг 2: Если нет в файле или не удалось создать - пробуем получить напрямую через API
       logger.debug(f"🔄 Прямой поиск entity через API для {channel_identifier}")
       try:
@@ -334,18 +434,10 @@ class TelegramClientManager:
         entity = await TelegramUtils.get_entity_safe(self.client,
                                                      channel_identifier)
         if entity:
-          # Сохраняем в файл
-          entity_data = {
-            'id': entity.id,
-            'title': getattr(entity, 'title', ''),
-            'username': getattr(entity, 'username', ''),
-            'type': type(entity).__name__,
-            'access_hash': getattr(entity, 'access_hash', ''),
-            'full_id': utils.get_peer_id(entity)
-          }
-          self.entity_manager.add_entity(cache_key, entity_data, self.entities)
+          # Сохраняем в кэш
+          self.entity_cache.add(cache_key, entity_to_cache_data(entity))
           logger.debug(
-            f"✅ Entity для {channel_identifier} найдено через API и сохранено в файл")
+            f"✅ Entity для {channel_identifier} найдено через API и сохранено в кэш")
           return entity
       except Exception as e:
         logger.debug(
@@ -356,11 +448,11 @@ class TelegramClientManager:
         f"🔍 Entity для {channel_identifier} не найдено, догружаем все каналы...")
       await self._supplement_cache()
 
-      # Шаг 4: После догрузки пробуем снова найти в файле
-      entity_data = self.entity_manager.get_entity(cache_key, self.entities)
+      # Шаг 4: После догрузки пробуем снова найти в кэше
+      entity_data = self.entity_cache.get(cache_key)
       if entity_data:
         logger.info(
-          f"✅ Entity для {channel_identifier} найдено в файле после догрузки")
+          f"✅ Entity для {channel_identifier} найдено в кэше после догрузки")
         entity = await self._create_entity_from_cache(entity_data)
         if entity:
           logger.info(
@@ -381,9 +473,6 @@ class TelegramClientManager:
       if not await self.ensure_connection():
         return False
 
-      # Загружаем текущие entity из файла
-      current_entities = self.entity_manager.load_entities()
-
       # Получаем все доступные каналы
       channels = await TelegramUtils.get_all_available_channels(self.client)
 
@@ -391,41 +480,13 @@ class TelegramClientManager:
         logger.warning("❌ Не найдено каналов для догрузки")
         return False
 
-      # Добавляем только новые entity
-      added_count = 0
-      for channel in channels:
-        entity = channel['entity']
-        full_id = channel.get('full_id', '')
-
-        entity_data = {
-          'id': entity.id,
-          'title': getattr(entity, 'title', ''),
-          'username': getattr(entity, 'username', ''),
-          'type': type(entity).__name__,
-          'access_hash': getattr(entity, 'access_hash', ''),
-          'full_id': full_id
-        }
-
-        # Добавляем по разным идентификаторам
-        identifiers = [
-          str(entity.id),  # ID как число
-          full_id,  # Полный ID (с префиксом -100)
-          f"@{entity.username}" if getattr(entity, 'username', None) else None,
-          getattr(entity, 'title', '')
-        ]
-
-        for identifier in identifiers:
-          if identifier and identifier not in current_entities:
-            self.entity_manager.add_entity(identifier, entity_data, current_entities)
-            added_count += 1
-            logger.debug(f"➕ Добавлен идентификатор: {identifier}")
-
-      # Сохраняем обновленный кэш
-      self.entity_manager.save_entities(current_entities)
-      self.entities = current_entities
+      added_count = self.entity_cache.add_many(
+          (entity_to_cache_data(channel['entity'], channel.get('full_id', '')), [])
+          for channel in channels
+      )
 
       logger.info(
-        f"✅ Кэш дополнен: добавлено {added_count} записей, всего {len(current_entities)}")
+        f"✅ Кэш дополнен: добавлено {added_count} записей, всего {len(self.entity_cache)}")
       return True
 
     except Exception as e:
@@ -489,20 +550,19 @@ class TelegramClientManager:
   async def force_reload_cache(self) -> bool:
     """Принудительная перезагрузка entity"""
     logger.info("🔄 Принудительная перезагрузка entity...")
-    self.entity_manager._cache_loaded = False
     self.clear_entity_cache()
     return await self.preload_entity_cache()
 
   async def _find_entity_partial_match(self, identifier: str) -> Optional:
     """Поиск entity по частичному совпадению в уже загруженных entity"""
     try:
-      if not self.entity_manager._cache_loaded:
+      if not self.entity_cache.loaded:
         await self.preload_entity_cache()
 
       # Ищем по разным критериям в уже загруженных entity
       identifier_lower = identifier.lower()
 
-      for cached_identifier, entity_data in self.entities.items():
+      for cached_identifier, entity_data in self.entity_cache.items():
         # Проверяем различные варианты совпадения
         if (identifier_lower == cached_identifier.lower() or
             identifier_lower in cached_identifier.lower() or
@@ -540,9 +600,9 @@ class TelegramClientManager:
         if not await self.ensure_connection():
           return (False, "") if return_message_link else False
 
-        # Логируем информацию об аккаунте
+        # Логируем информацию об аккаунте (get_me кэшируется на время подключения)
         try:
-          me = await self.client.get_me()
+          me = await self.get_me_cached()
           if me:
             username = f"@{me.username}" if me.username else "без username"
             logger.info(
@@ -551,32 +611,13 @@ class TelegramClientManager:
         except Exception as e:
           logger.warning(f"Не удалось получить информацию об аккаунте: {e}")
 
-        # Файловое хранилище: автоматически догружает entity при необходимости
+        # Кэш entity: автоматически догружает entity при необходимости
         entity = await self.get_entity_cached(channel_identifier)
         if not entity:
           logger.error(f"❌ Не удалось получить entity для {channel_identifier}")
           return (False, "") if return_message_link else False
 
-        # Получаем реальный entity для отправки сообщения
-        from telethon.tl.types import InputPeerChannel, InputPeerChat, \
-          InputPeerUser
-
-        if isinstance(entity, (InputPeerChannel, InputPeerChat, InputPeerUser)):
-          try:
-            full_entity = await TelegramUtils.get_entity_safe(self.client,
-                                                              channel_identifier)
-            if full_entity:
-              entity = full_entity
-              logger.debug(
-                f"✅ Получен полный entity для отправки: {type(entity).__name__}")
-            else:
-              logger.warning(
-                f"⚠️ Не удалось получить полный entity, используем InputPeer")
-          except Exception as e:
-            logger.warning(
-              f"⚠️ Ошибка получения полного entity: {e}, используем InputPeer")
-
-        # Отправка сообщения
+        # Отправка сообщения прямо в InputPeer из кэша — полный entity нужен разве что для ссылки
         sent_message = None
 
         if media_files:
@@ -597,14 +638,8 @@ class TelegramClientManager:
         # Генерация ссылки на сообщение
         if return_message_link and sent_message:
           try:
-            if isinstance(sent_message, list) and sent_message:
-              message_link = await TelegramUtils.get_message_link(
-                  self.client, entity, sent_message[0].id
-              )
-            else:
-              message_link = await TelegramUtils.get_message_link(
-                  self.client, entity, sent_message.id
-              )
+            message_id = sent_message[0].id if isinstance(sent_message, list) else sent_message.id
+            message_link = await self._build_message_link(channel_identifier, entity, message_id)
             return True, message_link
           except Exception as e:
             logger.error(f"❌ Ошибка генерации ссылки на сообщение: {e}")
@@ -619,6 +654,35 @@ class TelegramClientManager:
         logger.error(f"Ошибка при отправке сообщения: {str(e)}")
         return (False, "") if return_message_link else False
 
+  async def get_me_cached(self):
+    """Текущий аккаунт: get_me запрашивается один раз за подключение"""
+    if self._me is None:
+      self._me = await self.client.get_me()
+    return self._me
+
+  async def _build_message_link(self, channel_identifier: Union[str, int], entity,
+                                message_id: int) -> str:
+    """
+    Ссылка на отправленное сообщение без лишних запросов к API
+
+    Для публичного канала хватает username из кэша entity, для приватного — ID
+    из InputPeer; полный entity запрашивается, только если в кэше нет данных.
+    """
+    from telethon.tl.types import InputPeerChannel, InputPeerChat, \
+      InputPeerUser
+
+    if isinstance(entity, (InputPeerChannel, InputPeerChat, InputPeerUser)):
+      entity_data = self.entity_cache.get(channel_identifier)
+      if entity_data and entity_data.get('username'):
+        return f"https://t.me/{entity_data['username']}/{message_id}"
+      if entity_data is None:
+        full_entity = await TelegramUtils.get_entity_safe(self.client, channel_identifier)
+        if full_entity:
+          entity = full_entity
+          logger.debug(f"✅ Получен полный entity для ссылки: {type(entity).__name__}")
+
+    return await TelegramUtils.get_message_link(self.client, entity, message_id)
+
   def get_session_string(self):
     """Возвращает строку сессии для использования в других процессах"""
     try:
@@ -634,6 +698,7 @@ class TelegramClientManager:
     if self._connection_open:
       await self.client.disconnect()
       self._connection_open = False
+      self._me = None
       logger.debug("🔌 Подключение закрыто")
 
   async def _upload_media(self, file_path: str):
@@ -708,18 +773,16 @@ class TelegramClientManager:
     return loop.run_until_complete(self.update_channels_csv_async())
 
   def clear_entity_cache(self):
-    """Очистка файла entity"""
-    self.entity_manager.clear_entities()
-    # Перезагружаем пустой словарь
-    self.entities = self.entity_manager.load_entities()
+    """Очистка кэша и файла entity"""
+    self.entity_cache.clear()
 
   def get_cache_stats(self) -> Dict:
     """Получить статистику entity"""
     return {
-      'entities_count': len(self.entities),
-      'cache_loaded': self.entity_manager._cache_loaded,
+      'entities_count': len(self.entity_cache),
+      'cache_loaded': self.entity_cache.loaded,
       'connection_open': self._connection_open,
-      'cached_entities': list(self.entities.keys())
+      'cached_entities': self.entity_cache.identifiers
     }
 
 
@@ -452,7 +452,7 @@ class TelegramUtils:
         if updated:
           df.to_csv(file_path, index=False, encoding='utf-8')
           # Обновляем в гугл таблице
-          sync_success = sync_manager.sync_sheet(
+          sync_success = await sync_manager.sync_sheet_async(
               sheet_name=sheet_name, direction='csv_to_google')
           if not sync_success:
             raise RuntimeError("Синхронизация завершилась со статусом False")
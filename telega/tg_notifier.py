@@ -1,17 +1,202 @@
 # tg_notifier.py (финальная, рабочая версия)
 
 import asyncio
+import hashlib
+import json
 import os
-from typing import Optional, Union, List
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 
 import aiohttp
 from aiohttp import FormData
 
 from common.config import Config
 from common.logging_config import setup_logger
+from telega.outbound_dispatcher import PRIORITY_INTERACTIVE, outbound_dispatcher
 
 logger = setup_logger("tg_notifier")
 
+# Общий пул соединений с api.telegram.org: keep-alive вместо TLS-рукопожатия на каждое сообщение
+TELEGRAM_CONNECTOR_LIMIT = 20           # одновременных соединений на процесс
+TELEGRAM_DNS_CACHE_TTL = 300            # секунд
+TELEGRAM_KEEPALIVE_TIMEOUT = 60         # секунд простоя до закрытия соединения
+
+# Не больше 10 файлов в одном sendMediaGroup
+MEDIA_GROUP_LIMIT = 10
+# file_id уже загруженных файлов по SHA-256 содержимого
+FILE_ID_CACHE_PATH = Path(__file__).parent.parent.resolve() / "sessions" / "bot_file_ids.json"
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Общая для процесса ClientSession для Bot API (создаётся при первом обращении)
+
+    Сессия привязана к event loop, в котором создана: если цикл сменился
+    (например, повторный asyncio.run в планировщике), создаётся новая.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=TELEGRAM_CONNECTOR_LIMIT,
+            ttl_dns_cache=TELEGRAM_DNS_CACHE_TTL,
+            keepalive_timeout=TELEGRAM_KEEPALIVE_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+        logger.debug("Created shared Telegram HTTP session")
+    return _session
+
+
+@asynccontextmanager
+async def telegram_session() -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Замена `async with aiohttp.ClientSession() as session:` для отправки через send_message:
+    отдаёт общую сессию и не закрывает её при выходе из блока.
+    """
+    yield get_session()
+
+
+async def close_session():
+    """Закрывает общую сессию (вызывается при остановке бота и планировщика)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Shared Telegram HTTP session closed")
+    _session = None
+    _session_loop = None
+
+
+class FileIdCache:
+    """
+    file_id файлов, уже загруженных ботом, по SHA-256 содержимого.
+
+    Повторно отправляемый файл (тот же PDF, та же картинка) уходит ссылкой на file_id,
+    без повторной загрузки. Кэш хранится в JSON и перезаписывается атомарно.
+    """
+
+    def __init__(self, path: Path = FILE_ID_CACHE_PATH):
+        self.path = path
+        self._ids: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        if self._ids is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._ids = json.load(f)
+            except FileNotFoundError:
+                self._ids = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать кэш file_id {self.path}: {e}")
+                self._ids = {}
+        return self._ids
+
+    def get(self, digest: str) -> Optional[str]:
+        return self._load().get(digest)
+
+    def update(self, file_ids: Dict[str, str]):
+        if file_ids:
+            self._load().update(file_ids)
+            self._save()
+
+    def discard(self, digests: Iterable[str]):
+        ids = self._load()
+        if any([ids.pop(digest, None) for digest in digests]):
+            self._save()
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._ids, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить кэш file_id {self.path}: {e}")
+
+
+file_id_cache = FileIdCache()
+
+
+def _retry_after(status: int, body: str) -> Optional[float]:
+    """retry_after из ответа 429 Too Many Requests (None для остальных ответов)."""
+    if status != 429:
+        return None
+    try:
+        return float(json.loads(body).get('parameters', {}).get('retry_after', 1))
+    except (ValueError, TypeError, AttributeError):
+        return 1.0
+
+
+def _build_media_request(
+        chat_id: Union[str, int],
+        chunk: List[Tuple[str, bytes, str]],
+        caption: Optional[str]
+) -> Tuple[str, FormData, List[str]]:
+    """
+    sendDocument для одного файла или sendMediaGroup для нескольких
+
+    Args:
+        chat_id: Чат получателя
+        chunk: (путь, содержимое, sha256) — не больше MEDIA_GROUP_LIMIT файлов
+        caption: Подпись к первому файлу
+
+    Returns:
+        Tuple[str, FormData, List[str]]: метод Bot API, тело запроса, sha256 файлов, ушедших по file_id
+    """
+    form = FormData()
+    form.add_field('chat_id', str(chat_id))
+    by_reference = []
+
+    if len(chunk) == 1:
+        file_path, data, digest = chunk[0]
+        file_id = file_id_cache.get(digest)
+        if file_id:
+            form.add_field('document', file_id)
+            by_reference.append(digest)
+        else:
+            form.add_field('document', data, filename=os.path.basename(file_path),
+                           content_type='application/octet-stream')
+        if caption:
+            form.add_field('caption', caption)
+            form.add_field('parse_mode', 'HTML')
+        return 'sendDocument', form, by_reference
+
+    media = []
+    for i, (file_path, data, digest) in enumerate(chunk):
+        file_id = file_id_cache.get(digest)
+        item = {'type': 'document', 'media': file_id or f"attach://file{i}"}
+        if file_id:
+            by_reference.append(digest)
+        else:
+            form.add_field(f"file{i}", data, filename=os.path.basename(file_path),
+                           content_type='application/octet-stream')
+        if i == 0 and caption:
+            item['caption'] = caption
+            item['parse_mode'] = 'HTML'
+        media.append(item)
+    form.add_field('media', json.dumps(media, ensure_ascii=False))
+    return 'sendMediaGroup', form, by_reference
+
+
+def _remember_file_ids(chunk: List[Tuple[str, bytes, str]], body: str):
+    """Сохраняет file_id из ответа sendDocument/sendMediaGroup."""
+    try:
+        result = json.loads(body).get('result')
+    except (ValueError, AttributeError):
+        return
+    messages = result if isinstance(result, list) else [result]
+    file_ids = {}
+    for (_, _, digest), sent in zip(chunk, messages):
+        document = (sent or {}).get('document') or {}
+        if document.get('file_id'):
+            file_ids[digest] = document['file_id']
+    file_id_cache.update(file_ids)
+
 
 async def send_message(
         session: aiohttp.ClientSession,
@@ -19,10 +204,16 @@ async def send_message(
         message: Optional[str] = None,
         media_files: Optional[Union[str, List[str]]] = None,
         timeout_sec: int = 30,
-        max_retries: int = 3
+        max_retries: int = 3,
+        priority: int = PRIORITY_INTERACTIVE
 ) -> bool:
     """
     Отправка сообщения или файлов в Telegram через Bot API
+
+    Каждый запрос проходит через outbound_dispatcher (лимиты на чат и на бота);
+    priority=PRIORITY_SCHEDULED пропускает вперёд интерактивные ответы.
+    Файлы уходят документами, до MEDIA_GROUP_LIMIT в одном sendMediaGroup; message —
+    подпись к первому файлу. Уже загруженные файлы отправляются по file_id.
     """
     if not message and not media_files:
         logger.error("Не указаны ни message, ни media_files")
@@ -36,15 +227,32 @@ async def send_message(
     base_url = f"https://api.telegram.org/bot{bot_token}"
     files_list = [media_files] if isinstance(media_files, str) else (media_files or [])
 
+    # Файлы читаются один раз: повторные попытки и file_id-кэш работают с теми же байтами
+    files = []
+    for file_path in map(str, files_list):
+        if not os.path.isfile(file_path):
+            logger.error(f"Файл не найден: {file_path}")
+            return False
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        files.append((file_path, data, hashlib.sha256(data).hexdigest()))
+    chunks = [files[i:i + MEDIA_GROUP_LIMIT] for i in range(0, len(files), MEDIA_GROUP_LIMIT)]
+    # Индекс первой ещё не отправленной группы: повтор не дублирует уже доставленные
+    next_chunk = 0
+    # Повтор без экспоненциальной задержки: после 429 паузу задаёт диспетчер по retry_after,
+    # после устаревшего file_id файлы можно сразу загрузить заново
+    skip_backoff = False
+
     for attempt in range(max_retries):
         try:
             # Задержка между повторными попытками
-            if attempt > 0:
+            if attempt > 0 and not skip_backoff:
                 wait_time = min(2 ** attempt, 10)  # Максимальная задержка 10 секунд
                 logger.info(f"🔄 Повтор {attempt + 1}/{max_retries} через {wait_time} сек.")
                 await asyncio.sleep(wait_time)
+            skip_backoff = False
 
-            if not files_list:
+            if not chunks:
                 # Отправка текста
                 payload = {
                     'chat_id': str(chat_id),
@@ -52,6 +260,7 @@ async def send_message(
                     'parse_mode': 'HTML'
                 }
 
+                await outbound_dispatcher.acquire(chat_id, priority)
                 timeout = aiohttp.ClientTimeout(total=timeout_sec)
                 async with session.post(f"{base_url}/sendMessage", data=payload, timeout=timeout) as resp:
                     if resp.status == 200:
@@ -60,53 +269,48 @@ async def send_message(
                     else:
                         err = await resp.text()
                         logger.error(f"❌ Ошибка текста в {chat_id}: {resp.status} — {err}")
+                        retry_after = _retry_after(resp.status, err)
+                        if retry_after is not None:
+                            outbound_dispatcher.penalize(chat_id, retry_after)
+                            skip_backoff = True
                         if attempt == max_retries - 1:
                             return False
                         continue
 
-            # Отправка файлов
-            for i, file_path in enumerate(files_list):
-                if not os.path.isfile(file_path):
-                    logger.error(f"Файл не найден: {file_path}")
-                    return False
-
-                form = FormData()
-                form.add_field('chat_id', str(chat_id))
-                if i == 0 and message:
-                    form.add_field('caption', message)
-                    form.add_field('parse_mode', 'HTML')
-
-                with open(file_path, 'rb') as f:
-                    form.add_field(
-                        'document',
-                        f,
-                        filename=os.path.basename(file_path),
-                        content_type='application/octet-stream'
-                    )
-
-                    logger.debug(f"📤 Отправка {file_path} в чат {chat_id}")
-                    # Увеличиваем таймаут для файлов
-                    file_timeout = aiohttp.ClientTimeout(total=60)
-                    async with session.post(
-                            f"{base_url}/sendDocument",
-                            data=form,
-                            timeout=file_timeout
-                    ) as resp:
-                        if resp.status == 200:
-                            logger.info(f"✅ Файл {file_path} отправлен в чат {chat_id}")
-                        else:
-                            err = await resp.text()
-                            logger.error(f"❌ Ошибка отправки {file_path} в {chat_id}: {resp.status} — {err}")
-                            # Если это не последняя попытка, продолжаем цикл
-                            if attempt < max_retries - 1:
-                                break
-                            return False
+            # Отправка файлов: по MEDIA_GROUP_LIMIT в одном запросе
+            while next_chunk < len(chunks):
+                chunk = chunks[next_chunk]
+                method, form, by_reference = _build_media_request(
+                    chat_id, chunk, message if next_chunk == 0 else None
+                )
 
-                    # Пауза между отправкой нескольких файлов
-                    if i < len(files_list) - 1:
-                        await asyncio.sleep(0.5)
+                await outbound_dispatcher.acquire(chat_id, priority)
+                logger.debug(f"📤 {method}: {len(chunk)} файл(ов) в чат {chat_id}")
+                # Увеличиваем таймаут для файлов
+                file_timeout = aiohttp.ClientTimeout(total=max(timeout_sec, 60))
+                async with session.post(f"{base_url}/{method}", data=form, timeout=file_timeout) as resp:
+                    body = await resp.text()
+                    if resp.status == 200:
+                        _remember_file_ids(chunk, body)
+                        logger.info(f"✅ Файлы {[path for path, _, _ in chunk]} отправлены в чат {chat_id}")
+                        next_chunk += 1
+                        continue
 
-            return True
+                    logger.error(f"❌ Ошибка {method} в {chat_id}: {resp.status} — {body}")
+                    retry_after = _retry_after(resp.status, body)
+                    if retry_after is not None:
+                        outbound_dispatcher.penalize(chat_id, retry_after)
+                        skip_backoff = True
+                    elif resp.status == 400 and by_reference:
+                        # file_id мог устареть — при повторе загружаем эти файлы заново
+                        file_id_cache.discard(by_reference)
+                        skip_backoff = True
+                    break
+
+            if next_chunk == len(chunks):
+                return True
+            if attempt == max_retries - 1:
+                return False
 
         except (aiohttp.ClientOSError, ConnectionResetError, ConnectionError) as e:
             logger.warning(f"⚠️ Сетевая ошибка при отправке в {chat_id}: {e}")
@@ -130,10 +334,19 @@ async def send_message(
 
     return False
 
+
 if __name__ == "__main__":
     # Пример использования
     test_chat_id = 651627886
-    if send_message(test_chat_id, "TEST"):
+
+    async def _send_test() -> bool:
+        try:
+            async with telegram_session() as session:
+                return await send_message(session, test_chat_id, "TEST")
+        finally:
+            await close_session()
+
+    if asyncio.run(_send_test()):
         print("✅ Сообщение отправлено успешно")
     else:
-        print("❌ Ошибка при отправке сообщения")
\ No newline at end of file
+        print("❌ Ошибка при отправке сообщения")
@@ -0,0 +1,59 @@
+# tests/conftest.py
+import pytest
+
+
+@pytest.fixture
+def sync_queue(tmp_path, monkeypatch):
+    """Пустая очередь синхронизации с файлом состояния во временной папке."""
+    pytest.importorskip('pandas')
+    pytest.importorskip('dotenv')
+    from main_tg_bot.google_sheets import sync_queue as sync_queue_module
+
+    return sync_queue_module.SheetSyncQueue(state_file=tmp_path / '.sync_queue.json')
+
+
+@pytest.fixture
+def sync_manager(tmp_path, monkeypatch, sync_queue):
+    """GoogleSheetsCSVSync без Google и FTP: CSV и манифесты лежат во временной папке."""
+    pytest.importorskip('gspread')
+    from main_tg_bot.google_sheets import sync_manager as sync_manager_module
+
+    monkeypatch.setattr(sync_manager_module, 'PROJECT_ROOT', tmp_path)
+    monkeypatch.setattr(sync_manager_module.sheets_cache, 'get_client', lambda scope: object())
+    monkeypatch.setattr(sync_manager_module.GoogleSheetsCSVSync, '_sync_manifests', {})
+    monkeypatch.setattr(sync_manager_module, 'sync_queue', sync_queue)
+
+    manager = sync_manager_module.GoogleSheetsCSVSync()
+    manager.sheet_to_filepath = {
+        sheet_name: tmp_path / file_path.name for sheet_name, file_path in manager.sheet_to_filepath.items()
+    }
+    monkeypatch.setattr(manager, '_upload_sheet_to_ftp', lambda sheet_name: False)
+    monkeypatch.setattr(manager, '_publish_availability_for', lambda *args, **kwargs: None)
+    return manager
+
+
+@pytest.fixture
+def booking_store(tmp_path, monkeypatch):
+    """BookingStore на временной базе; лист 'HALO Title' смотрит в CSV во временной папке."""
+    pytest.importorskip('pandas')
+    pytest.importorskip('dotenv')
+    from main_tg_bot import booking_objects
+
+    monkeypatch.setattr(booking_objects.BOOKING_SHEETS['HALO Title'], 'filepath', tmp_path / 'halo_title.csv')
+    store = booking_objects.BookingStore(tmp_path / '.bookings.sqlite3')
+    monkeypatch.setattr(booking_objects, 'booking_store', store)
+    return store
+
+
+@pytest.fixture
+def halo_sheet(booking_store):
+    from main_tg_bot.booking_objects import BOOKING_SHEETS
+
+    sheet = BOOKING_SHEETS['HALO Title']
+    sheet.filepath.write_text(
+        "Гость,Заезд,Выезд,_sync_id\n"
+        "Анна,01.02.2025,05.02.2025,id-a\n"
+        "Борис,10.02.2025,15.02.2025,id-b\n",
+        encoding='utf-8'
+    )
+    return sheet
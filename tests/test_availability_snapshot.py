@@ -0,0 +1,26 @@
+# tests/test_availability_snapshot.py
+import hashlib
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+
+def test_availability_snapshot_covers_every_booking_csv(booking_store, halo_sheet, tmp_path, monkeypatch):
+    from main_tg_bot import booking_objects
+    from main_tg_bot.google_sheets import availability_snapshot
+
+    # Объект вне BOOKING_SHEETS, который PHP без снимка тоже читает из booking_files/*.csv
+    monkeypatch.setattr(booking_objects, 'BOOKING_DIR', tmp_path)
+    (tmp_path / 'legacy_villa.csv').write_text(
+        "Гость,Заезд,Выезд\nЕва,01.03.2030,05.03.2030\n", encoding='utf-8'
+    )
+
+    snapshot = availability_snapshot.build_availability_snapshot(tmp_path)
+    objects = snapshot['objects']
+
+    assert objects['legacy_villa']['booked'] == [{'start': '01.03.2030', 'end': '05.03.2030'}]
+    assert objects['legacy_villa']['csv_md5'] == hashlib.md5(
+        (tmp_path / 'legacy_villa.csv').read_bytes()).hexdigest()
+    assert objects['halo_title']['csv_md5'] == hashlib.md5(halo_sheet.filepath.read_bytes()).hexdigest()
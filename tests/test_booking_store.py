@@ -0,0 +1,86 @@
+# tests/test_booking_store.py
+from datetime import date
+
+import pytest
+
+pytest.importorskip('pandas')
+
+
+def _guests(sheet):
+    import pandas as pd
+    return pd.read_csv(sheet.filepath, dtype=str)['Гость'].tolist()
+
+
+def _row(guest, check_in, check_out, sync_id):
+    return {'Гость': guest, 'Заезд': check_in, 'Выезд': check_out, '_sync_id': sync_id}
+
+
+def test_mutation_is_exported_lazily(booking_store, halo_sheet):
+    booking_store.insert_booking(halo_sheet, _row('Вера', '20.02.2025', '25.02.2025', 'id-c'))
+
+    # CSV перегенерируется не при мутации, а перед чтением в обход хранилища
+    assert _guests(halo_sheet) == ['Анна', 'Борис']
+    assert booking_store.has_unexported_changes(halo_sheet)
+    assert [row['Гость'] for row in booking_store.list_bookings(halo_sheet)] == ['Анна', 'Борис', 'Вера']
+
+    booking_store.export_csv(halo_sheet)
+    assert _guests(halo_sheet) == ['Анна', 'Борис', 'Вера']
+    assert not booking_store.has_unexported_changes(halo_sheet)
+
+
+def test_repository_read_exports_pending_bookings(booking_store, halo_sheet):
+    from main_tg_bot.booking_objects import booking_repository
+
+    booking_store.delete_booking(halo_sheet, 'id-a')
+    assert [row['Гость'] for row in booking_repository.records(halo_sheet.filepath)] == ['Борис']
+
+
+def test_external_csv_change_is_imported(booking_store, halo_sheet):
+    assert booking_store.get_booking(halo_sheet, 'id-a')['Гость'] == 'Анна'
+    halo_sheet.filepath.write_text("Гость,Заезд,Выезд,_sync_id\nДина,01.03.2025,03.03.2025,id-d\n",
+                                   encoding='utf-8')
+
+    assert booking_store.get_booking(halo_sheet, 'id-a') is None
+    assert booking_store.get_booking(halo_sheet, 'id-d')['Гость'] == 'Дина'
+    assert booking_store.booked_periods(halo_sheet) == [(date(2025, 3, 1), date(2025, 3, 3))]
+
+
+def test_external_csv_change_does_not_drop_unexported_bookings(booking_store, halo_sheet):
+    booking_store.insert_booking(halo_sheet, _row('Вера', '20.02.2025', '25.02.2025', 'id-c'))
+    halo_sheet.filepath.write_text("Гость,Заезд,Выезд,_sync_id\nАнна,01.02.2025,05.02.2025,id-a\n",
+                                   encoding='utf-8')
+
+    assert booking_store.get_booking(halo_sheet, 'id-c')['Гость'] == 'Вера'
+    assert _guests(halo_sheet) == ['Анна', 'Борис', 'Вера']
+
+
+def test_overlap_index_follows_mutations(booking_store, halo_sheet):
+    assert booking_store.find_overlaps(halo_sheet, date(2025, 2, 4), date(2025, 2, 11)) != []
+    assert booking_store.find_overlaps(halo_sheet, date(2025, 2, 5), date(2025, 2, 10)) == []
+
+    booking_store.update_booking(halo_sheet, 'id-b', {'Заезд': '06.02.2025'})
+    overlaps = booking_store.find_overlaps(halo_sheet, date(2025, 2, 5), date(2025, 2, 10))
+    assert [row['_sync_id'] for row in overlaps] == ['id-b']
+    assert booking_store.find_overlaps(halo_sheet, date(2025, 2, 5), date(2025, 2, 10),
+                                       exclude_sync_id='id-b') == []
+
+
+def test_booking_saved_during_push_is_kept(booking_store, halo_sheet, sync_manager, monkeypatch):
+    from main_tg_bot.google_sheets import sync_manager as sync_manager_module
+
+    monkeypatch.setattr(sync_manager_module, 'booking_store', booking_store)
+    sync_manager.sheet_to_filepath[halo_sheet.sheet_name] = halo_sheet.filepath
+    monkeypatch.setattr(sync_manager, '_get_remote_revision', lambda sheet_name: None)
+
+    def push_while_booking_is_saved(sheet_name, df, **kwargs):
+        booking_store.insert_booking(halo_sheet, _row('Вера', '20.02.2025', '25.02.2025', 'id-c'))
+        return True
+
+    monkeypatch.setattr(sync_manager, 'update_google_sheet', push_while_booking_is_saved)
+
+    assert sync_manager.sync_sheet(halo_sheet.sheet_name, direction='csv_to_google') is True
+    assert _guests(halo_sheet) == ['Анна', 'Борис', 'Вера']
+    assert booking_store.get_booking(halo_sheet, 'id-c') is not None
+    # Отправленным считается только загруженный до push CSV: новая бронь уйдёт следующим push
+    manifest = sync_manager._load_manifest(halo_sheet.sheet_name)
+    assert manifest['local_signature'] != sync_manager._local_signature(halo_sheet.sheet_name)
@@ -0,0 +1,106 @@
+# tests/test_ftp_client.py
+import ftplib
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('dotenv')
+
+from main_tg_bot.google_sheets import ftp_client  # noqa: E402
+
+
+class FakeFTP:
+    """Минимальный FTP-сервер в памяти: одна директория, RNTO поверх файла запрещен."""
+
+    def __init__(self, files=None, fail_stor=False):
+        self.files = dict(files or {})
+        self.fail_stor = fail_stor
+
+    def voidcmd(self, cmd):
+        return '200 OK'
+
+    def size(self, name):
+        if name not in self.files:
+            raise ftplib.error_perm('550 No such file')
+        return len(self.files[name])
+
+    def storbinary(self, cmd, f, rest=None):
+        name = cmd.split(' ', 1)[1]
+        self.files[name] = f.read()
+        if self.fail_stor:
+            raise ConnectionResetError('connection lost')
+
+    def rename(self, source, target):
+        if target in self.files:
+            raise ftplib.error_perm('553 File exists')
+        self.files[target] = self.files.pop(source)
+
+    def delete(self, name):
+        if name not in self.files:
+            raise ftplib.error_perm('550 No such file')
+        del self.files[name]
+
+    def nlst(self, *args):
+        return list(self.files)
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    manifest = ftp_client.UploadManifest(tmp_path / '.ftp_upload_manifest.json')
+    monkeypatch.setattr(ftp_client, 'upload_manifest', manifest)
+    return manifest
+
+
+def _client(fake_ftp):
+    client = ftp_client.FTPClient()
+    client.ftp = fake_ftp
+    client.host = 'example.com:21'
+    return client
+
+
+def test_manifest_merges_writes_of_other_processes(manifest):
+    other_process = ftp_client.UploadManifest(manifest.manifest_file)
+
+    assert manifest.get('a') is None
+    other_process.set('a', 'hash-a')
+    manifest.set('b', 'hash-b')
+
+    # Вторая запись не затерла первую, и обе копии видят оба ключа
+    assert manifest.get('a') == 'hash-a'
+    assert other_process.get('b') == 'hash-b'
+
+    other_process.set('b', 'hash-b2')
+    assert manifest.get('b') == 'hash-b2'
+
+
+def test_rename_fallback_is_logged_as_warning(manifest, tmp_path, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(ftp_client.logger, 'warning', lambda message, *args: warnings.append(message))
+    local_file = tmp_path / 'villa.csv'
+    local_file.write_bytes(b'new')
+    fake_ftp = FakeFTP({'villa.csv': b'old'})
+
+    assert _client(fake_ftp).upload_file(local_file)
+    assert fake_ftp.files == {'villa.csv': b'new'}
+    assert any('villa.csv' in message for message in warnings)
+
+
+def test_failed_small_upload_removes_part_file(manifest, tmp_path):
+    local_file = tmp_path / 'villa.csv'
+    local_file.write_bytes(b'new')
+    fake_ftp = FakeFTP({'villa.csv': b'old'}, fail_stor=True)
+
+    assert not _client(fake_ftp).upload_file(local_file)
+    assert fake_ftp.files == {'villa.csv': b'old'}
+    assert manifest.get('example.com:21:/villa.csv') is None
+
+
+def test_large_upload_sweeps_stale_part_files(manifest, tmp_path, monkeypatch):
+    monkeypatch.setattr(ftp_client, 'FTP_RESUME_MIN_SIZE', 1)
+    local_file = tmp_path / 'villa.csv'
+    local_file.write_bytes(b'new content')
+    fake_ftp = FakeFTP({'.villa.csv.0badc0de.part': b'stale', '.other.csv.12345678.part': b'keep'})
+
+    assert _client(fake_ftp).upload_file(local_file)
+    assert fake_ftp.files == {'villa.csv': b'new content', '.other.csv.12345678.part': b'keep'}
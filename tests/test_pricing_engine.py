@@ -0,0 +1,73 @@
+# tests/test_pricing_engine.py
+from datetime import date, timedelta
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+pytest.importorskip('dotenv')
+
+from main_tg_bot.pricing_engine import (  # noqa: E402
+    AUTO_DISCOUNT_MIN_NIGHTS, AUTO_DISCOUNT_PERCENT, PriceCalendar, _make_quote, matches_quote, round_baht
+)
+
+PERIODS = [
+    {"startMonth": 1, "endMonth": 1, "startDay": 1, "endDay": 15, "price": 1000},
+    {"startMonth": 1, "endMonth": 1, "startDay": 10, "endDay": 31, "price": 2000},
+    {"startMonth": 12, "endMonth": 12, "startDay": 1, "endDay": 31, "price": 3000},
+]
+
+
+def test_price_calendar_prefix_sums_match_night_by_night():
+    calendar = PriceCalendar(PERIODS, 2024, 2025)
+    check_in, check_out = date(2024, 12, 30), date(2025, 1, 12)
+
+    # Пересекающиеся периоды: побеждает первый подходящий, как getPriceForDate в PHP
+    expected = 2 * 3000 + 11 * 1000
+    assert calendar.total(check_in, check_out) == (expected, 0)
+    assert calendar.total(date(2025, 1, 14), date(2025, 1, 18)) == (2 * 1000 + 2 * 2000, 0)
+    # Февраль в прайсе не указан
+    assert calendar.total(date(2025, 1, 31), date(2025, 2, 3)) == (2000, 2)
+
+
+def test_price_calendar_totals_are_vectorized_total():
+    calendar = PriceCalendar(PERIODS, 2025, 2025)
+    windows = [(date(2025, 1, 1), date(2025, 1, 20)), (date(2025, 1, 25), date(2025, 2, 5))]
+    totals, unpriced = calendar.totals(windows)
+    assert [(int(t), int(u)) for t, u in zip(totals, unpriced)] == [calendar.total(*w) for w in windows]
+
+
+def _discounted_quote(total: int) -> dict:
+    check_in = date(2025, 1, 1)
+    return _make_quote(check_in, check_in + timedelta(days=AUTO_DISCOUNT_MIN_NIGHTS), total, 0)
+
+
+def test_discounted_total_matches_calculator_arithmetic():
+    quote = _discounted_quote(33318)
+    assert quote['discount_percent'] == AUTO_DISCOUNT_PERCENT
+    # 33318 - 33318 * 10 / 100 = 29986.2, как в updateDiscount() калькулятора
+    assert quote['total_with_discount'] == 29986.2
+    assert matches_quote(29986, quote)
+    assert not matches_quote(29984, quote)
+
+
+def test_round_baht():
+    assert round_baht(29986.2) == 29986
+    assert round_baht(29986.5) == 29987
+    assert round_baht(30000) == 30000
+
+
+def test_contract_amount_from_discounted_quote():
+    pytest.importorskip('num2words')
+    pytest.importorskip('docxtpl')
+    pytest.importorskip('docx2pdf')
+    pytest.importorskip('aiohttp')
+    from main_tg_bot.handlers.contract_handler import prepare_template_data
+
+    quote = _discounted_quote(33318)
+    data = {'total_amount': str(round_baht(quote['total_with_discount'])), 'prepayment_bath': '5000'}
+    template_data = prepare_template_data(data, '1')
+
+    assert template_data['total_amount_words_th']
+    assert template_data['final_payment_bath_words_th']
+    assert template_data['final_payment_bath'] == '24 986'
@@ -0,0 +1,164 @@
+# tests/test_sync_manager.py
+import pytest
+
+pytest.importorskip('pandas')
+
+TASK_SHEET = 'Задачи'
+HEADERS = ['Задача', '_sync_id']
+
+
+def _sheet_values(*rows):
+    return [HEADERS] + [[task, f"id-{task}"] for task in rows]
+
+
+def _pull(sync_manager, revision, *rows, upload=False):
+    google_data = sync_manager._values_to_dataframe(TASK_SHEET, _sheet_values(*rows))
+    return sync_manager._store_downloaded_sheet(TASK_SHEET, google_data, revision, upload=upload)
+
+
+def _append_local_row(sync_manager, task):
+    csv_file = sync_manager._get_csv_path(TASK_SHEET)
+    with open(csv_file, 'a', encoding='utf-8') as f:
+        f.write(f"{task},id-{task}\n")
+
+
+def test_refused_pull_keeps_queued_push(sync_manager, sync_queue):
+    assert _pull(sync_manager, 'r1', 'A', 'B') is True
+    assert sync_manager._is_sheet_unchanged(TASK_SHEET, 'r1')
+
+    # Локальная правка, которая ещё ждёт отправки в очереди
+    _append_local_row(sync_manager, 'C')
+    sync_queue.mark_dirty(TASK_SHEET)
+
+    assert _pull(sync_manager, 'r1', 'A', 'B') is False
+    # Отклонённая загрузка не должна выдавать локальный CSV за уже отправленный
+    assert not sync_manager._is_sheet_unchanged(TASK_SHEET, 'r1')
+    assert sync_manager.load_local_csv(TASK_SHEET)['Задача'].tolist() == ['A', 'B', 'C']
+
+
+def test_refused_pull_is_reported_as_failure(sync_manager, sync_queue, monkeypatch):
+    assert _pull(sync_manager, 'r1', 'A', 'B') is True
+    _append_local_row(sync_manager, 'C')
+    sync_queue.mark_dirty(TASK_SHEET)
+
+    monkeypatch.setattr(sync_manager, '_get_remote_revision', lambda sheet_name: 'r2')
+    monkeypatch.setattr(
+        sync_manager, 'download_sheet',
+        lambda sheet_name: sync_manager._values_to_dataframe(sheet_name, _sheet_values('A', 'B'))
+    )
+
+    assert sync_manager.sync_sheet(TASK_SHEET, direction='google_to_csv') is False
+
+
+def test_download_does_not_touch_manifest_until_stored(sync_manager):
+    sync_manager._values_to_dataframe(TASK_SHEET, _sheet_values('A'))
+    assert sync_manager._load_manifest(TASK_SHEET) == {}
+
+
+def _fingerprints(rows):
+    return [(sync_id, f"hash-{task}") for task, sync_id in rows]
+
+
+def _apply_requests(sync_manager, sheet_rows, requests):
+    """Применяет запросы batchUpdate к модели листа (строки из CellData)."""
+    sheet = [list(row['values']) for row in sheet_rows]
+    for request in requests:
+        if 'deleteDimension' in request:
+            cells = request['deleteDimension']['range']
+            del sheet[cells['startIndex']:cells['endIndex']]
+        elif 'insertDimension' in request:
+            cells = request['insertDimension']['range']
+            sheet[cells['startIndex']:cells['startIndex']] = [[] for _ in range(cells['endIndex'] - cells['startIndex'])]
+        elif 'appendCells' in request:
+            sheet.extend(list(row['values']) for row in request['appendCells']['rows'])
+        elif 'updateCells' in request:
+            start = request['updateCells']['start']['rowIndex']
+            for offset, row in enumerate(request['updateCells']['rows']):
+                sheet[start + offset] = list(row['values'])
+    return sheet
+
+
+def _diff(sync_manager, old_rows, new_rows):
+    requests = sync_manager._row_diff_requests(0, TASK_SHEET, HEADERS, new_rows,
+                                               _fingerprints(new_rows), _fingerprints(old_rows))
+    if requests:
+        before = sync_manager._row_data(TASK_SHEET, HEADERS, [HEADERS] + old_rows)
+        after = sync_manager._row_data(TASK_SHEET, HEADERS, [HEADERS] + new_rows)
+        assert _apply_requests(sync_manager, before, requests) == [row['values'] for row in after]
+    return requests
+
+
+def _rows(*tasks):
+    return [[task, f"id-{task}"] for task in tasks]
+
+
+def _updated_rows(requests):
+    return sum(len(request['updateCells']['rows']) for request in requests if 'updateCells' in request)
+
+
+def test_row_diff_insert_in_the_middle_sends_one_row(sync_manager):
+    requests = _diff(sync_manager, _rows('a', 'b', 'c', 'd', 'e'), _rows('a', 'b', 'x', 'c', 'd', 'e'))
+    assert [next(iter(request)) for request in requests] == ['insertDimension', 'updateCells']
+    assert _updated_rows(requests) == 1
+
+
+def test_row_diff_delete_removes_the_row(sync_manager):
+    requests = _diff(sync_manager, _rows('a', 'b', 'c', 'd', 'e'), _rows('a', 'b', 'd', 'e'))
+    assert [next(iter(request)) for request in requests] == ['deleteDimension']
+
+
+def test_row_diff_append_and_change(sync_manager):
+    old_rows = _rows('a', 'b', 'c')
+    new_rows = [old_rows[0], ['b2', 'id-b'], old_rows[2]] + _rows('d')
+    requests = _diff(sync_manager, old_rows, new_rows)
+    assert [next(iter(request)) for request in requests] == ['appendCells', 'updateCells']
+    assert _updated_rows(requests) == 1
+
+
+def test_row_diff_moved_row(sync_manager):
+    # Заезд перенесли — после сортировки бронь переехала в другое место листа
+    _diff(sync_manager, _rows('a', 'b', 'c', 'd'), _rows('b', 'c', 'a', 'd'))
+
+
+def test_row_diff_nothing_to_push(sync_manager):
+    assert _diff(sync_manager, _rows('a', 'b'), _rows('a', 'b')) == []
+
+
+def test_row_diff_requires_unique_sync_ids(sync_manager):
+    old_rows = _rows('a', 'b') + [['c', 'id-a']]
+    assert _diff(sync_manager, old_rows, _rows('a', 'b')) is None
+    assert _diff(sync_manager, [['a', '']], _rows('a')) is None
+
+
+def _merge_frame(*rows):
+    import pandas as pd
+    return pd.DataFrame(rows, columns=['Задача', '_sync_id', '_last_sync', '_hash'])
+
+
+def test_merge_keeps_rows_from_both_sides(sync_manager):
+    google_data = _merge_frame(['A', 'id-a', '2025-02-01T10:00:00', 'ha'],
+                               ['G', 'id-g', '2025-02-01T10:00:00', 'hg'])
+    local_data = _merge_frame(['A', 'id-a', '2025-02-01T10:00:00', 'ha'],
+                              ['L', 'id-l', '2025-02-01T11:00:00', 'hl'])
+
+    merged, conflicts = sync_manager._merge_bidirectional(google_data, local_data, {'id-a': 'ha'})
+
+    assert sorted(merged['_sync_id']) == ['id-a', 'id-g', 'id-l']
+    assert conflicts == []
+
+
+def test_merge_prefers_newer_row_and_reports_conflict(sync_manager):
+    google_data = _merge_frame(['A-google', 'id-a', '2025-02-01T12:00:00', 'ha-google'],
+                               ['B-google', 'id-b', '2025-02-01T09:00:00', 'hb-google'])
+    local_data = _merge_frame(['A-local', 'id-a', '2025-02-01T11:00:00', 'ha-local'],
+                              ['B-local', 'id-b', '2025-02-01T10:00:00', 'hb'])
+
+    merged, conflicts = sync_manager._merge_bidirectional(
+        google_data, local_data, {'id-a': 'ha', 'id-b': 'hb'}
+    )
+
+    assert dict(zip(merged['_sync_id'], merged['Задача'])) == {'id-a': 'A-google', 'id-b': 'B-local'}
+    # id-b изменилась только в Google — это не конфликт, id-a изменилась с обеих сторон
+    assert conflicts == [
+        {'_sync_id': 'id-a', 'google_hash': 'ha-google', 'local_hash': 'ha-local', 'winner': 'google'}
+    ]
@@ -0,0 +1,79 @@
+# tests/test_sync_queue.py
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('pandas')
+pytest.importorskip('dotenv')
+
+
+class FakeSyncManager:
+    """Записывает вызовы sync_sheet_async и возвращает заранее заданные результаты."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def sync_sheet_async(self, sheet_name, direction):
+        self.calls.append((sheet_name, direction))
+        result = self.results.pop(0) if self.results else True
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def _saved_state(sync_queue):
+    with open(sync_queue.state_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_marks_are_debounced_into_one_push(sync_queue):
+    sync_queue._sync_manager = FakeSyncManager()
+    sync_queue.mark_dirty('HALO Title')
+    sync_queue.mark_dirty('HALO Title')
+
+    # До истечения паузы ничего не отправляется
+    asyncio.run(sync_queue.flush())
+    assert sync_queue._sync_manager.calls == []
+
+    asyncio.run(sync_queue.flush(only_due=False))
+    assert sync_queue._sync_manager.calls == [('HALO Title', 'csv_to_google')]
+    assert sync_queue.pending_sheets() == {}
+    assert _saved_state(sync_queue) == {}
+
+
+def test_failed_push_is_requeued_with_backoff(sync_queue):
+    from main_tg_bot.google_sheets import sync_queue as sync_queue_module
+
+    sync_queue._sync_manager = FakeSyncManager(False, RuntimeError('quota'))
+    sync_queue.mark_dirty('HALO Title')
+
+    asyncio.run(sync_queue.flush(only_due=False))
+    assert sync_queue.pending_sheets() == {'HALO Title': 'csv_to_google'}
+    assert _saved_state(sync_queue) == {'HALO Title': {'direction': 'csv_to_google', 'attempts': 1}}
+
+    # Повтор ещё не подошёл
+    asyncio.run(sync_queue.flush())
+    assert len(sync_queue._sync_manager.calls) == 1
+
+    asyncio.run(sync_queue.flush(only_due=False))
+    assert _saved_state(sync_queue)['HALO Title']['attempts'] == 2
+    assert sync_queue._pending['HALO Title']['due_at'] > sync_queue_module.time.monotonic() + 5
+
+
+def test_pending_sheets_survive_restart(sync_queue):
+    from main_tg_bot.google_sheets import sync_queue as sync_queue_module
+
+    sync_queue.mark_dirty('HALO Title')
+    sync_queue.mark_dirty('Задачи', direction='bidirectional')
+
+    restarted = sync_queue_module.SheetSyncQueue(state_file=sync_queue.state_file)
+    restarted._sync_manager = FakeSyncManager()
+    assert restarted.pending_sheets() == {'HALO Title': 'csv_to_google', 'Задачи': 'bidirectional'}
+
+    # После перезапуска неотправленное уходит без ожидания паузы
+    asyncio.run(restarted.flush())
+    assert sorted(restarted._sync_manager.calls) == [
+        ('HALO Title', 'csv_to_google'), ('Задачи', 'bidirectional')
+    ]